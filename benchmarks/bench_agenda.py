@@ -0,0 +1,84 @@
+"""
+Benchmark do motor de intervalos (service/agenda.py)
+Compara a varredura linear original de /verificar com a busca indexada,
+com 10 mil e 1 milhão de reservas na mesma sala.
+
+Uso: python -m benchmarks.bench_agenda
+"""
+
+import random
+import time
+from datetime import datetime
+
+from service.agenda import AgendaSala, de_minutos, para_minutos
+
+INICIO_BASE = datetime(2025, 1, 1, 7, 0)
+CONSULTAS = 2000
+
+
+def gerar_reservas(n: int):
+    """n reservas de 50 min, uma por hora, sem sobreposição"""
+    base = para_minutos(INICIO_BASE.strftime("%Y-%m-%d %H:%M"))
+    return [(base + i * 60, base + i * 60 + 50) for i in range(n)]
+
+
+def verificar_linear(reservas_texto, inicio, fim):
+    """Algoritmo anterior: re-interpreta e compara todas as reservas"""
+    inicio = datetime.strptime(inicio, "%Y-%m-%d %H:%M")
+    fim = datetime.strptime(fim, "%Y-%m-%d %H:%M")
+    for reserva in reservas_texto:
+        inicio_reserva = datetime.strptime(reserva[0], "%Y-%m-%d %H:%M")
+        fim_reserva = datetime.strptime(reserva[1], "%Y-%m-%d %H:%M")
+        if not (fim <= inicio_reserva or inicio >= fim_reserva):
+            return False
+    return True
+
+
+def medir(funcao, argumentos):
+    t0 = time.perf_counter()
+    for args in argumentos:
+        funcao(*args)
+    return (time.perf_counter() - t0) / len(argumentos)
+
+
+def executar(n: int, consultas_lineares: int):
+    reservas = gerar_reservas(n)
+    fim_agenda = reservas[-1][1]
+    aleatorio = random.Random(42)
+    consultas = []
+    for _ in range(CONSULTAS):
+        inicio = aleatorio.randrange(reservas[0][0], fim_agenda)
+        consultas.append((inicio, inicio + aleatorio.choice((10, 30, 60))))
+
+    agenda = AgendaSala()
+    t0 = time.perf_counter()
+    for inicio, fim in reservas:
+        agenda.inserir(inicio, fim)
+    insercao = (time.perf_counter() - t0) / n
+
+    indexada = medir(agenda.conflito, consultas)
+
+    resultado = {
+        "reservas": n,
+        "insercao_us": insercao * 1e6,
+        "consulta_indexada_us": indexada * 1e6,
+    }
+
+    if consultas_lineares:
+        texto = [(de_minutos(i), de_minutos(f)) for i, f in reservas]
+        amostra = [(texto, de_minutos(i), de_minutos(f)) for i, f in consultas[:consultas_lineares]]
+        linear = medir(verificar_linear, amostra)
+        resultado["consulta_linear_us"] = linear * 1e6
+        resultado["ganho"] = linear / indexada
+
+    return resultado
+
+
+if __name__ == "__main__":
+    for n, lineares in ((10_000, 50), (1_000_000, 2)):
+        r = executar(n, lineares)
+        print(f"{r['reservas']:>9} reservas | inserção {r['insercao_us']:.2f} µs"
+              f" | consulta indexada {r['consulta_indexada_us']:.2f} µs", end="")
+        if "consulta_linear_us" in r:
+            print(f" | linear {r['consulta_linear_us']:.0f} µs | {r['ganho']:.0f}x", end="")
+        print()
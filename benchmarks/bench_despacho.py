@@ -0,0 +1,90 @@
+"""
+Benchmark do despacho direto (run_all.py --direto) contra HTTP em loopback
+Sobe `run_all.py` em cada modo e mede a latência de POST /reservar no
+gateway (fluxo completo: sala, reserva, email e evento), primeiro uma
+reserva por vez e depois com concorrência, além das etapas do Server-Timing.
+Todas as reservas usam horários livres, para que cada uma percorra as cinco
+etapas. As portas 8001-8005 e 8010 precisam estar livres.
+
+Uso: python -m benchmarks.bench_despacho [reservas] [concorrencia]
+"""
+
+import asyncio
+import contextlib
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from benchmarks.carga import ler_server_timing, pilha_http, resumir
+
+MODOS = {"http": (), "direto": ("--direto",)}
+
+
+def pedido(i: int) -> dict:
+    dia = date(2032, 1, 1) + timedelta(days=i // 30)
+    return {
+        "sala_id": ("LAB-01", "SALA-01")[(i // 15) % 2],
+        "data": dia.isoformat(),
+        "hora_inicio": f"{7 + i % 15:02d}:00",
+        "hora_fim": f"{7 + i % 15:02d}:50",
+        "usuario_nome": "Bench Despacho",
+        "usuario_email": "despacho@example.com",
+    }
+
+
+async def reservar(gateway, indices, concorrencia: int, etapas) -> list:
+    fila = list(indices)
+    duracoes = []
+
+    async def trabalhador():
+        while fila:
+            i = fila.pop()
+            inicio = time.perf_counter()
+            response = await gateway.post("/reservar", json=pedido(i))
+            duracoes.append((time.perf_counter() - inicio) * 1000)
+            assert response.status_code == 200, response.text
+            for nome, dur in ler_server_timing(response.headers.get("server-timing", "")):
+                etapas[nome].append(dur)
+
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return duracoes
+
+
+async def medir(argumentos, reservas: int, concorrencia: int) -> dict:
+    etapas = defaultdict(list)
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        async with pilha_http(concorrencia, argumentos) as clientes:
+            gateway = clientes[8010]
+            await reservar(gateway, range(50), 4, defaultdict(list))  # aquecimento
+            sequencial = await reservar(gateway, range(50, 50 + reservas), 1, etapas)
+            inicio = time.perf_counter()
+            concorrente = await reservar(gateway, range(50 + reservas, 50 + 3 * reservas), concorrencia, defaultdict(list))
+            duracao = time.perf_counter() - inicio
+    return {
+        "sequencial": resumir(sequencial),
+        "concorrente": resumir(concorrente, duracao),
+        "etapas": {nome: resumir(amostras) for nome, amostras in sorted(etapas.items())},
+    }
+
+
+if __name__ == "__main__":
+    reservas = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    concorrencia = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    resultados = {modo: asyncio.run(medir(argumentos, reservas, concorrencia)) for modo, argumentos in MODOS.items()}
+
+    print(f"POST /reservar no gateway ({reservas} sequenciais, {2 * reservas} com concorrência {concorrencia}); ms\n")
+    print(f"{'':<28}{'http':>22}{'direto':>22}")
+    for cenario in ("sequencial", "concorrente"):
+        for campo in ("p50_ms", "p95_ms", "p99_ms"):
+            valores = [resultados[modo][cenario][campo] for modo in MODOS]
+            print(f"{cenario + ' ' + campo[:3]:<28}{valores[0]:>22}{valores[1]:>22}")
+    vazoes = [resultados[modo]["concorrente"]["vazao_rps"] for modo in MODOS]
+    print(f"{'concorrente req/s':<28}{vazoes[0]:>22}{vazoes[1]:>22}")
+    print("\netapas (sequencial, p50)")
+    for nome in resultados["http"]["etapas"]:
+        valores = [resultados[modo]["etapas"].get(nome, {}).get("p50_ms", "-") for modo in MODOS]
+        print(f"  {nome:<26}{valores[0]:>22}{valores[1]:>22}")
+    ganho = resultados["http"]["sequencial"]["p50_ms"] / resultados["direto"]["sequencial"]["p50_ms"]
+    print(f"\np50 sequencial: despacho direto {ganho:.2f}x mais rápido")
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark de geração de .ics (service/disparo_evento.py)
+Compara, em eventos por segundo, o caminho anterior (arquivo temporário
+gravado, relido e removido, com anexo em base64) com a geração em memória,
+por convite e em um único calendário com vários VEVENTs.
+
+Uso: python -m benchmarks.bench_ics [N]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from email import encoders
+from email.mime.base import MIMEBase
+
+from service import disparo_evento as servico
+from service.ics import gerar_calendario
+
+
+def gerar_dados(n: int):
+    base = datetime(2025, 1, 1, 7, 0)
+    for i in range(n):
+        inicio = base + timedelta(hours=i)
+        yield servico.DadosEvento(
+            email="bench@example.com",
+            titulo=f"Reserva de Sala - LAB-{i % 50:02d}",
+            descricao="Reserva da sala Laboratório de Informática, bloco B; 2º andar",
+            local=f"LAB-{i % 50:02d}",
+            data=inicio.strftime("%Y-%m-%d"),
+            hora_inicio=inicio.strftime("%H:%M"),
+            hora_fim=(inicio + timedelta(minutes=50)).strftime("%H:%M"),
+            organizador="Bench",
+        )
+
+
+def anexar(conteudo: bytes) -> MIMEBase:
+    parte = MIMEBase("text", "calendar", method="REQUEST", name="reserva.ics")
+    parte.set_payload(conteudo)
+    encoders.encode_base64(parte)
+    return parte
+
+
+def caminho_anterior(dados: servico.DadosEvento) -> MIMEBase:
+    """Algoritmo anterior: template f-string, arquivo temporário, releitura e remoção"""
+    inicio = datetime.strptime(f"{dados.data} {dados.hora_inicio}", "%Y-%m-%d %H:%M")
+    fim = datetime.strptime(f"{dados.data} {dados.hora_fim}", "%Y-%m-%d %H:%M")
+    conteudo_ics = f"""BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//Sistema de Reservas//Disparo de Evento//PT-BR
+BEGIN:VEVENT
+UID:{dados.email}-{inicio.strftime('%Y%m%dT%H%M%S')}
+DTSTAMP:{datetime.now().strftime('%Y%m%dT%H%M%SZ')}
+DTSTART:{inicio.strftime('%Y%m%dT%H%M%S')}
+DTEND:{fim.strftime('%Y%m%dT%H%M%S')}
+SUMMARY:{dados.titulo}
+DESCRIPTION:{dados.descricao}
+LOCATION:{dados.local}
+ORGANIZER;CN={dados.organizador}:MAILTO:{dados.email}
+END:VEVENT
+END:VCALENDAR
+""".strip()
+    arquivo_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".ics")
+    with open(arquivo_temp.name, "w", encoding="utf-8") as f:
+        f.write(conteudo_ics)
+    with open(arquivo_temp.name, "rb") as arquivo:
+        parte = anexar(arquivo.read())
+    os.remove(arquivo_temp.name)
+    return parte
+
+
+def caminho_memoria(dados: servico.DadosEvento) -> MIMEBase:
+    return anexar(servico.gerar_ics(dados))
+
+
+def medir(funcao, entradas) -> float:
+    t0 = time.perf_counter()
+    for dados in entradas:
+        funcao(dados)
+    return len(entradas) / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    entradas = list(gerar_dados(n))
+
+    anterior = medir(caminho_anterior, entradas)
+    memoria = medir(caminho_memoria, entradas)
+
+    t0 = time.perf_counter()
+    gerar_calendario([servico._campos_evento(dados) for dados in entradas])
+    lote = n / (time.perf_counter() - t0)
+
+    print(f"{n} eventos")
+    print(f"{'caminho':<34}{'eventos/s':>12}")
+    print(f"{'arquivo temporário (anterior)':<34}{anterior:>12.0f}")
+    print(f"{'memória, um convite por evento':<34}{memoria:>12.0f}")
+    print(f"{'memória, calendário em lote':<34}{lote:>12.0f}")
@@ -0,0 +1,79 @@
+"""
+Benchmark do custo das métricas (service/metricas.py)
+Mede o custo de uma observação em histograma/contador e o acréscimo por
+requisição do middleware de métricas, chamando o mesmo app ASGI com e sem
+instrumentação (sem rede nem httpx, para isolar o custo do middleware).
+
+Uso: python -m benchmarks.bench_metricas [requisicoes]
+"""
+
+import asyncio
+import sys
+import time
+
+from fastapi import FastAPI
+
+from service.metricas import RegistroMetricas, instrumentar
+
+
+def criar_app(instrumentado: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/salas/{sala_id}")
+    async def sala(sala_id: str):
+        return {"id": sala_id}
+
+    if instrumentado:
+        instrumentar(app)
+    return app
+
+
+async def chamar(app, n: int) -> float:
+    mensagens = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receber():
+        return mensagens[0]
+
+    async def enviar(mensagem):
+        pass
+
+    escopo = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/salas/LAB-01", "raw_path": b"/salas/LAB-01", "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    # aquecimento (monta a pilha de middlewares)
+    for _ in range(200):
+        await app(dict(escopo), receber, enviar)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await app(dict(escopo), receber, enviar)
+    return (time.perf_counter() - t0) / n
+
+
+def custo_observacao(n: int = 200_000):
+    registro = RegistroMetricas()
+    histograma = registro.histograma("bench_duracao_segundos", "bench", ("rota",))
+    contador = registro.contador("bench_total", "bench", ("rota", "codigo"))
+    t0 = time.perf_counter()
+    for _ in range(n):
+        histograma.observar(0.0042, "/salas/{sala_id}")
+    t_hist = (time.perf_counter() - t0) / n
+    t0 = time.perf_counter()
+    for _ in range(n):
+        contador.inc("/salas/{sala_id}", "200")
+    t_cont = (time.perf_counter() - t0) / n
+    return t_hist, t_cont
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    t_hist, t_cont = custo_observacao()
+    sem = asyncio.run(chamar(criar_app(False), n))
+    com = asyncio.run(chamar(criar_app(True), n))
+
+    print(f"histograma.observar: {t_hist * 1e9:.0f} ns   contador.inc: {t_cont * 1e9:.0f} ns")
+    print(f"{'app':<22}{'µs/requisição':>15}")
+    print(f"{'sem métricas':<22}{sem * 1e6:>15.1f}")
+    print(f"{'com métricas':<22}{com * 1e6:>15.1f}")
+    print(f"acréscimo: {(com - sem) * 1e6:.1f} µs por requisição ({(com / sem - 1) * 100:.1f}%)")
@@ -0,0 +1,74 @@
+"""
+Benchmark de inserção do serviço de reserva (service/reserva.py)
+Mede o custo médio por inserção em faixas sucessivas, à medida que o banco
+cresce, comparando o índice por (sala, data) com a varredura linear antiga.
+
+Uso: python -m benchmarks.bench_reserva
+"""
+
+import time
+from datetime import date, timedelta
+
+from service import reserva as servico
+
+SALAS = [f"SALA-{i:03d}" for i in range(50)]
+FAIXA = 5_000
+TOTAL = 100_000
+TOTAL_LINEAR = 20_000
+
+
+def gerar_entradas(n: int):
+    """Reservas de 1h sem conflito, espalhadas por salas, dias e horários"""
+    base = date(2025, 1, 1)
+    for i in range(n):
+        sala = SALAS[i % len(SALAS)]
+        slot = i // len(SALAS)
+        dia = base + timedelta(days=slot // 12)
+        hora = 7 + slot % 12
+        yield servico.ReservaEntrada(
+            sala_id=sala,
+            data=dia.isoformat(),
+            hora_inicio=f"{hora:02d}:00",
+            hora_fim=f"{hora:02d}:50",
+            usuario_nome="Bench",
+            usuario_email="bench@example.com",
+        )
+
+
+def registrar_linear(db, reserva):
+    """Algoritmo anterior: varre o banco inteiro a cada inserção"""
+    inicio = f"{reserva.data} {reserva.hora_inicio}"
+    for r in db:
+        if r["sala_id"] == reserva.sala_id and r["inicio"] == inicio:
+            raise ValueError("duplicada")
+    db.append({"sala_id": reserva.sala_id, "inicio": inicio})
+
+
+def medir(inserir, entradas):
+    faixas = []
+    t0 = time.perf_counter()
+    for i, entrada in enumerate(entradas, 1):
+        inserir(entrada)
+        if i % FAIXA == 0:
+            t1 = time.perf_counter()
+            faixas.append((i, (t1 - t0) / FAIXA * 1e6))
+            t0 = t1
+    return faixas
+
+
+if __name__ == "__main__":
+    entradas = list(gerar_entradas(TOTAL))
+
+    servico.confirmacoes_db.clear()
+    servico.indice_reservas.clear()
+    indexado = medir(servico.registrar_reserva, entradas)
+
+    db = []
+    linear = dict(medir(lambda r: registrar_linear(db, r), entradas[:TOTAL_LINEAR]))
+
+    print(f"{'reservas':>9} | {'indexado µs/ins':>15} | {'linear µs/ins':>13}")
+    for n, custo in indexado:
+        anterior = f"{linear[n]:13.1f}" if n in linear else f"{'-':>13}"
+        print(f"{n:>9} | {custo:15.1f} | {anterior}")
+    total_s = sum(c for _, c in indexado) * FAIXA / 1e6
+    print(f"\nthroughput indexado: {TOTAL / total_s:,.0f} reservas/s")
@@ -0,0 +1,89 @@
+"""
+Benchmark de reserva em lote pelo gateway (service/main.py)
+Compara N chamadas a POST /reservar com uma única chamada a
+POST /reservar/lote, em reservas por segundo. Todos os serviços rodam no
+mesmo processo (transporte ASGI), então o número mede o custo da
+orquestração e não da rede.
+
+Uso: python -m benchmarks.bench_reserva_lote [N]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from service import consultar_salas, disparo_de_email, disparo_evento, main, reserva, verificar_disponibilidade
+
+SALAS = ["LAB-01", "LAB-02", "SALA-01"]
+APPS = {
+    "consulta_sala": consultar_salas.app,
+    "verificar_disponibilidade": verificar_disponibilidade.app,
+    "reservar_sala": reserva.app,
+    "disparo_email": disparo_de_email.app,
+    "disparo_evento": disparo_evento.app,
+}
+
+
+def gerar_reservas(n: int, base: date):
+    """Reservas de 1h sem conflito, espalhadas por salas, dias e horários"""
+    for i in range(n):
+        slot = i // len(SALAS)
+        dia = base + timedelta(days=slot // 12)
+        hora = 7 + slot % 12
+        yield {
+            "sala_id": SALAS[i % len(SALAS)],
+            "data": dia.isoformat(),
+            "hora_inicio": f"{hora:02d}:00",
+            "hora_fim": f"{hora:02d}:50",
+            "usuario_nome": "Bench",
+            "usuario_email": "bench@example.com",
+        }
+
+
+async def medir(n: int):
+    await main.clientes.usar_transportes({nome: httpx.ASGITransport(app=app) for nome, app in APPS.items()})
+    await main.despachante.iniciar()
+    await disparo_de_email.caixa_saida.iniciar()
+    gateway = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app), base_url="http://gateway", timeout=None
+    )
+
+    try:
+        # Uma chamada por reserva (notificações em background nos dois casos)
+        individuais = list(gerar_reservas(n, date(2030, 1, 1)))
+        t0 = time.perf_counter()
+        for item in individuais:
+            response = await gateway.post("/reservar", params={"notificacao": "background"}, json=item)
+            response.raise_for_status()
+        t_individual = time.perf_counter() - t0
+
+        # Uma única chamada para o lote inteiro
+        lote = list(gerar_reservas(n, date(2040, 1, 1)))
+        t0 = time.perf_counter()
+        response = await gateway.post("/reservar/lote", json={"reservas": lote, "modo": "tudo_ou_nada"})
+        response.raise_for_status()
+        t_lote = time.perf_counter() - t0
+        assert response.json()["registradas"] == n
+    finally:
+        await gateway.aclose()
+        await main.despachante.parar()
+        await disparo_de_email.caixa_saida.parar()
+        await main.clientes.fechar()
+
+    return t_individual, t_lote
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    t_individual, t_lote = asyncio.run(medir(n))
+
+    print(f"{n} reservas")
+    print(f"{'modo':<20}{'total (s)':>12}{'reservas/s':>14}")
+    print(f"{'POST /reservar':<20}{t_individual:>12.3f}{n / t_individual:>14.0f}")
+    print(f"{'POST /reservar/lote':<20}{t_lote:>12.3f}{n / t_lote:>14.0f}")
+    print(f"ganho: {t_individual / t_lote:.1f}x")
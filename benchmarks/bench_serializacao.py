@@ -0,0 +1,130 @@
+"""
+Benchmark de serialização das respostas (service/respostas.py)
+Para cada endpoint, compara o caminho padrão do FastAPI (serialize_response
+com o response_model, quando existe, + jsonable_encoder + JSONResponse) com
+o caminho novo: corpo estático pré-serializado nos health checks e
+resposta_confiavel (serializar direto, sem validação) nos demais.
+
+Uso: python -m benchmarks.bench_serializacao [repeticoes]
+"""
+
+import asyncio
+import sys
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from service import main, reserva, verificar_disponibilidade
+from service.respostas import CorpoEstatico, orjson, resposta_confiavel
+
+
+def campo_resposta(app, caminho: str, metodo: str):
+    """ModelField do response_model da rota (None se a rota não declara um)"""
+    for rota in app.routes:
+        if isinstance(rota, APIRoute) and rota.path == caminho and metodo in rota.methods:
+            return rota.response_field
+    raise LookupError(f"{metodo} {caminho}")
+
+
+def registros_reserva(n: int):
+    return [
+        {
+            "reserva_id": i,
+            "sala_id": f"LAB-{i % 20:02d}",
+            "inicio": f"2030-01-{1 + i % 28:02d} {7 + i % 12:02d}:00",
+            "fim": f"2030-01-{1 + i % 28:02d} {7 + i % 12:02d}:50",
+            "status": "CONFIRMADA",
+            "confirmado_em": "2030-01-01 08:00:00",
+            "usuario_email": f"usuario{i % 50}@example.com",
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def cenarios():
+    """(nome, app, caminho, método, corpo) — um por endpoint medido"""
+    pagina = registros_reserva(1000)
+    resultados = [
+        {"id_sala": r["sala_id"], "disponivel": i % 3 != 0, "mensagem": "Sala disponível no horário solicitado."}
+        for i, r in enumerate(pagina)
+    ]
+    return [
+        ("gateway GET /", main.app, "/", "GET", {
+            "status": "online",
+            "servico": "Gateway - Sistema de Reserva de Salas",
+            "versao": "1.0.0",
+            "porta": 8010,
+        }),
+        ("reserva GET /health", reserva.app, "/health", "GET", {"status": "ok"}),
+        ("gateway POST /reservar", main.app, "/reservar", "POST", {
+            "status": "sucesso",
+            "mensagem": "Reserva confirmada",
+            "reserva": {
+                "reserva_id": 1,
+                "sala_id": "LAB-01",
+                "sala_nome": "Laboratório 1",
+                "usuario": "Usuário",
+                "data": "2030-01-01",
+                "horario": "10:00 - 11:00",
+                "email_enviado": True,
+                "evento_enviado": True,
+            },
+        }),
+        ("reserva POST /reservar", reserva.app, "/reservar", "POST", {
+            "mensagem": "Reserva registrada com sucesso!",
+            "reserva_id": 1,
+            "detalhes": pagina[0],
+        }),
+        ("reserva GET /confirmacoes (1000)", reserva.app, "/confirmacoes", "GET", {
+            "itens": pagina,
+            "proximo_cursor": "WzEwMDBd",
+        }),
+        ("disp. POST /verificar/lote (1000)", verificar_disponibilidade.app, "/verificar/lote", "POST", {
+            "total": len(resultados),
+            "disponiveis": sum(1 for r in resultados if r["disponivel"]),
+            "resultados": resultados,
+        }),
+    ]
+
+
+async def caminho_padrao(campo, corpo) -> bytes:
+    conteudo = await serialize_response(field=campo, response_content=corpo, is_coroutine=False)
+    return JSONResponse(conteudo).body
+
+
+async def medir(repeticoes: int):
+    linhas = []
+    for nome, app, caminho, metodo, corpo in cenarios():
+        campo = campo_resposta(app, caminho, metodo)
+        estatico = CorpoEstatico(corpo) if caminho in ("/", "/health") else None
+
+        t0 = time.perf_counter()
+        for _ in range(repeticoes):
+            await caminho_padrao(campo, corpo)
+        t_padrao = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if estatico is not None:
+            for _ in range(repeticoes):
+                estatico.resposta()
+        else:
+            for _ in range(repeticoes):
+                resposta_confiavel(corpo)
+        t_rapido = time.perf_counter() - t0
+
+        linhas.append((nome, campo is not None, t_padrao / repeticoes, t_rapido / repeticoes))
+    return linhas
+
+
+if __name__ == "__main__":
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    linhas = asyncio.run(medir(repeticoes))
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json (biblioteca padrão)'}, {repeticoes} repetições")
+    print(f"{'endpoint':<36}{'modelo':>7}{'padrão (µs)':>13}{'rápido (µs)':>13}{'economia (µs)':>15}{'ganho':>8}")
+    for nome, tem_modelo, t_padrao, t_rapido in linhas:
+        print(
+            f"{nome:<36}{'sim' if tem_modelo else 'não':>7}{t_padrao * 1e6:>13.1f}{t_rapido * 1e6:>13.1f}"
+            f"{(t_padrao - t_rapido) * 1e6:>15.1f}{t_padrao / t_rapido:>7.1f}x"
+        )
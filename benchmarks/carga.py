@@ -0,0 +1,451 @@
+"""
+Teste de carga ponta a ponta do sistema de reservas
+Sobe a pilha inteira e dispara, com concorrência configurável, as
+requisições dos arquivos .http do repositório (requests.http e
+disparo_evento.http) misturadas a um tráfego gerado de reservas, buscas,
+feeds de calendário e consultas de status. Reporta vazão e p50/p95/p99 por
+endpoint e por etapa (lidas do cabeçalho Server-Timing) e grava o resultado
+em JSON para comparar execuções.
+
+Modos:
+  asgi    todos os serviços no mesmo processo deste script, ligados por
+          transporte ASGI (sem rede; mede o código dos serviços)
+  http    sobe `python run_all.py` e fala com 127.0.0.1:8001-8005/8010 via
+          HTTP de verdade; as portas precisam estar livres
+  direto  como http, mas com `run_all.py --direto` (o gateway chama os
+          serviços no próprio processo)
+
+Tudo roda em localhost: URLs dos arquivos .http que apontem para outro host
+são recusadas.
+
+Uso:
+  python -m benchmarks.carga [--modo asgi|http|direto] [--concorrencia 16]
+      [--requisicoes 2000] [--repeticoes-fixtures 3] [--saida arquivo.json]
+      [--comparar anterior.json] [--tolerancia 0.15]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = [os.path.join(RAIZ, "requests.http"), os.path.join(RAIZ, "disparo_evento.http")]
+
+PORTAS = {
+    8001: "consulta_sala",
+    8002: "verificar_disponibilidade",
+    8003: "reservar_sala",
+    8004: "disparo_email",
+    8005: "disparo_evento",
+    8010: "gateway",
+}
+HOSTS_LOCAIS = {"localhost", "127.0.0.1", "::1"}
+METODOS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+# (rotulo, metodo, porta, caminho, corpo)
+Requisicao = Tuple[str, str, int, str, Optional[dict]]
+
+
+# ================== FIXTURES (.http) ==================
+def ler_arquivo_http(caminho: str) -> List[Requisicao]:
+    """Requisições de um arquivo no formato do REST Client (blocos separados por ###)"""
+    with open(caminho, encoding="utf-8") as arquivo:
+        texto = arquivo.read()
+
+    requisicoes = []
+    for bloco in texto.split("###"):
+        # A primeira linha do bloco é o título que segue o ###
+        linhas = [linha for linha in bloco.splitlines()[1:] if not linha.lstrip().startswith(("#", "//"))]
+        while linhas and not linhas[0].strip():
+            linhas = linhas[1:]
+        if not linhas or linhas[0].split()[0] not in METODOS:
+            continue
+        metodo, url = linhas[0].split()[:2]
+        partes = urlsplit(url)
+        if partes.hostname not in HOSTS_LOCAIS:
+            raise ValueError(f"{os.path.basename(caminho)}: {url} não é localhost")
+        if partes.port not in PORTAS:
+            raise ValueError(f"{os.path.basename(caminho)}: porta {partes.port} não pertence à pilha")
+
+        resto = linhas[1:]
+        while resto and resto[0].strip() and ":" in resto[0]:
+            resto = resto[1:]  # cabeçalhos
+        corpo_texto = "\n".join(resto).strip()
+        corpo = json.loads(corpo_texto) if corpo_texto else None
+        caminho_url = partes.path + (f"?{partes.query}" if partes.query else "")
+        requisicoes.append((f"{metodo} :{partes.port}{partes.path}", metodo, partes.port, caminho_url, corpo))
+    return requisicoes
+
+
+# ================== TRÁFEGO GERADO ==================
+SALAS = ["LAB-01", "SALA-01", "LAB-01", "SALA-01", "LAB-02", "AUD-99"]  # LAB-02 indisponível, AUD-99 inexistente
+NOMES = ["Ana Souza", "Bruno Lima", "Carla Dias", "Diego Reis", "Elisa Melo", "Fábio Costa"]
+
+
+def _horario(rng: random.Random) -> Tuple[str, str, str]:
+    dia = date(2031, 1, 1) + timedelta(days=rng.randrange(60))
+    hora = rng.randrange(7, 22)
+    return dia.isoformat(), f"{hora:02d}:00", f"{hora:02d}:50"
+
+
+def gerar_mistura(n: int, rng: random.Random) -> List[Requisicao]:
+    """
+    Mistura de tráfego de um dia típico: metade reservas (com conflitos,
+    salas indisponíveis e inexistentes acontecendo naturalmente), buscas de
+    sala livre, feeds de calendário, consultas ao catálogo e status.
+    """
+    geradores = [
+        (45, _reserva),
+        (20, _busca),
+        (10, _calendario_sala),
+        (5, _calendario_usuario),
+        (8, lambda rng: ("GET :8001/salas", "GET", 8001, "/salas", None)),
+        (7, lambda rng: ("GET :8010/status", "GET", 8010, "/status", None)),
+        (5, lambda rng: ("GET :8010/", "GET", 8010, "/", None)),
+    ]
+    pesos = [peso for peso, _ in geradores]
+    escolhidos = rng.choices([gerador for _, gerador in geradores], weights=pesos, k=n)
+    return [gerador(rng) for gerador in escolhidos]
+
+
+def _reserva(rng: random.Random) -> Requisicao:
+    dia, inicio, fim = _horario(rng)
+    nome = rng.choice(NOMES)
+    corpo = {
+        "sala_id": rng.choice(SALAS),
+        "data": dia,
+        "hora_inicio": inicio,
+        "hora_fim": fim,
+        "usuario_nome": nome,
+        "usuario_email": nome.split()[0].lower() + "@example.com",
+    }
+    return "POST :8010/reservar", "POST", 8010, "/reservar", corpo
+
+
+def _busca(rng: random.Random) -> Requisicao:
+    dia, inicio, fim = _horario(rng)
+    corpo = {"data": dia, "hora_inicio": inicio, "hora_fim": fim, "capacidade_minima": rng.choice([1, 20, 35])}
+    if rng.random() < 0.3:
+        corpo["prefixo"] = "LAB"
+    return "POST :8010/salas/buscar", "POST", 8010, "/salas/buscar", corpo
+
+
+def _calendario_sala(rng: random.Random) -> Requisicao:
+    sala = rng.choice(["LAB-01", "SALA-01"])
+    return "GET :8010/salas/{sala_id}/calendar.ics", "GET", 8010, f"/salas/{sala}/calendar.ics", None
+
+
+def _calendario_usuario(rng: random.Random) -> Requisicao:
+    email = rng.choice(NOMES).split()[0].lower() + "@example.com"
+    return "GET :8010/usuarios/{email}/calendar.ics", "GET", 8010, f"/usuarios/{email}/calendar.ics", None
+
+
+# ================== PILHA ==================
+@contextlib.asynccontextmanager
+async def pilha_asgi(concorrencia: int):
+    """Todos os serviços neste processo; o gateway fala com eles por transporte ASGI"""
+    # Sem servidor HTTP não há feed de alterações para a verificação seguir
+    os.environ.setdefault("RESERVA_FEED_URL", "desligado")
+    from service import consultar_salas, disparo_de_email, disparo_evento, main, reserva, verificar_disponibilidade
+
+    apps = {
+        8001: consultar_salas.app,
+        8002: verificar_disponibilidade.app,
+        8003: reserva.app,
+        8004: disparo_de_email.app,
+        8005: disparo_evento.app,
+        8010: main.app,
+    }
+    await main.clientes.usar_transportes({
+        nome: httpx.ASGITransport(app=apps[porta]) for porta, nome in PORTAS.items() if nome != "gateway"
+    })
+
+    async with contextlib.AsyncExitStack() as pilha:
+        # O transporte ASGI não executa o lifespan dos apps: entra em cada um aqui
+        for porta in sorted(apps):
+            await pilha.enter_async_context(apps[porta].router.lifespan_context(apps[porta]))
+        clientes = {
+            porta: httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url=f"http://127.0.0.1:{porta}", timeout=30.0
+            )
+            for porta, app in apps.items()
+        }
+        try:
+            yield clientes
+        finally:
+            for cliente in clientes.values():
+                await cliente.aclose()
+
+
+def _porta_ocupada(porta: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.2)
+        return sock.connect_ex(("127.0.0.1", porta)) == 0
+
+
+@contextlib.asynccontextmanager
+async def pilha_http(concorrencia: int, argumentos: Tuple[str, ...] = (), prazo: float = 30.0):
+    """Sobe `run_all.py` num subprocesso e espera todas as portas responderem"""
+    ocupadas = [porta for porta in PORTAS if _porta_ocupada(porta)]
+    if ocupadas:
+        raise RuntimeError(f"Portas já em uso: {ocupadas}; encerre a pilha em execução antes do teste")
+
+    processo = subprocess.Popen(
+        [sys.executable, "run_all.py", *argumentos],
+        cwd=RAIZ,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    clientes = {
+        porta: httpx.AsyncClient(base_url=f"http://127.0.0.1:{porta}", timeout=30.0, limits=limites)
+        for porta in PORTAS
+    }
+    try:
+        limite = time.monotonic() + prazo
+        pendentes = set(PORTAS)
+        while pendentes:
+            if processo.poll() is not None:
+                raise RuntimeError(f"run_all.py terminou com código {processo.returncode}")
+            if time.monotonic() > limite:
+                raise RuntimeError(f"Serviços sem resposta após {prazo:.0f}s: {sorted(pendentes)}")
+            for porta in list(pendentes):
+                try:
+                    await clientes[porta].get("/", timeout=0.5)
+                    pendentes.discard(porta)
+                except httpx.HTTPError:
+                    pass
+            await asyncio.sleep(0.2)
+        yield clientes
+    finally:
+        for cliente in clientes.values():
+            await cliente.aclose()
+        if processo.poll() is None:
+            processo.send_signal(signal.SIGINT)
+            try:
+                processo.wait(10)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+                processo.wait()
+
+
+# ================== EXECUÇÃO ==================
+def ler_server_timing(valor: str) -> List[Tuple[str, float]]:
+    """Entradas `nome;dur=ms` do cabeçalho Server-Timing"""
+    entradas = []
+    for item in valor.split(","):
+        nome, _, parametros = item.strip().partition(";")
+        for parametro in parametros.split(";"):
+            chave, _, numero = parametro.strip().partition("=")
+            if chave == "dur" and nome:
+                entradas.append((nome, float(numero)))
+    return entradas
+
+
+class Resultados:
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.codigos: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.etapas: Dict[str, List[float]] = defaultdict(list)
+
+    def registrar(self, rotulo: str, porta: int, codigo: str, duracao_ms: float, server_timing: Optional[str]):
+        self.latencias[rotulo].append(duracao_ms)
+        self.codigos[rotulo][codigo] += 1
+        if server_timing:
+            for nome, dur in ler_server_timing(server_timing):
+                if nome != "total":
+                    self.etapas[f"{PORTAS[porta]}/{nome}"].append(dur)
+
+
+async def disparar(clientes, requisicoes: List[Requisicao], concorrencia: int, resultados: Resultados) -> float:
+    fila: asyncio.Queue = asyncio.Queue()
+    for requisicao in requisicoes:
+        fila.put_nowait(requisicao)
+
+    async def trabalhador():
+        while True:
+            try:
+                rotulo, metodo, porta, caminho, corpo = fila.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            inicio = time.perf_counter()
+            try:
+                response = await clientes[porta].request(metodo, caminho, json=corpo)
+                codigo, timing = str(response.status_code), response.headers.get("server-timing")
+            except httpx.HTTPError as e:
+                codigo, timing = type(e).__name__, None
+            resultados.registrar(rotulo, porta, codigo, (time.perf_counter() - inicio) * 1000, timing)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return time.perf_counter() - inicio
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil pelo posto mais próximo"""
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[min(indice, len(ordenados) - 1)]
+
+
+def resumir(amostras: List[float], duracao: Optional[float] = None) -> dict:
+    ordenados = sorted(amostras)
+    resumo = {
+        "n": len(ordenados),
+        "media_ms": round(sum(ordenados) / len(ordenados), 3),
+        "p50_ms": round(percentil(ordenados, 50), 3),
+        "p95_ms": round(percentil(ordenados, 95), 3),
+        "p99_ms": round(percentil(ordenados, 99), 3),
+        "max_ms": round(ordenados[-1], 3),
+    }
+    if duracao:
+        resumo["vazao_rps"] = round(len(ordenados) / duracao, 1)
+    return resumo
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def executar(args) -> dict:
+    rng = random.Random(args.semente)
+    fixtures = [requisicao for caminho in args.fixtures for requisicao in ler_arquivo_http(caminho)]
+    requisicoes = fixtures * args.repeticoes_fixtures + gerar_mistura(args.requisicoes, rng)
+    rng.shuffle(requisicoes)
+    aquecimento = gerar_mistura(args.aquecimento, random.Random(args.semente + 1))
+
+    if args.modo == "asgi":
+        pilha = pilha_asgi(args.concorrencia)
+    else:
+        pilha = pilha_http(args.concorrencia, ("--direto",) if args.modo == "direto" else ())
+    async with pilha as clientes:
+        await disparar(clientes, aquecimento, args.concorrencia, Resultados())
+        resultados = Resultados()
+        duracao = await disparar(clientes, requisicoes, args.concorrencia, resultados)
+
+    total = sum(len(amostras) for amostras in resultados.latencias.values())
+    return {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": sys.version.split()[0],
+        "config": {
+            "modo": args.modo,
+            "concorrencia": args.concorrencia,
+            "requisicoes_geradas": args.requisicoes,
+            "fixtures": [os.path.relpath(caminho, RAIZ) for caminho in args.fixtures],
+            "repeticoes_fixtures": args.repeticoes_fixtures,
+            "aquecimento": args.aquecimento,
+            "semente": args.semente,
+        },
+        "duracao_s": round(duracao, 3),
+        "requisicoes": total,
+        "vazao_rps": round(total / duracao, 1),
+        "endpoints": {
+            rotulo: {**resumir(amostras, duracao), "codigos": dict(resultados.codigos[rotulo])}
+            for rotulo, amostras in sorted(resultados.latencias.items())
+        },
+        "etapas": {nome: resumir(amostras) for nome, amostras in sorted(resultados.etapas.items())},
+    }
+
+
+# ================== RELATÓRIO ==================
+def imprimir(resultado: dict) -> None:
+    config = resultado["config"]
+    print(
+        f"modo={config['modo']} concorrência={config['concorrencia']} "
+        f"{resultado['requisicoes']} requisições em {resultado['duracao_s']}s -> {resultado['vazao_rps']} req/s"
+    )
+    print(f"\n{'endpoint':<44}{'n':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}  códigos")
+    for rotulo, r in resultado["endpoints"].items():
+        codigos = " ".join(f"{codigo}:{n}" for codigo, n in sorted(r["codigos"].items()))
+        print(f"{rotulo:<44}{r['n']:>6}{r['vazao_rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}  {codigos}")
+    print(f"\n{'etapa (Server-Timing)':<44}{'n':>6}{'':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for nome, r in resultado["etapas"].items():
+        print(f"{nome:<44}{r['n']:>6}{'':>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+    print("\n(latências em ms)")
+
+
+FOLGA_MS = 1.0
+
+
+def comparar(anterior: dict, atual: dict, tolerancia: float) -> List[str]:
+    """
+    Regressões de p50/p99 por endpoint e etapa e de vazão total além da
+    tolerância; pioras de menos de FOLGA_MS são ignoradas (ruído de medição).
+    """
+    regressoes = []
+    if anterior.get("config") != atual["config"]:
+        print("aviso: as execuções comparadas usaram configurações diferentes")
+    if atual["vazao_rps"] < anterior["vazao_rps"] * (1 - tolerancia):
+        regressoes.append(f"vazão total: {anterior['vazao_rps']} -> {atual['vazao_rps']} req/s")
+    for secao in ("endpoints", "etapas"):
+        for nome, antes in anterior.get(secao, {}).items():
+            depois = atual[secao].get(nome)
+            if depois is None:
+                continue
+            for campo in ("p50_ms", "p99_ms"):
+                if depois[campo] > antes[campo] * (1 + tolerancia) and depois[campo] - antes[campo] >= FOLGA_MS:
+                    regressoes.append(f"{nome} {campo[:3]}: {antes[campo]} -> {depois[campo]} ms")
+    return regressoes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga ponta a ponta (somente localhost)")
+    parser.add_argument("--modo", choices=("asgi", "http", "direto"), default="asgi")
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--requisicoes", type=int, default=2000, help="requisições geradas (mistura de reservas)")
+    parser.add_argument("--fixtures", nargs="*", default=FIXTURES, help="arquivos .http a repetir")
+    parser.add_argument("--repeticoes-fixtures", type=int, default=3)
+    parser.add_argument("--aquecimento", type=int, default=100)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON do resultado (padrão: benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="resultado JSON anterior para checar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="piora relativa aceita na comparação")
+    args = parser.parse_args()
+
+    # Os serviços registram cada reserva recusada como erro; no teste isso é só ruído
+    logging.disable(logging.CRITICAL)
+    resultado = asyncio.run(executar(args))
+    imprimir(resultado)
+
+    saida = args.saida or os.path.join(
+        RAIZ, "benchmarks", "resultados", f"carga-{args.modo}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"resultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(json.load(arquivo), resultado, args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        print("FALHA: regressões acima da tolerância" if regressoes else "OK: sem regressões acima da tolerância")
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Verificação de concorrência da reserva atômica
+Dispara centenas de reservas simultâneas para o mesmo horário/sala contra o
+serviço de reserva (em processo, via threadpool como no uvicorn) e confere
+que exatamente uma é registrada e todas as outras recebem 409.
+
+Uso: python -m benchmarks.concorrencia_reserva [quantidade]
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from service import reserva as servico
+
+PEDIDO = {
+    "sala_id": "LAB-01",
+    "data": "2030-01-15",
+    "hora_inicio": "10:00",
+    "hora_fim": "12:00",
+    "usuario_nome": "Concorrência",
+    "usuario_email": "concorrencia@example.com",
+}
+
+
+def disparar(quantidade: int) -> dict:
+    with TestClient(servico.app) as cliente:
+        def reservar(i: int) -> int:
+            # Horários sobrepostos, mas não idênticos, para exercitar a checagem de sobreposição
+            minuto = i % 60
+            pedido = dict(PEDIDO, hora_inicio=f"10:{minuto:02d}", usuario_nome=f"Usuário {i}")
+            return cliente.post("/reservar", json=pedido).status_code
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(quantidade, 64)) as executor:
+            codigos = list(executor.map(reservar, range(quantidade)))
+        duracao = time.perf_counter() - t0
+
+    return {
+        "pedidos": quantidade,
+        "registradas": codigos.count(200),
+        "conflitos": codigos.count(409),
+        "outros": len(codigos) - codigos.count(200) - codigos.count(409),
+        "duracao_s": round(duracao, 3),
+    }
+
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    resultado = disparar(quantidade)
+    print(resultado)
+    ok = resultado["registradas"] == 1 and resultado["conflitos"] == quantidade - 1
+    print("OK: exatamente uma reserva venceu" if ok else "FALHA: mais de uma (ou nenhuma) reserva registrada")
+    sys.exit(0 if ok else 1)
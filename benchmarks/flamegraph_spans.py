@@ -0,0 +1,49 @@
+"""
+Converte o JSONL de spans (RASTREAMENTO_ARQUIVO) em pilhas "dobradas" para
+flame graph (formato aceito pelo flamegraph.pl, speedscope e inferno): uma
+linha por pilha, com o tempo próprio somado em microssegundos.
+
+Uso: python -m benchmarks.flamegraph_spans spans.jsonl > reservas.folded
+"""
+
+import json
+import sys
+from collections import defaultdict
+
+
+def carregar(caminho: str):
+    spans = {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                span = json.loads(linha)
+                spans[(span["trace_id"], span["span_id"])] = span
+    return spans
+
+
+def dobrar(spans: dict) -> dict:
+    filhos = defaultdict(float)
+    for span in spans.values():
+        if span["pai_id"] is not None:
+            filhos[(span["trace_id"], span["pai_id"])] += span["duracao_ms"]
+
+    pilhas = defaultdict(float)
+    for chave, span in spans.items():
+        quadros = []
+        atual = span
+        while atual is not None:
+            quadros.append(f"{atual['servico']}:{atual['nome']}".replace(";", ","))
+            pai = atual["pai_id"]
+            atual = spans.get((atual["trace_id"], pai)) if pai is not None else None
+        proprio = max(0.0, span["duracao_ms"] - filhos.get(chave, 0.0))
+        pilhas[";".join(reversed(quadros))] += proprio * 1000
+    return pilhas
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        sys.exit(2)
+    for pilha, micros in sorted(dobrar(carregar(sys.argv[1])).items()):
+        if micros >= 1:
+            print(f"{pilha} {int(micros)}")
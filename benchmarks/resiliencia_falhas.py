@@ -0,0 +1,186 @@
+"""
+Verificação da camada de resiliência do gateway (service/resiliencia.py)
+Sobe um serviço falso em processo (transporte ASGI) que injeta latência e
+erros sob comando e confere, cenário a cenário:
+  - o disjuntor abre com erros, passa a recusar na hora e fecha quando o
+    serviço volta;
+  - chamadas lentas (acima de limite_lento) também abrem o disjuntor;
+  - as retentativas não passam do orçamento mesmo com 100% de erro;
+  - o hedge corta a cauda de latência de leituras;
+  - no gateway, um serviço de email lento deixa de atrasar o /reservar.
+
+Uso: python -m benchmarks.resiliencia_falhas
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Response
+
+from service import consultar_salas, disparo_evento, main, reserva, verificar_disponibilidade
+from service.clientes import ConfigServico, PoolClientes
+from service.resiliencia import ABERTO, FECHADO, CircuitoAberto, PoliticaResiliencia, ServicoResiliente
+
+# ================== SERVIÇO FALSO ==================
+falso = FastAPI()
+falhas = {"atraso": 0.0, "atraso_cauda": 0.0, "prob_cauda": 0.0, "prob_erro": 0.0, "chamadas": 0}
+
+
+@falso.api_route("/{caminho:path}", methods=["GET", "POST"])
+async def responder(caminho: str):
+    falhas["chamadas"] += 1
+    atraso = falhas["atraso"]
+    if random.random() < falhas["prob_cauda"]:
+        atraso = falhas["atraso_cauda"]
+    if atraso:
+        await asyncio.sleep(atraso)
+    if random.random() < falhas["prob_erro"]:
+        return Response(status_code=503)
+    return {"ok": True, "email_id": "falso"}
+
+
+def injetar(**valores) -> None:
+    falhas.update({"atraso": 0.0, "atraso_cauda": 0.0, "prob_cauda": 0.0, "prob_erro": 0.0, "chamadas": 0})
+    falhas.update(valores)
+
+
+def pool_falso() -> PoolClientes:
+    return PoolClientes({"falso": ConfigServico("http://falso", transporte=httpx.ASGITransport(app=falso))})
+
+
+async def chamar(servico: ServicoResiliente, **kwargs):
+    inicio = time.perf_counter()
+    try:
+        response = await servico.requisitar("GET", "/item", **kwargs)
+        resultado = response.status_code
+    except CircuitoAberto:
+        resultado = "recusada"
+    except httpx.HTTPError:
+        resultado = "erro"
+    return resultado, time.perf_counter() - inicio
+
+
+# ================== CENÁRIOS ==================
+async def cenario_disjuntor(pool) -> bool:
+    servico = ServicoResiliente("falso", pool, PoliticaResiliencia(tempo_aberto=0.3))
+    injetar(prob_erro=1.0)
+    for _ in range(5):
+        await chamar(servico)
+    aberto = servico.disjuntor.estado == ABERTO
+    chamadas_antes = falhas["chamadas"]
+    resultado, duracao = await chamar(servico)
+    recusa_rapida = resultado == "recusada" and duracao < 0.005 and falhas["chamadas"] == chamadas_antes
+
+    injetar()
+    await asyncio.sleep(0.35)
+    resultado, _ = await chamar(servico)
+    fechou = resultado == 200 and servico.disjuntor.estado == FECHADO
+    print(f"disjuntor: abriu={aberto} recusa_em={duracao * 1000:.2f}ms fechou_apos_recuperar={fechou}")
+    return aberto and recusa_rapida and fechou
+
+
+async def cenario_lentidao(pool) -> bool:
+    servico = ServicoResiliente("falso", pool, PoliticaResiliencia(limite_lento=0.05))
+    injetar(atraso=0.1)
+    for _ in range(5):
+        await chamar(servico)
+    resultado, duracao = await chamar(servico)
+    ok = servico.disjuntor.estado == ABERTO and resultado == "recusada"
+    print(f"lentidão: estado={servico.disjuntor.estado} próxima chamada em {duracao * 1000:.2f}ms")
+    return ok
+
+
+async def cenario_orcamento(pool) -> bool:
+    # Disjuntor praticamente desligado para isolar o orçamento
+    politica = PoliticaResiliencia(tentativas=3, backoff=0.0, minimo_chamadas=10**9, maximo_retentativas=5)
+    servico = ServicoResiliente("falso", pool, politica)
+    injetar(prob_erro=1.0)
+    n = 200
+    for _ in range(n):
+        await chamar(servico, idempotente=True)
+    limite = n + n * politica.proporcao_retentativas + politica.maximo_retentativas
+    ok = falhas["chamadas"] <= limite
+    print(
+        f"orçamento: {n} chamadas -> {falhas['chamadas']} requisições ao serviço "
+        f"(sem orçamento seriam {n * politica.tentativas}; limite {limite:.0f})"
+    )
+    return ok
+
+
+async def cenario_hedge(pool) -> bool:
+    async def medir(politica):
+        servico = ServicoResiliente("falso", pool, politica)
+        random.seed(7)
+        duracoes = sorted([(await chamar(servico, idempotente=True, hedge=True))[1] for _ in range(300)])
+        return duracoes[int(len(duracoes) * 0.99)], servico.hedges
+
+    injetar(atraso=0.002, atraso_cauda=0.2, prob_cauda=0.05)
+    sem, _ = await medir(PoliticaResiliencia(minimo_chamadas=10**9))
+    com, hedges = await medir(PoliticaResiliencia(minimo_chamadas=10**9, hedge_apos=0.02, maximo_retentativas=50))
+    print(f"hedge: p99 sem={sem * 1000:.1f}ms com={com * 1000:.1f}ms ({hedges} hedges)")
+    return com < sem / 2
+
+
+async def cenario_gateway() -> bool:
+    apps = {
+        "consulta_sala": consultar_salas.app,
+        "verificar_disponibilidade": verificar_disponibilidade.app,
+        "reservar_sala": reserva.app,
+        "disparo_evento": disparo_evento.app,
+    }
+    await main.clientes.usar_transportes({
+        **{nome: httpx.ASGITransport(app=app) for nome, app in apps.items()},
+        "disparo_email": httpx.ASGITransport(app=falso),
+    })
+    gateway = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://gateway", timeout=None)
+    injetar(atraso=main.LIMITE_LENTO_NOTIFICACAO + 0.2)
+
+    duracoes = []
+    try:
+        for i in range(8):
+            pedido = {
+                "sala_id": "LAB-01",
+                "data": "2031-03-01",
+                "hora_inicio": f"{8 + i:02d}:00",
+                "hora_fim": f"{8 + i:02d}:50",
+                "usuario_nome": "Resiliência",
+                "usuario_email": "resiliencia@example.com",
+            }
+            inicio = time.perf_counter()
+            response = await gateway.post("/reservar", params={"notificacao": "concorrente"}, json=pedido)
+            duracoes.append(time.perf_counter() - inicio)
+            assert response.status_code == 200, response.text
+        estado = (await gateway.get("/resiliencia")).json()["disparo_email"]["disjuntor"]["estado"]
+    finally:
+        await gateway.aclose()
+        await main.clientes.fechar()
+
+    print(
+        f"gateway: /reservar com email lento {duracoes[0] * 1000:.0f}ms -> "
+        f"{duracoes[-1] * 1000:.0f}ms com o disjuntor {estado}"
+    )
+    return estado == ABERTO and duracoes[-1] < main.LIMITE_LENTO_NOTIFICACAO
+
+
+async def executar() -> bool:
+    pool = pool_falso()
+    resultados = [
+        await cenario_disjuntor(pool),
+        await cenario_lentidao(pool),
+        await cenario_orcamento(pool),
+        await cenario_hedge(pool),
+        await cenario_gateway(),
+    ]
+    await pool.fechar()
+    return all(resultados)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    ok = asyncio.run(executar())
+    print("OK: todos os cenários passaram" if ok else "FALHA: algum cenário não se comportou como esperado")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,139 @@
+"""
+Verificação da caixa de saída de emails contra um servidor SMTP local
+Sobe um servidor aiosmtpd em processo (que recusa alguns destinatários sob
+comando) e confere, cenário a cenário:
+  - um lote de emails sai por uma única sessão SMTP;
+  - uma recusa temporária (4xx) volta para a fila com backoff crescente e
+    a mensagem é entregue quando o servidor aceita;
+  - uma recusa permanente (5xx) vai direto para a lista de mortas.
+
+Requer aiosmtpd (requirements-dev.txt).
+Uso: python -m benchmarks.smtp_caixa_saida
+"""
+
+import asyncio
+import logging
+import socket
+import sys
+import time
+
+from aiosmtpd.controller import Controller
+
+from service.caixa_saida import CaixaSaida, EnviadorSMTP, MensagemEmail
+
+TEMPORARIO = "temporario@example.com"
+PERMANENTE = "inexistente@example.com"
+RECUSAS_TEMPORARIAS = 2
+BACKOFF = 0.2
+
+
+class Servidor:
+    """Handler do aiosmtpd: guarda o que recebeu e em qual sessão (conexão)"""
+
+    def __init__(self):
+        self.recebidas = []   # (sessão, destinatário)
+        self.tentativas = {}  # destinatário -> instantes das tentativas
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.tentativas.setdefault(address, []).append(time.monotonic())
+        if address == PERMANENTE:
+            return "550 Destinatário inexistente"
+        if address == TEMPORARIO and len(self.tentativas[address]) <= RECUSAS_TEMPORARIAS:
+            return "451 Tente mais tarde"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        for destinatario in envelope.rcpt_tos:
+            self.recebidas.append((id(session), destinatario))
+        return "250 Mensagem aceita"
+
+
+def porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def esperar(condicao, prazo: float = 5.0) -> bool:
+    limite = time.monotonic() + prazo
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        await asyncio.sleep(0.02)
+    return condicao()
+
+
+async def lote_uma_sessao(servidor: Servidor, porta: int) -> bool:
+    enviador = EnviadorSMTP("127.0.0.1", porta)
+    caixa = CaixaSaida(enviador, tamanho_lote=50, espera_lote=0.05)
+    await caixa.iniciar()
+    for i in range(20):
+        caixa.enfileirar(MensagemEmail(f"usuario{i}@example.com", f"Reserva {i}", "Confirmada"))
+    entregues = await esperar(lambda: caixa.enviadas == 20)
+    sessoes = {sessao for sessao, _ in servidor.recebidas}
+    await caixa.parar()
+    ok = entregues and len(servidor.recebidas) == 20 and len(sessoes) == 1 and enviador.conexoes_abertas == 1
+    print(f"lote: {len(servidor.recebidas)} emails em {caixa.lotes} lote(s), "
+          f"{len(sessoes)} sessão(ões) SMTP, {enviador.conexoes_abertas} conexão(ões) -> {'OK' if ok else 'FALHA'}")
+    return ok
+
+
+async def falha_temporaria(servidor: Servidor, porta: int) -> bool:
+    caixa = CaixaSaida(EnviadorSMTP("127.0.0.1", porta), backoff_base=BACKOFF, max_tentativas=5)
+    await caixa.iniciar()
+    mensagem = MensagemEmail(TEMPORARIO, "Reserva", "Confirmada")
+    caixa.enfileirar(mensagem)
+    entregue = await esperar(lambda: caixa.enviadas == 1)
+    await caixa.parar()
+    instantes = servidor.tentativas.get(TEMPORARIO, [])
+    intervalos = [b - a for a, b in zip(instantes, instantes[1:])]
+    # Backoff exponencial: ~BACKOFF e ~2*BACKOFF entre as três tentativas
+    crescente = (
+        len(intervalos) == RECUSAS_TEMPORARIAS
+        and intervalos[0] >= BACKOFF * 0.9
+        and intervalos[1] >= intervalos[0] * 1.5
+    )
+    ok = entregue and mensagem.tentativas == RECUSAS_TEMPORARIAS + 1 and crescente and not caixa.mortas
+    print(f"temporária: entregue na tentativa {mensagem.tentativas}, intervalos "
+          f"{', '.join(f'{i:.2f}s' for i in intervalos)} -> {'OK' if ok else 'FALHA'}")
+    return ok
+
+
+async def falha_permanente(servidor: Servidor, porta: int) -> bool:
+    caixa = CaixaSaida(EnviadorSMTP("127.0.0.1", porta), backoff_base=BACKOFF, max_tentativas=5)
+    await caixa.iniciar()
+    caixa.enfileirar(MensagemEmail(PERMANENTE, "Reserva", "Confirmada"))
+    morta = await esperar(lambda: len(caixa.mortas) == 1)
+    await asyncio.sleep(BACKOFF * 2)  # não pode haver nova tentativa
+    await caixa.parar()
+    ok = (
+        morta
+        and caixa.mortas[0].tentativas == 1
+        and len(servidor.tentativas.get(PERMANENTE, [])) == 1
+        and caixa.enviadas == 0
+    )
+    print(f"permanente: {len(caixa.mortas)} morta(s) após {len(servidor.tentativas.get(PERMANENTE, []))} "
+          f"tentativa(s) ({caixa.mortas[0].ultimo_erro if caixa.mortas else '-'}) -> {'OK' if ok else 'FALHA'}")
+    return ok
+
+
+async def executar() -> bool:
+    resultados = []
+    for cenario in (lote_uma_sessao, falha_temporaria, falha_permanente):
+        servidor = Servidor()
+        porta = porta_livre()
+        controlador = Controller(servidor, hostname="127.0.0.1", port=porta)
+        controlador.start()
+        try:
+            resultados.append(await cenario(servidor, porta))
+        finally:
+            controlador.stop()
+    return all(resultados)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.ERROR)
+    ok = asyncio.run(executar())
+    print("OK: todos os cenários passaram" if ok else "FALHA: algum cenário não se comportou como esperado")
+    sys.exit(0 if ok else 1)
@@ -1,31 +1,116 @@
-import threading, time
+import argparse, asyncio, threading, time
 import uvicorn
+from uvicorn.importer import import_from_string
 
-from service.consultar_salas import app as consultar_sala_app
-from service.disparo_de_email import app as disparo_email_app
-from service.disparo_evento import app as disparo_evento_app
-from service.reserva import app as reserva_app
-from service.verificar_disponibilidade import app as verificar_disponibilidade_app
-from service.main import app as gateway_app
+from service.feed import fonte_local
+from service.logs import configurar_logs
+from service.supervisor import ServicoSupervisionado, Supervisor
 
-def run(app, port):
-    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="info")
-    server = uvicorn.Server(config)
+# Na ordem de subida (gateway por último). Serviços com estado em memória só
+# rodam com 1 worker no modo --processos; o motivo fica em estado_local.
+SERVICOS = [
+    ServicoSupervisionado(
+        "consulta_sala", "service.consultar_salas:app", 8001,
+        estado_local="catálogo de salas alterado por PUT/DELETE"
+    ),
+    ServicoSupervisionado(
+        "disparo_email", "service.disparo_de_email:app", 8004,
+        estado_local="caixa de saída e mensagens mortas"
+    ),
+    ServicoSupervisionado("disparo_evento", "service.disparo_evento:app", 8005),
+    ServicoSupervisionado(
+        "reservar_sala", "service.reserva:app", 8003,
+        estado_local="confirmacoes_db, locks por sala e sequência de IDs"
+    ),
+    ServicoSupervisionado("verificar_disponibilidade", "service.verificar_disponibilidade:app", 8002),
+    ServicoSupervisionado(
+        "gateway", "service.main:app", 8010,
+        estado_local="status de /notificacoes/{id} e cache de salas"
+    ),
+]
+
+def criar_servidor(app, port):
+    # Sem a configuração de log do uvicorn: os registros dele passam pela fila de service.logs (configurar_logs no __main__)
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="info", log_config=None, access_log=False)
+    return uvicorn.Server(config)
+
+def run(server):
     server.run()
 
+async def run_direto(servers):
+    """
+    Todos os servidores no mesmo event loop, com o gateway chamando os outros
+    apps direto (sem socket): os objetos criados no lifespan de cada serviço
+    (fila de emails, armazenamento...) ficam no loop em que são usados.
+    O feed de alterações passa da reserva para a disponibilidade em memória.
+    As portas continuam abertas para quem chama de fora.
+    """
+    # A disponibilidade lê o log de alterações da reserva em memória, sem long-poll HTTP
+    usar_fonte_local = import_from_string("service.verificar_disponibilidade:usar_fonte_local")
+    usar_fonte_local(fonte_local(import_from_string("service.reserva:log_alteracoes")))
+    gateway_clientes = import_from_string("service.main:clientes")
+    await gateway_clientes.despachar_direto({
+        servico.nome: import_from_string(servico.app) for servico in SERVICOS if servico.nome != "gateway"
+    })
+    await asyncio.gather(*(server.serve() for server in servers))
+
+def ler_workers(valores):
+    """--workers nome=N (repetível) -> {nome: N}"""
+    nomes = {servico.nome for servico in SERVICOS}
+    workers = {}
+    for valor in valores:
+        nome, _, n = valor.partition("=")
+        if nome not in nomes or not n.isdigit():
+            raise argparse.ArgumentTypeError(f"--workers {valor}: use nome=N com nome em {sorted(nomes)}")
+        workers[nome] = int(n)
+    return workers
+
 if __name__ == "__main__":
-    threads = [
-        threading.Thread(target=run, args=(consultar_sala_app, 8001), daemon=True),
-        threading.Thread(target=run, args=(disparo_email_app, 8004), daemon=True),
-        threading.Thread(target=run, args=(disparo_evento_app, 8005), daemon=True),
-        threading.Thread(target=run, args=(reserva_app, 8003), daemon=True), 
-        threading.Thread(target=run, args=(verificar_disponibilidade_app, 8002), daemon=True), 
-        threading.Thread(target=run, args=(gateway_app, 8010), daemon=True)
-    ]
+    parser = argparse.ArgumentParser()
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument(
+        "--direto", action="store_true",
+        help="gateway chama os serviços no próprio processo, sem HTTP (implantação conjunta)"
+    )
+    modo.add_argument(
+        "--processos", action="store_true",
+        help="cada serviço em processos próprios, sob um supervisor (SIGHUP reinicia, SIGINT encerra)"
+    )
+    parser.add_argument(
+        "--workers", action="append", default=[], metavar="SERVICO=N",
+        help="processos por serviço no modo --processos (ex.: --workers verificar_disponibilidade=4)"
+    )
+    args = parser.parse_args()
+    configurar_logs()
+
+    if args.processos:
+        try:
+            workers = ler_workers(args.workers)
+            supervisor = Supervisor([
+                ServicoSupervisionado(s.nome, s.app, s.porta, workers.get(s.nome, 1), s.estado_local)
+                for s in SERVICOS
+            ])
+        except (argparse.ArgumentTypeError, ValueError) as e:
+            parser.error(str(e))
+        supervisor.executar()
+        raise SystemExit(0)
+    if args.workers:
+        parser.error("--workers só vale com --processos")
+
+    servers = [criar_servidor(servico.app, servico.porta) for servico in SERVICOS]
+    if args.direto:
+        threads = [threading.Thread(target=asyncio.run, args=(run_direto(servers),), daemon=True)]
+    else:
+        threads = [threading.Thread(target=run, args=(server,), daemon=True) for server in servers]
     for t in threads: t.start()
-    print("Services up: academico:8010, salas:8001, turmas:8002, notas:8003")
+    modo = "despacho direto" if args.direto else "HTTP"
+    print(f"Services up ({modo}): gateway:8010, salas:8001, disponibilidade:8002, reserva:8003, email:8004, evento:8005")
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        print("Shutting down...")
\ No newline at end of file
+        print("Shutting down...")
+        for server in servers:
+            server.should_exit = True
+        for t in threads:
+            t.join(10)
@@ -0,0 +1,239 @@
+"""
+Motor de intervalos para detecção de conflitos de horário
+Cada sala tem uma agenda com os intervalos já convertidos para minutos e
+ordenados pelo início, de modo que a busca de conflito é feita com bisect
+em O(log n) em vez de percorrer e re-interpretar todas as reservas.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMATO_DATA_HORA = "%Y-%m-%d %H:%M"
+_MINUTOS_DIA = 24 * 60
+
+
+class ConflitoHorario(ValueError):
+    """Intervalo sobrepõe uma reserva já existente na agenda"""
+
+    def __init__(self, inicio: str, fim: str):
+        super().__init__(f"Sala ocupada entre {inicio} e {fim}.")
+        self.inicio = inicio
+        self.fim = fim
+
+
+def para_minutos(texto: str) -> int:
+    """
+    Converte 'YYYY-MM-DD HH:MM' em minutos absolutos (inteiro comparável)
+
+    Levanta ValueError se o texto não estiver exatamente nesse formato.
+    """
+    if len(texto) != 16 or texto[10] != " ":
+        raise ValueError(f"Formato de data inválido: '{texto}'")
+    momento = datetime.fromisoformat(texto)
+    return momento.toordinal() * _MINUTOS_DIA + momento.hour * 60 + momento.minute
+
+
+def de_minutos(minutos: int) -> str:
+    """Operação inversa de para_minutos"""
+    dia, resto = divmod(minutos, _MINUTOS_DIA)
+    momento = datetime.fromordinal(dia).replace(hour=resto // 60, minute=resto % 60)
+    return momento.strftime(FORMATO_DATA_HORA)
+
+
+class AgendaSala:
+    """
+    Intervalos [inicio, fim) de uma sala, sem sobreposição e ordenados.
+
+    Como os intervalos não se sobrepõem, os fins também ficam ordenados, e o
+    único candidato a conflito com [inicio, fim) é o último intervalo que
+    começa antes de `fim`.
+    """
+
+    __slots__ = ("inicios", "fins", "rotulos", "_arrays")
+
+    def __init__(self):
+        self.inicios: List[int] = []
+        self.fins: List[int] = []
+        self.rotulos: List[Tuple[str, str]] = []
+        self._arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.inicios)
+
+    def conflito(self, inicio: int, fim: int) -> Optional[int]:
+        """Retorna a posição do intervalo em conflito, ou None se estiver livre"""
+        pos = bisect_left(self.inicios, fim) - 1
+        if pos >= 0 and self.fins[pos] > inicio:
+            return pos
+        return None
+
+    def proximo_livre(self, inicio: int, duracao: int) -> int:
+        """Início do primeiro intervalo livre de `duracao` minutos a partir de `inicio`"""
+        pos = bisect_right(self.fins, inicio)
+        while pos < len(self.inicios) and self.inicios[pos] < inicio + duracao:
+            inicio = max(inicio, self.fins[pos])
+            pos += 1
+        return inicio
+
+    def anterior_livre(self, fim: int, duracao: int) -> int:
+        """Fim do último intervalo livre de `duracao` minutos que termina até `fim`"""
+        pos = bisect_left(self.inicios, fim) - 1
+        while pos >= 0 and self.fins[pos] > fim - duracao:
+            fim = min(fim, self.inicios[pos])
+            pos -= 1
+        return fim
+
+    def como_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Inícios e fins como arrays NumPy (cacheados até a próxima alteração)"""
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self.inicios, dtype=np.int64),
+                np.asarray(self.fins, dtype=np.int64),
+            )
+        return self._arrays
+
+    def conflitos_lote(self, inicios: np.ndarray, fins: np.ndarray) -> np.ndarray:
+        """
+        Versão vetorizada de `conflito` para vários candidatos de uma vez
+
+        Retorna, para cada candidato, a posição do intervalo em conflito ou -1.
+        """
+        inicios_agenda, fins_agenda = self.como_arrays()
+        if not len(inicios_agenda):
+            return np.full(len(inicios), -1, dtype=np.int64)
+        pos = np.searchsorted(inicios_agenda, fins, side="left") - 1
+        ocupado = (pos >= 0) & (fins_agenda[np.maximum(pos, 0)] > inicios)
+        return np.where(ocupado, pos, -1)
+
+    def inserir(self, inicio: int, fim: int, rotulo: Optional[Tuple[str, str]] = None) -> int:
+        """Insere o intervalo mantendo a ordem; levanta ConflitoHorario se sobrepor"""
+        if inicio >= fim:
+            raise ValueError("A data/hora inicial deve ser anterior à final.")
+        pos = self.conflito(inicio, fim)
+        if pos is not None:
+            raise ConflitoHorario(*self.rotulos[pos])
+        pos = bisect_left(self.inicios, inicio)
+        self._arrays = None
+        self.inicios.insert(pos, inicio)
+        self.fins.insert(pos, fim)
+        self.rotulos.insert(pos, rotulo or (de_minutos(inicio), de_minutos(fim)))
+        return pos
+
+    def remover(self, inicio: int, fim: int) -> bool:
+        """Remove o intervalo exato [inicio, fim); retorna False se não existir"""
+        pos = bisect_left(self.inicios, inicio)
+        if pos < len(self.inicios) and self.inicios[pos] == inicio and self.fins[pos] == fim:
+            self._arrays = None
+            del self.inicios[pos]
+            del self.fins[pos]
+            del self.rotulos[pos]
+            return True
+        return False
+
+
+class IndiceAgendas:
+    """Mapa sala -> AgendaSala"""
+
+    def __init__(self):
+        self.salas: Dict[str, AgendaSala] = {}
+
+    @classmethod
+    def de_registros(cls, registros: Iterable[dict]) -> "IndiceAgendas":
+        """
+        Constrói o índice a partir do formato de `reservas_db`:
+        [{"id_sala": ..., "reservas": [(inicio, fim), ...]}, ...]
+        """
+        indice = cls()
+        for registro in registros:
+            indice.adicionar_sala(registro["id_sala"])
+            for inicio, fim in registro["reservas"]:
+                indice.inserir(registro["id_sala"], inicio, fim)
+        return indice
+
+    def __contains__(self, sala_id: str) -> bool:
+        return sala_id in self.salas
+
+    def agenda(self, sala_id: str) -> Optional[AgendaSala]:
+        return self.salas.get(sala_id)
+
+    def adicionar_sala(self, sala_id: str) -> AgendaSala:
+        agenda = self.salas.get(sala_id)
+        if agenda is None:
+            agenda = self.salas[sala_id] = AgendaSala()
+        return agenda
+
+    def conflito(self, sala_id: str, inicio: int, fim: int) -> Optional[Tuple[str, str]]:
+        """Retorna (inicio, fim) da reserva em conflito, ou None se estiver livre"""
+        agenda = self.salas[sala_id]
+        pos = agenda.conflito(inicio, fim)
+        return agenda.rotulos[pos] if pos is not None else None
+
+    def conflitos_lote(
+        self, consultas: Sequence[Tuple[str, int, int]]
+    ) -> List[Optional[Tuple[str, str]]]:
+        """
+        Avalia vários (sala, inicio, fim) de uma vez
+
+        As consultas são agrupadas por sala e cada grupo é resolvido com uma
+        única busca vetorizada sobre os arrays da agenda. Retorna, na ordem de
+        entrada, o (inicio, fim) da reserva em conflito ou None.
+        """
+        resultado: List[Optional[Tuple[str, str]]] = [None] * len(consultas)
+        grupos: Dict[str, List[int]] = {}
+        for i, (sala_id, _, _) in enumerate(consultas):
+            grupos.setdefault(sala_id, []).append(i)
+
+        for sala_id, posicoes in grupos.items():
+            agenda = self.salas[sala_id]
+            inicios = np.fromiter((consultas[i][1] for i in posicoes), dtype=np.int64, count=len(posicoes))
+            fins = np.fromiter((consultas[i][2] for i in posicoes), dtype=np.int64, count=len(posicoes))
+            for i, pos in zip(posicoes, agenda.conflitos_lote(inicios, fins).tolist()):
+                if pos >= 0:
+                    resultado[i] = agenda.rotulos[pos]
+        return resultado
+
+    def inserir(self, sala_id: str, inicio: str, fim: str) -> None:
+        """Registra uma reserva (textos 'YYYY-MM-DD HH:MM') na agenda da sala"""
+        self.adicionar_sala(sala_id).inserir(para_minutos(inicio), para_minutos(fim), (inicio, fim))
+
+    def remover(self, sala_id: str, inicio: str, fim: str) -> bool:
+        agenda = self.salas.get(sala_id)
+        if agenda is None:
+            return False
+        return agenda.remover(para_minutos(inicio), para_minutos(fim))
+
+    def pagina(
+        self,
+        limite: int,
+        apos: Optional[Tuple[str, int]] = None,
+        sala_id: Optional[str] = None,
+        inicio_min: Optional[int] = None,
+        inicio_max: Optional[int] = None,
+    ) -> List[Tuple[str, int, Tuple[str, str]]]:
+        """
+        Até `limite` reservas em ordem de (sala, início), começando depois da
+        chave `apos` (paginação por cursor). Filtra opcionalmente por sala e
+        por início em [inicio_min, inicio_max). Retorna (sala, início em
+        minutos, (inicio, fim)).
+        """
+        salas = [sala_id] if sala_id is not None else sorted(self.salas)
+        if apos is not None:
+            salas = salas[bisect_left(salas, apos[0]):]
+
+        itens: List[Tuple[str, int, Tuple[str, str]]] = []
+        for sala in salas:
+            agenda = self.salas.get(sala)
+            if agenda is None:
+                continue
+            pos = 0 if inicio_min is None else bisect_left(agenda.inicios, inicio_min)
+            if apos is not None and sala == apos[0]:
+                pos = max(pos, bisect_right(agenda.inicios, apos[1]))
+            fim = len(agenda.inicios) if inicio_max is None else bisect_left(agenda.inicios, inicio_max)
+            for i in range(pos, min(fim, pos + limite - len(itens))):
+                itens.append((sala, agenda.inicios[i], agenda.rotulos[i]))
+            if len(itens) >= limite:
+                break
+        return itens
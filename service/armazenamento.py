@@ -0,0 +1,314 @@
+"""
+Camada de armazenamento das reservas
+Por padrão as reservas ficam apenas em memória (listas do próprio serviço).
+Com RESERVAS_DB apontando para um arquivo, elas também são gravadas em
+SQLite (modo WAL), e os serviços carregam o conteúdo na inicialização para
+continuar respondendo leituras a partir da memória.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Colunas persistidas (mesmas chaves dos registros de confirmacoes_db)
+COLUNAS = ("reserva_id", "sala_id", "inicio", "fim", "status", "confirmado_em", "usuario_email")
+
+# Colunas do log de alterações (eventos do feed de reservas)
+COLUNAS_ALTERACAO = ("seq", "tipo", "reserva_id", "sala_id", "inicio", "fim")
+
+_SQL_ESQUEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS reservas (
+        reserva_id    INTEGER PRIMARY KEY,
+        sala_id       TEXT NOT NULL,
+        inicio        TEXT NOT NULL,
+        fim           TEXT NOT NULL,
+        status        TEXT NOT NULL,
+        confirmado_em TEXT NOT NULL,
+        usuario_email TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_reservas_sala_inicio ON reservas (sala_id, inicio, fim)",
+    "CREATE INDEX IF NOT EXISTS idx_reservas_inicio ON reservas (inicio)",
+    """
+    CREATE TABLE IF NOT EXISTS alteracoes (
+        seq        INTEGER PRIMARY KEY,
+        tipo       TEXT NOT NULL,
+        reserva_id INTEGER NOT NULL,
+        sala_id    TEXT NOT NULL,
+        inicio     TEXT NOT NULL,
+        fim        TEXT NOT NULL
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)",
+)
+
+# Instruções fixas: o sqlite3 mantém as instruções preparadas em cache
+_SQL_INSERIR = (
+    "INSERT INTO reservas (reserva_id, sala_id, inicio, fim, status, confirmado_em, usuario_email) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_SQL_ATUALIZAR_STATUS = "UPDATE reservas SET status = ? WHERE reserva_id = ?"
+_SQL_CARREGAR = "SELECT " + ", ".join(COLUNAS) + " FROM reservas ORDER BY reserva_id"
+_SQL_INSERIR_ALTERACAO = (
+    "INSERT INTO alteracoes (seq, tipo, reserva_id, sala_id, inicio, fim) VALUES (?, ?, ?, ?, ?, ?)"
+)
+_SQL_CARREGAR_ALTERACOES = "SELECT " + ", ".join(COLUNAS_ALTERACAO) + " FROM alteracoes ORDER BY seq"
+_SQL_ULTIMA_ALTERACAO = "SELECT COALESCE(MAX(seq), 0) FROM alteracoes"
+
+
+class ErroArmazenamento(RuntimeError):
+    """Falha ao gravar no armazenamento persistente"""
+
+
+class ArmazenamentoMemoria:
+    """Sem persistência: o estado vive apenas nas estruturas do serviço"""
+
+    persistente = False
+
+    def __init__(self):
+        self._epoca = uuid.uuid4().hex
+
+    def epoca(self) -> str:
+        """Identifica esta instância do histórico (muda quando o histórico é perdido)"""
+        return self._epoca
+
+    def carregar(self) -> List[dict]:
+        return []
+
+    def carregar_com_posicao(self) -> Tuple[List[dict], int]:
+        return [], 0
+
+    def carregar_alteracoes(self) -> List[dict]:
+        return []
+
+    def salvar(self, reserva: dict, alteracao: Optional[dict] = None) -> None:
+        pass
+
+    def salvar_lote(self, reservas: Iterable[dict], alteracoes: Iterable[dict] = ()) -> None:
+        pass
+
+    def atualizar_status(self, reserva_id: int, status: str, alteracao: Optional[dict] = None) -> None:
+        pass
+
+    def fechar(self) -> None:
+        pass
+
+
+class _Pedido:
+    """
+    Operações aguardando o próximo commit em lote
+
+    As instruções de um mesmo pedido são sempre gravadas juntas (ex.: a
+    reserva e o evento correspondente no log de alterações).
+    """
+
+    __slots__ = ("operacoes", "concluido", "erro")
+
+    def __init__(self, *operacoes: Tuple[str, object, bool]):
+        self.operacoes = operacoes
+        self.concluido = threading.Event()
+        self.erro: Optional[BaseException] = None
+
+    def aguardar(self) -> None:
+        self.concluido.wait()
+        if self.erro is not None:
+            raise ErroArmazenamento(str(self.erro)) from self.erro
+
+
+class ArmazenamentoSQLite:
+    """
+    Reservas em SQLite com WAL e commit em grupo.
+
+    As escritas são entregues a uma thread escritora, que junta tudo o que
+    chegou em uma janela curta (`espera_lote`) em uma única transação. Quem
+    grava aguarda o commit da sua operação, então o retorno de `salvar`
+    continua significando "gravado em disco", mas uma rajada de escritas
+    custa um commit em vez de um por reserva.
+    """
+
+    persistente = True
+
+    def __init__(self, caminho: str, max_lote: int = 1000, espera_lote: float = 0.002):
+        self.caminho = caminho
+        self.max_lote = max_lote
+        self.espera_lote = espera_lote
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.execute("PRAGMA busy_timeout=5000")
+        for sql in _SQL_ESQUEMA:
+            self._conexao.execute(sql)
+        self._conexao.execute(
+            "INSERT OR IGNORE INTO meta (chave, valor) VALUES ('epoca', ?)", (uuid.uuid4().hex,)
+        )
+        self._epoca = self._conexao.execute("SELECT valor FROM meta WHERE chave = 'epoca'").fetchone()[0]
+
+        self._pendentes: List[_Pedido] = []
+        self._condicao = threading.Condition()
+        self._encerrando = False
+        self._escritor = threading.Thread(target=self._escrever, name="sqlite-escritor", daemon=True)
+        self._escritor.start()
+
+    # ---------- leitura ----------
+
+    def epoca(self) -> str:
+        """Identificador do histórico gravado neste arquivo (criado uma vez)"""
+        return self._epoca
+
+    def carregar(self) -> List[dict]:
+        """Lê todas as reservas (usado para aquecer o cache em memória)"""
+        return self.carregar_com_posicao()[0]
+
+    def carregar_com_posicao(self) -> Tuple[List[dict], int]:
+        """
+        Lê todas as reservas e o último `seq` do log de alterações na mesma
+        transação, para que um consumidor do feed continue exatamente do
+        ponto em que este retrato foi tirado.
+        """
+        leitura = sqlite3.connect(self.caminho)
+        try:
+            leitura.execute("BEGIN")
+            reservas = [dict(zip(COLUNAS, linha)) for linha in leitura.execute(_SQL_CARREGAR)]
+            ultimo_seq = leitura.execute(_SQL_ULTIMA_ALTERACAO).fetchone()[0]
+            leitura.execute("COMMIT")
+            return reservas, ultimo_seq
+        finally:
+            leitura.close()
+
+    def carregar_alteracoes(self) -> List[dict]:
+        leitura = sqlite3.connect(self.caminho)
+        try:
+            return [dict(zip(COLUNAS_ALTERACAO, linha)) for linha in leitura.execute(_SQL_CARREGAR_ALTERACOES)]
+        finally:
+            leitura.close()
+
+    # ---------- escrita ----------
+
+    def salvar(self, reserva: dict, alteracao: Optional[dict] = None) -> None:
+        operacoes = [(_SQL_INSERIR, tuple(reserva[c] for c in COLUNAS), False)]
+        if alteracao is not None:
+            operacoes.append(_operacao_alteracao(alteracao))
+        self._executar(_Pedido(*operacoes))
+
+    def salvar_lote(self, reservas: Iterable[dict], alteracoes: Iterable[dict] = ()) -> None:
+        linhas = [tuple(r[c] for c in COLUNAS) for r in reservas]
+        eventos = [tuple(a[c] for c in COLUNAS_ALTERACAO) for a in alteracoes]
+        operacoes = []
+        if linhas:
+            operacoes.append((_SQL_INSERIR, linhas, True))
+        if eventos:
+            operacoes.append((_SQL_INSERIR_ALTERACAO, eventos, True))
+        if operacoes:
+            self._executar(_Pedido(*operacoes))
+
+    def atualizar_status(self, reserva_id: int, status: str, alteracao: Optional[dict] = None) -> None:
+        operacoes = [(_SQL_ATUALIZAR_STATUS, (status, reserva_id), False)]
+        if alteracao is not None:
+            operacoes.append(_operacao_alteracao(alteracao))
+        self._executar(_Pedido(*operacoes))
+
+    def fechar(self) -> None:
+        """Grava o que estiver pendente e fecha a conexão"""
+        with self._condicao:
+            self._encerrando = True
+            self._condicao.notify()
+        self._escritor.join()
+        self._conexao.close()
+
+    def _executar(self, pedido: _Pedido) -> None:
+        with self._condicao:
+            if self._encerrando:
+                raise ErroArmazenamento("Armazenamento encerrado")
+            self._pendentes.append(pedido)
+            self._condicao.notify()
+        pedido.aguardar()
+
+    def _escrever(self) -> None:
+        while True:
+            with self._condicao:
+                while not self._pendentes and not self._encerrando:
+                    self._condicao.wait()
+                if not self._pendentes:
+                    return
+                # Janela curta para juntar escritas concorrentes no mesmo commit
+                if len(self._pendentes) < self.max_lote and not self._encerrando:
+                    self._condicao.wait(self.espera_lote)
+                lote = self._pendentes[:self.max_lote]
+                del self._pendentes[:self.max_lote]
+
+            try:
+                self._gravar_lote(lote)
+            except Exception as e:
+                # Ex.: conexão fechada ao abrir o cursor; o lote falha, a thread continua
+                logger.exception("✗ Falha ao gravar lote no armazenamento")
+                for pedido in lote:
+                    pedido.erro = pedido.erro or e
+                    pedido.concluido.set()
+
+    @staticmethod
+    def _aplicar(cursor: sqlite3.Cursor, pedido: _Pedido) -> None:
+        for sql, parametros, varios in pedido.operacoes:
+            if varios:
+                cursor.executemany(sql, parametros)
+            else:
+                cursor.execute(sql, parametros)
+
+    def _desfazer(self, cursor: sqlite3.Cursor) -> None:
+        if self._conexao.in_transaction:
+            try:
+                cursor.execute("ROLLBACK")
+            except sqlite3.Error:
+                logger.exception("✗ Falha no ROLLBACK do armazenamento")
+
+    def _gravar_lote(self, lote: List[_Pedido]) -> None:
+        """
+        Grava o lote em uma transação. Nunca propaga exceções: qualquer erro
+        (do SQLite ou não, ex.: parâmetro que não serializa) é entregue aos
+        pedidos que falharam e a thread escritora segue atendendo os próximos.
+        """
+        cursor = self._conexao.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for pedido in lote:
+                self._aplicar(cursor, pedido)
+            cursor.execute("COMMIT")
+        except Exception:
+            self._desfazer(cursor)
+            # Refaz pedido a pedido para que só a operação inválida falhe
+            for pedido in lote:
+                try:
+                    cursor.execute("BEGIN IMMEDIATE")
+                    self._aplicar(cursor, pedido)
+                    cursor.execute("COMMIT")
+                except Exception as e:
+                    self._desfazer(cursor)
+                    pedido.erro = e
+        finally:
+            cursor.close()
+            for pedido in lote:
+                pedido.concluido.set()
+
+
+def _operacao_alteracao(alteracao: dict) -> Tuple[str, tuple, bool]:
+    return (_SQL_INSERIR_ALTERACAO, tuple(alteracao[c] for c in COLUNAS_ALTERACAO), False)
+
+
+def criar_armazenamento(destino: Optional[str] = None):
+    """
+    Cria o armazenamento a partir de um destino ('memoria' ou caminho de um
+    arquivo SQLite). Sem argumento, usa a variável de ambiente RESERVAS_DB.
+    """
+    if destino is None:
+        destino = os.getenv("RESERVAS_DB", "")
+    destino = destino.strip()
+    if not destino or destino == "memoria":
+        return ArmazenamentoMemoria()
+    if destino.startswith("sqlite:///"):
+        destino = destino[len("sqlite:///"):]
+    return ArmazenamentoSQLite(destino)
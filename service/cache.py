@@ -0,0 +1,139 @@
+"""
+Cache LRU com TTL para o Gateway
+Guarda resultados positivos e negativos (ex.: sala inexistente), agrupa
+buscas concorrentes pela mesma chave em uma única chamada ao serviço e
+expõe contadores para ajuste de tamanho e TTL.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class CacheTTL:
+    """
+    Cache LRU limitado a `max_itens`, com expiração por item.
+
+    Valores `None` são tratados como resultado negativo e expiram em
+    `ttl_negativo` segundos (normalmente menor que o TTL positivo).
+    """
+
+    def __init__(self, max_itens: int = 1024, ttl: float = 300.0, ttl_negativo: float = 30.0):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self._itens: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._em_andamento: Dict[Hashable, asyncio.Future] = {}
+        # Gerações para descartar cargas invalidadas no meio: a global muda só
+        # em invalidar_tudo; a de cada chave, em invalidar(chave) com carga em andamento
+        self._geracao = 0
+        self._geracoes_chave: Dict[Hashable, int] = {}
+        self.acertos = 0
+        self.acertos_negativos = 0
+        self.falhas = 0
+        self.expirados = 0
+        self.despejos = 0
+        self.agrupados = 0
+        self.invalidacoes = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def _ler(self, chave: Hashable) -> Tuple[bool, Any]:
+        item = self._itens.get(chave)
+        if item is None:
+            return False, None
+        expira_em, valor = item
+        if expira_em <= time.monotonic():
+            del self._itens[chave]
+            self.expirados += 1
+            return False, None
+        self._itens.move_to_end(chave)
+        return True, valor
+
+    def _gravar(self, chave: Hashable, valor: Any) -> None:
+        ttl = self.ttl_negativo if valor is None else self.ttl
+        self._itens[chave] = (time.monotonic() + ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+            self.despejos += 1
+
+    async def obter(self, chave: Hashable, carregar: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Retorna o valor em cache ou chama `carregar` (uma única vez por chave,
+        mesmo com várias requisições simultâneas) e guarda o resultado.
+
+        Exceções de `carregar` não são guardadas e chegam a todos que
+        aguardavam a mesma chave.
+        """
+        encontrado, valor = self._ler(chave)
+        if encontrado:
+            self.acertos += 1
+            if valor is None:
+                self.acertos_negativos += 1
+            return valor
+
+        pendente = self._em_andamento.get(chave)
+        if pendente is not None:
+            self.agrupados += 1
+            return await asyncio.shield(pendente)
+
+        self.falhas += 1
+        geracao = (self._geracao, self._geracoes_chave.get(chave, 0))
+        pendente = asyncio.get_running_loop().create_future()
+        self._em_andamento[chave] = pendente
+        try:
+            valor = await carregar()
+        except BaseException as e:
+            pendente.set_exception(e)
+            # Evita aviso de exceção não consumida quando ninguém mais aguarda
+            pendente.exception()
+            raise
+        else:
+            # Não guarda resultado que foi invalidado enquanto era buscado
+            if geracao == (self._geracao, self._geracoes_chave.get(chave, 0)):
+                self._gravar(chave, valor)
+            pendente.set_result(valor)
+            return valor
+        finally:
+            self._em_andamento.pop(chave, None)
+            self._geracoes_chave.pop(chave, None)
+
+    def invalidar(self, chave: Optional[Hashable] = None) -> int:
+        """
+        Remove uma chave (ou todas, se `chave` for None); retorna quantas
+        saíram. Só a carga em andamento da própria chave deixa de ser gravada.
+        """
+        if chave is None:
+            return self.invalidar_tudo()
+        self.invalidacoes += 1
+        if chave in self._em_andamento:
+            self._geracoes_chave[chave] = self._geracoes_chave.get(chave, 0) + 1
+        return 1 if self._itens.pop(chave, None) is not None else 0
+
+    def invalidar_tudo(self) -> int:
+        """Esvazia o cache e descarta o resultado de todas as cargas em andamento"""
+        self._geracao += 1
+        self.invalidacoes += 1
+        removidos = len(self._itens)
+        self._itens.clear()
+        return removidos
+
+    def estatisticas(self) -> dict:
+        consultas = self.acertos + self.falhas
+        return {
+            "itens": len(self._itens),
+            "max_itens": self.max_itens,
+            "ttl": self.ttl,
+            "ttl_negativo": self.ttl_negativo,
+            "acertos": self.acertos,
+            "acertos_negativos": self.acertos_negativos,
+            "falhas": self.falhas,
+            "agrupados": self.agrupados,
+            "expirados": self.expirados,
+            "despejos": self.despejos,
+            "invalidacoes": self.invalidacoes,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0
+        }
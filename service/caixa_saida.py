@@ -0,0 +1,331 @@
+"""
+Caixa de saída de emails
+O serviço de email aceita as mensagens em uma fila limitada e responde na
+hora; um worker assíncrono as entrega em lotes por uma única sessão SMTP
+reaproveitada, com novas tentativas (backoff exponencial) e uma lista de
+mensagens mortas para o que não puder ser entregue.
+"""
+
+import asyncio
+import logging
+import smtplib
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Deque, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MensagemEmail:
+    destinatario: str
+    assunto: str
+    corpo: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    tentativas: int = 0
+    ultimo_erro: Optional[str] = None
+    enfileirado_em: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    def resumo(self) -> dict:
+        return {
+            "email_id": self.id,
+            "destinatario": self.destinatario,
+            "assunto": self.assunto,
+            "tentativas": self.tentativas,
+            "ultimo_erro": self.ultimo_erro,
+            "enfileirado_em": self.enfileirado_em
+        }
+
+
+class ErroPermanente(Exception):
+    """Falha que não adianta repetir (ex.: destinatário recusado com 5xx)"""
+
+
+class EnviadorConsole:
+    """Sem servidor SMTP configurado: apenas registra a mensagem no log (o corpo em DEBUG)"""
+
+    def enviar_lote(self, mensagens: List[MensagemEmail]) -> List[Optional[Exception]]:
+        for mensagem in mensagens:
+            extra = {"destinatario": mensagem.destinatario, "assunto": mensagem.assunto}
+            logger.info(f"✓ E-mail enviado (console) para {mensagem.destinatario}", extra=extra)
+            logger.debug(mensagem.corpo, extra=extra)
+        return [None] * len(mensagens)
+
+    def fechar(self) -> None:
+        pass
+
+
+class EnviadorSMTP:
+    """
+    Entrega por SMTP mantendo a sessão aberta entre lotes.
+
+    A conexão é aberta no primeiro envio e reaproveitada; se o servidor a
+    derrubar (ex.: timeout de inatividade), é reaberta uma vez e a mensagem
+    é reenviada. Os métodos são bloqueantes e rodam fora do event loop.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        porta: int = 25,
+        remetente: str = "reservas@localhost",
+        usuario: Optional[str] = None,
+        senha: Optional[str] = None,
+        starttls: bool = False,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.porta = porta
+        self.remetente = remetente
+        self.usuario = usuario
+        self.senha = senha
+        self.starttls = starttls
+        self.timeout = timeout
+        self.conexoes_abertas = 0
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    def _conectar(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.porta, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls()
+            if self.usuario:
+                smtp.login(self.usuario, self.senha or "")
+            self._smtp = smtp
+            self.conexoes_abertas += 1
+        return self._smtp
+
+    def _descartar_conexao(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            finally:
+                self._smtp = None
+
+    def _montar(self, mensagem: MensagemEmail) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = self.remetente
+        email["To"] = mensagem.destinatario
+        email["Subject"] = mensagem.assunto
+        email["Message-ID"] = f"<{mensagem.id}@{self.host}>"
+        email.set_content(mensagem.corpo)
+        return email
+
+    def _enviar(self, email: EmailMessage) -> None:
+        try:
+            self._conectar().send_message(email)
+        except smtplib.SMTPServerDisconnected:
+            # Sessão expirada: reabre uma vez e tenta de novo
+            self._descartar_conexao()
+            self._conectar().send_message(email)
+
+    def enviar_lote(self, mensagens: List[MensagemEmail]) -> List[Optional[Exception]]:
+        """Envia as mensagens na mesma sessão; retorna o erro de cada uma (ou None)"""
+        erros: List[Optional[Exception]] = []
+        for mensagem in mensagens:
+            try:
+                self._enviar(self._montar(mensagem))
+                erros.append(None)
+            except smtplib.SMTPRecipientsRefused as e:
+                codigos = [codigo for codigo, _ in e.recipients.values()]
+                if all(codigo >= 500 for codigo in codigos):
+                    erros.append(ErroPermanente(f"Destinatário recusado: {codigos}"))
+                else:
+                    erros.append(e)
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code >= 500:
+                    erros.append(ErroPermanente(f"{e.smtp_code} {e.smtp_error!r}"))
+                else:
+                    erros.append(e)
+            except (smtplib.SMTPException, OSError) as e:
+                # Falha de conexão: a próxima tentativa abre uma sessão nova
+                self._descartar_conexao()
+                erros.append(e)
+        return erros
+
+    def fechar(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._descartar_conexao()
+
+
+class CaixaSaida:
+    """
+    Fila limitada de emails com entrega em lote por um worker.
+
+    `enfileirar` nunca bloqueia: se a fila estiver cheia retorna False (o
+    serviço responde 503 e o chamador decide se tenta de novo). Falhas
+    temporárias voltam para a fila após `backoff_base * 2^(tentativa-1)`
+    segundos (limitado a `backoff_max`); após `max_tentativas`, ou em falha
+    permanente, a mensagem vai para a lista de mortas (limitada a
+    `max_mortas`, as mais antigas são descartadas).
+
+    A fila é um asyncio.Queue: `enfileirar` e `reenviar_mortas` só podem ser
+    chamados do event loop (em handlers `async def`), nunca do threadpool.
+    """
+
+    def __init__(
+        self,
+        enviador,
+        tamanho_fila: int = 10000,
+        tamanho_lote: int = 50,
+        espera_lote: float = 0.05,
+        max_tentativas: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        max_mortas: int = 1000,
+    ):
+        self.enviador = enviador
+        self.tamanho_fila = tamanho_fila
+        self.tamanho_lote = tamanho_lote
+        self.espera_lote = espera_lote
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.mortas: Deque[MensagemEmail] = deque(maxlen=max_mortas)
+        self._fila: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._reagendadas: "OrderedDict[str, Tuple[MensagemEmail, asyncio.TimerHandle]]" = OrderedDict()
+        self._encerrando = False
+        self.enviadas = 0
+        self.lotes = 0
+        self.falhas = 0
+        self.rejeitadas = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self._worker is not None
+
+    async def iniciar(self) -> None:
+        if self.ativo:
+            return
+        self._fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        self._encerrando = False
+        self._worker = asyncio.create_task(self._executar(), name="caixa-saida")
+
+    async def parar(self, prazo: float = 10.0) -> None:
+        """
+        Entrega o que já está na fila (até `prazo` segundos) e encerra. As
+        mensagens esperando nova tentativa voltam para a fila na hora e têm
+        uma última tentativa; o que não for entregue vai para as mortas.
+        """
+        if not self.ativo:
+            return
+        self._encerrando = True
+        reagendadas = list(self._reagendadas.values())
+        self._reagendadas.clear()
+        for mensagem, agendada in reagendadas:
+            agendada.cancel()
+            if not self.enfileirar(mensagem):
+                self._matar(mensagem, f"Fila cheia no encerramento (último erro: {mensagem.ultimo_erro})")
+        try:
+            await asyncio.wait_for(self._fila.join(), timeout=prazo)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠ Caixa de saída encerrada com {self._fila.qsize()} emails na fila")
+            while not self._fila.empty():
+                self._matar(self._fila.get_nowait(), "Caixa de saída encerrada antes da entrega")
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        self._worker = None
+        await asyncio.to_thread(self.enviador.fechar)
+
+    def enfileirar(self, mensagem: MensagemEmail) -> bool:
+        if not self.ativo:
+            return False
+        try:
+            self._fila.put_nowait(mensagem)
+        except asyncio.QueueFull:
+            self.rejeitadas += 1
+            return False
+        return True
+
+    def _reagendar(self, mensagem: MensagemEmail) -> None:
+        if self._encerrando:
+            self._matar(mensagem, f"Encerrando após {mensagem.tentativas} tentativas: {mensagem.ultimo_erro}")
+            return
+        atraso = min(self.backoff_max, self.backoff_base * 2 ** (mensagem.tentativas - 1))
+
+        def devolver():
+            self._reagendadas.pop(mensagem.id, None)
+            if not self.enfileirar(mensagem):
+                self._matar(mensagem, "Fila cheia ao tentar reenviar")
+
+        self._reagendadas[mensagem.id] = (mensagem, asyncio.get_running_loop().call_later(atraso, devolver))
+
+    def _matar(self, mensagem: MensagemEmail, erro: str) -> None:
+        mensagem.ultimo_erro = erro
+        self.mortas.append(mensagem)
+        logger.error(f"✗ Email {mensagem.id} para {mensagem.destinatario} descartado: {erro}")
+
+    async def _proximo_lote(self) -> List[MensagemEmail]:
+        """Espera a primeira mensagem e junta as que chegarem logo em seguida"""
+        lote = [await self._fila.get()]
+        limite = time.monotonic() + self.espera_lote
+        while len(lote) < self.tamanho_lote:
+            if not self._fila.empty():
+                lote.append(self._fila.get_nowait())
+                continue
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(self._fila.get(), timeout=restante))
+            except asyncio.TimeoutError:
+                break
+        return lote
+
+    async def _executar(self) -> None:
+        while True:
+            lote = await self._proximo_lote()
+            try:
+                erros = await asyncio.to_thread(self.enviador.enviar_lote, lote)
+            except Exception as e:
+                erros = [e] * len(lote)
+            self.lotes += 1
+
+            for mensagem, erro in zip(lote, erros):
+                mensagem.tentativas += 1
+                if erro is None:
+                    self.enviadas += 1
+                elif isinstance(erro, ErroPermanente) or mensagem.tentativas >= self.max_tentativas:
+                    self.falhas += 1
+                    self._matar(mensagem, str(erro))
+                else:
+                    self.falhas += 1
+                    mensagem.ultimo_erro = str(erro)
+                    logger.warning(f"⚠ Falha ao enviar email {mensagem.id} (tentativa {mensagem.tentativas}): {erro}")
+                    self._reagendar(mensagem)
+                self._fila.task_done()
+
+    def reenviar_mortas(self) -> int:
+        """Devolve as mensagens mortas para a fila, zerando as tentativas"""
+        reenviadas = 0
+        while self.mortas:
+            mensagem = self.mortas.popleft()
+            mensagem.tentativas = 0
+            if not self.enfileirar(mensagem):
+                self.mortas.appendleft(mensagem)
+                break
+            reenviadas += 1
+        return reenviadas
+
+    def estatisticas(self) -> dict:
+        return {
+            "ativo": self.ativo,
+            "fila": self._fila.qsize() if self._fila is not None else 0,
+            "capacidade_fila": self.tamanho_fila,
+            "aguardando_nova_tentativa": len(self._reagendadas),
+            "enviadas": self.enviadas,
+            "lotes": self.lotes,
+            "falhas": self.falhas,
+            "rejeitadas": self.rejeitadas,
+            "mortas": len(self.mortas),
+            "conexoes_smtp": getattr(self.enviador, "conexoes_abertas", 0)
+        }
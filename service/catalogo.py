@@ -0,0 +1,115 @@
+"""
+Catálogo de salas em memória
+Índice primário por id, índices secundários por disponibilidade e por
+capacidade (para consultas de faixa como capacidade >= 30) e um contador de
+versão usado para ETag/Last-Modified.
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class CatalogoSalas:
+    """
+    Armazena as salas indexadas.
+
+    Toda alteração incrementa `versao` (do catálogo) e a versão da sala
+    alterada, e atualiza `modificado_em` (epoch em segundos).
+    """
+
+    def __init__(self, salas: Iterable[dict] = ()):
+        self._lock = threading.RLock()
+        self._por_id: Dict[str, dict] = {}
+        self._por_disponibilidade: Dict[bool, Set[str]] = {True: set(), False: set()}
+        self._por_capacidade: List[Tuple[int, str]] = []
+        self._versoes: Dict[str, int] = {}
+        self._modificacoes: Dict[str, float] = {}
+        self.versao = 0
+        self.modificado_em = time.time()
+        for sala in salas:
+            self.salvar(sala)
+
+    def __len__(self) -> int:
+        return len(self._por_id)
+
+    def __contains__(self, sala_id: str) -> bool:
+        return sala_id in self._por_id
+
+    # ---------- leitura ----------
+
+    def obter(self, sala_id: str) -> Optional[dict]:
+        return self._por_id.get(sala_id)
+
+    def versao_sala(self, sala_id: str) -> int:
+        return self._versoes.get(sala_id, 0)
+
+    def modificado_sala(self, sala_id: str) -> float:
+        return self._modificacoes.get(sala_id, self.modificado_em)
+
+    def listar(
+        self,
+        disponivel: Optional[bool] = None,
+        capacidade_min: Optional[int] = None,
+        capacidade_max: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Lista as salas, opcionalmente filtradas por disponibilidade e faixa
+        de capacidade. Com filtro de capacidade o resultado vem ordenado por
+        capacidade; sem ele, na ordem de cadastro.
+        """
+        with self._lock:
+            if capacidade_min is None and capacidade_max is None:
+                if disponivel is None:
+                    return list(self._por_id.values())
+                ids = self._por_disponibilidade[disponivel]
+                return [s for sala_id, s in self._por_id.items() if sala_id in ids]
+
+            desde = 0 if capacidade_min is None else bisect_left(self._por_capacidade, (capacidade_min, ""))
+            ate = (
+                len(self._por_capacidade) if capacidade_max is None
+                else bisect_right(self._por_capacidade, (capacidade_max, "\uffff"))
+            )
+            faixa = self._por_capacidade[desde:ate]
+            if disponivel is not None:
+                ids = self._por_disponibilidade[disponivel]
+                faixa = [item for item in faixa if item[1] in ids]
+            return [self._por_id[sala_id] for _, sala_id in faixa]
+
+    # ---------- escrita ----------
+
+    def salvar(self, sala: dict) -> dict:
+        """Insere ou atualiza uma sala (identificada por sala['id'])"""
+        sala = dict(sala)
+        with self._lock:
+            anterior = self._por_id.get(sala["id"])
+            if anterior is not None:
+                self._desindexar(anterior)
+            self._por_id[sala["id"]] = sala
+            self._por_disponibilidade[bool(sala.get("disponivel", True))].add(sala["id"])
+            insort(self._por_capacidade, (sala.get("capacidade", 0), sala["id"]))
+            self._tocar(sala["id"])
+        return sala
+
+    def remover(self, sala_id: str) -> bool:
+        with self._lock:
+            sala = self._por_id.pop(sala_id, None)
+            if sala is None:
+                return False
+            self._desindexar(sala)
+            self._tocar(sala_id)
+            return True
+
+    def _desindexar(self, sala: dict) -> None:
+        self._por_disponibilidade[bool(sala.get("disponivel", True))].discard(sala["id"])
+        chave = (sala.get("capacidade", 0), sala["id"])
+        pos = bisect_left(self._por_capacidade, chave)
+        if pos < len(self._por_capacidade) and self._por_capacidade[pos] == chave:
+            del self._por_capacidade[pos]
+
+    def _tocar(self, sala_id: str) -> None:
+        self.versao += 1
+        self.modificado_em = time.time()
+        self._versoes[sala_id] = self.versao
+        self._modificacoes[sala_id] = self.modificado_em
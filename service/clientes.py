@@ -0,0 +1,149 @@
+"""
+Pool de clientes HTTP do Gateway
+Mantém um httpx.AsyncClient de longa duração por microsserviço, com conexões
+keep-alive reaproveitadas, limites de pool e timeout próprio de cada serviço.
+Quando os serviços rodam no mesmo processo que o gateway, `despachar_direto`
+troca a rede por chamadas diretas aos apps ASGI, sem mudar quem chama.
+"""
+
+import asyncio
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+
+@dataclass(frozen=True)
+class ConfigServico:
+    """Configuração de conexão com um microsserviço downstream"""
+    url: str
+    timeout: float = 5.0
+    timeout_conexao: float = 2.0
+    max_conexoes: int = 100
+    max_keepalive: int = 20
+    keepalive_expira: float = 30.0
+    caminho_saude: str = "/"
+    # Transporte próprio (ex.: httpx.ASGITransport em benchmarks); None = rede, com os limites acima
+    transporte: Optional[httpx.AsyncBaseTransport] = field(default=None, compare=False)
+
+
+class TransporteDireto(httpx.ASGITransport):
+    """
+    Transporte que entrega a requisição ao app ASGI no próprio processo.
+    Ao contrário do ASGITransport, respeita o timeout de leitura do cliente
+    e devolve exceções do app como resposta 500, como faria o servidor HTTP.
+    """
+
+    def __init__(self, app: Callable[..., Any]):
+        super().__init__(app=app, raise_app_exceptions=False)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        timeout = request.extensions.get("timeout", {}).get("read")
+        try:
+            return await asyncio.wait_for(super().handle_async_request(request), timeout)
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout("Tempo esgotado no despacho direto", request=request) from None
+
+
+class PoolClientes:
+    """
+    Conjunto de clientes HTTP assíncronos, um por microsserviço.
+
+    Os clientes são abertos no startup do gateway (lifespan) e fechados no
+    shutdown, de modo que cada requisição reaproveita conexões já abertas em
+    vez de estabelecer uma conexão TCP nova a cada chamada.
+    """
+
+    def __init__(self, servicos: Dict[str, ConfigServico]):
+        self.servicos = dict(servicos)
+        self._clientes: Dict[str, httpx.AsyncClient] = {}
+        self._diretos: Dict[str, Callable[..., Any]] = {}
+
+    def _criar_cliente(self, nome: str) -> httpx.AsyncClient:
+        config = self.servicos[nome]
+        timeout = httpx.Timeout(config.timeout, connect=config.timeout_conexao)
+        app = self._diretos.get(nome)
+        transporte = TransporteDireto(app) if app is not None else config.transporte
+        if transporte is not None:
+            return httpx.AsyncClient(base_url=config.url, timeout=timeout, transport=transporte)
+        return httpx.AsyncClient(
+            base_url=config.url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=config.max_conexoes,
+                max_keepalive_connections=config.max_keepalive,
+                keepalive_expiry=config.keepalive_expira,
+            ),
+        )
+
+    async def abrir(self) -> None:
+        """Cria os clientes de todos os serviços configurados"""
+        for nome in self.servicos:
+            if nome not in self._clientes:
+                self._clientes[nome] = self._criar_cliente(nome)
+
+    async def despachar_direto(self, apps: Dict[str, Callable[..., Any]]) -> None:
+        """
+        Passa a chamar os serviços dados direto no app ASGI, sem socket nem
+        servidor HTTP no meio. Os apps precisam rodar no mesmo processo e no
+        mesmo event loop do gateway (e ter o lifespan executado pelo próprio
+        servidor deles). Middlewares, validação e cabeçalhos continuam os
+        mesmos; os demais serviços seguem por HTTP.
+        """
+        self._diretos.update(apps)
+        for nome in apps:
+            await self._renovar(nome)
+
+    async def usar_transportes(self, transportes: Dict[str, httpx.AsyncBaseTransport]) -> None:
+        """
+        Passa a chamar os serviços dados pelo transporte indicado (ex.:
+        httpx.ASGITransport do app, em benchmarks), como se ele viesse em
+        `ConfigServico.transporte`
+        """
+        for nome, transporte in transportes.items():
+            self.servicos[nome] = replace(self.servicos[nome], transporte=transporte)
+            await self._renovar(nome)
+
+    async def _renovar(self, nome: str) -> None:
+        """Troca um cliente já aberto por um novo com a configuração atual"""
+        anterior = self._clientes.pop(nome, None)
+        if anterior is not None:
+            await anterior.aclose()
+            self._clientes[nome] = self._criar_cliente(nome)
+
+    @property
+    def diretos(self) -> List[str]:
+        """Serviços chamados por despacho direto"""
+        return sorted(self._diretos)
+
+    async def fechar(self) -> None:
+        """Fecha todas as conexões abertas"""
+        clientes, self._clientes = self._clientes, {}
+        for cliente in clientes.values():
+            await cliente.aclose()
+
+    def cliente(self, nome: str) -> httpx.AsyncClient:
+        """Retorna o cliente de um serviço, abrindo-o sob demanda se necessário"""
+        cliente: Optional[httpx.AsyncClient] = self._clientes.get(nome)
+        if cliente is None:
+            cliente = self._criar_cliente(nome)
+            self._clientes[nome] = cliente
+        return cliente
+
+    def __getitem__(self, nome: str) -> httpx.AsyncClient:
+        return self.cliente(nome)
+
+    def estatisticas(self) -> Dict[str, dict]:
+        """Conexões abertas/ociosas de cada cliente (clientes sem pool, como o ASGI, ficam de fora)"""
+        saida = {}
+        for nome, cliente in self._clientes.items():
+            pool = getattr(getattr(cliente, "_transport", None), "_pool", None)
+            if pool is None:
+                continue
+            conexoes = pool.connections
+            saida[nome] = {
+                "conexoes": len(conexoes),
+                "ociosas": sum(1 for conexao in conexoes if conexao.is_idle()),
+                "max_conexoes": self.servicos[nome].max_conexoes,
+            }
+        return saida
@@ -0,0 +1,66 @@
+"""
+Suporte a GET condicional (ETag / Last-Modified)
+Permite que clientes que revalidam um recurso recebam 304 Not Modified sem
+que o corpo seja gerado ou serializado de novo.
+"""
+
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Optional, Union
+
+from fastapi import Request, Response
+
+
+def gerar_etag(*partes) -> str:
+    """ETag fraca a partir de identificadores de versão"""
+    return 'W/"' + "-".join(str(p) for p in partes) + '"'
+
+
+def data_http(epoch: float) -> str:
+    return formatdate(epoch, usegmt=True)
+
+
+def nao_modificado(request: Request, etag: str, modificado_em: Optional[float] = None) -> bool:
+    """
+    Verifica os cabeçalhos de revalidação do cliente.
+
+    If-None-Match tem precedência sobre If-Modified-Since (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Comparação fraca: ignora o prefixo W/
+        recebidas = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in recebidas
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and modificado_em is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(modificado_em) <= int(desde)
+
+    return False
+
+
+def resposta_condicional(
+    request: Request,
+    etag: str,
+    corpo: Callable[[], Union[bytes, str]],
+    modificado_em: Optional[float] = None,
+    media_type: str = "application/json",
+    cache_control: str = "no-cache",
+) -> Response:
+    """
+    Monta a resposta com ETag/Last-Modified, ou 304 se o cliente já tiver a
+    versão atual. `corpo` só é chamado quando a resposta precisa do conteúdo.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if modificado_em is not None:
+        headers["Last-Modified"] = data_http(modificado_em)
+
+    if nao_modificado(request, etag, modificado_em):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=corpo(), media_type=media_type, headers=headers)
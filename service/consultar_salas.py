@@ -1,11 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request
+from pydantic import BaseModel
+from typing import Optional
+import httpx
+import logging
+import os
+import uuid
+
+from service.catalogo import CatalogoSalas
+from service.condicional import gerar_etag, resposta_condicional
+from service.logs import configurar_logs, registrar_logs
+from service.metricas import instrumentar
+from service.rastreamento import rastrear
+from service.respostas import CorpoEstatico, RespostaJSON, serializar
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Serviço de Consulta de Salas",
     description="Gerencia e disponibiliza dados das salas cadastradas",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=RespostaJSON
 )
 
+metricas = instrumentar(app)
+registrar_logs(app, "consulta_sala")
+rastrear(app, "consulta_sala")
+
 # Lista simulada de salas
 salas = [
     {"id": "LAB-01", "nome": "Laboratório 1", "capacidade": 30, "disponivel": True},
@@ -13,36 +33,128 @@ salas = [
     {"id": "SALA-01", "nome": "Sala de Aula 1", "capacidade": 40, "disponivel": True}
 ]
 
+# Endpoints avisados quando uma sala muda (cache de salas do gateway)
+URLS_INVALIDACAO = [
+    url.strip() for url in os.getenv(
+        "CATALOGO_URLS_INVALIDACAO",
+        "http://localhost:8010/cache/salas/invalidar"
+    ).split(",") if url.strip()
+]
+
+
+class DadosSala(BaseModel):
+    nome: str
+    capacidade: int
+    disponivel: bool = True
+
+
+# Catálogo indexado (por id, disponibilidade e capacidade) com versão
+catalogo = CatalogoSalas(salas)
+
+# As versões do catálogo recomeçam a cada processo: o ID da instância entra
+# na ETag para que, após um reinício, a mesma versão não valide outro conteúdo
+_instancia = uuid.uuid4().hex[:8]
+
+# Corpos JSON já serializados, por consulta, válidos para uma versão do catálogo
+_corpos_serializados = {}
+_MAX_CORPOS = 256
+
+
+def _listagem(request: Request, disponivel: Optional[bool], capacidade_min: Optional[int], capacidade_max: Optional[int]):
+    """Listagem com ETag do catálogo e corpo reaproveitado entre chamadas"""
+    versao = catalogo.versao
+    chave = (disponivel, capacidade_min, capacidade_max)
+
+    def corpo() -> bytes:
+        cache = _corpos_serializados.get(chave)
+        if cache is not None and cache[0] == versao:
+            return cache[1]
+        dados = serializar(catalogo.listar(disponivel, capacidade_min, capacidade_max))
+        if len(_corpos_serializados) >= _MAX_CORPOS:
+            _corpos_serializados.clear()
+        _corpos_serializados[chave] = (versao, dados)
+        return dados
+
+    return resposta_condicional(
+        request,
+        gerar_etag("salas", _instancia, versao, *("" if v is None else v for v in chave)),
+        corpo,
+        modificado_em=catalogo.modificado_em
+    )
+
+
+def notificar_invalidacao(sala_id: str):
+    """Avisa os caches (gateway) de que a sala mudou; falhas são apenas registradas"""
+    for url in URLS_INVALIDACAO:
+        try:
+            httpx.post(url, json={"sala_id": sala_id}, timeout=2)
+        except httpx.HTTPError as e:
+            logger.warning(f"⚠ Falha ao invalidar cache em {url}: {str(e)}")
+
+
+_CORPO_HEALTH = CorpoEstatico({"status": "online", "servico": "Consulta de Salas", "porta": 8001})
+
 
 @app.get("/", tags=["Health"])
 def health_check():
     """Verifica se o serviço está online"""
-    return {"status": "online", "servico": "Consulta de Salas", "porta": 8001}
+    return _CORPO_HEALTH.resposta()
 
 
 @app.get("/salas", tags=["Salas"])
-def listar_salas():
+def listar_salas(
+    request: Request,
+    capacidade_min: Optional[int] = Query(None, description="Capacidade mínima"),
+    capacidade_max: Optional[int] = Query(None, description="Capacidade máxima")
+):
     """Lista todas as salas"""
-    return salas
+    return _listagem(request, None, capacidade_min, capacidade_max)
 
 
 @app.get("/salas/disponiveis", tags=["Salas"])
-def listar_salas_disponiveis():
+def listar_salas_disponiveis(
+    request: Request,
+    capacidade_min: Optional[int] = Query(None, description="Capacidade mínima"),
+    capacidade_max: Optional[int] = Query(None, description="Capacidade máxima")
+):
     """Lista apenas as salas disponíveis"""
-    return [s for s in salas if s["disponivel"]]
+    return _listagem(request, True, capacidade_min, capacidade_max)
 
 
 @app.get("/salas/{sala_id}", tags=["Salas"])
-def obter_sala_por_id(sala_id: str):
+def obter_sala_por_id(sala_id: str, request: Request):
     """Retorna detalhes de uma sala específica"""
-    for sala in salas:
-        if sala["id"] == sala_id:
-            return sala
-    raise HTTPException(status_code=404, detail="Sala não encontrada")
+    sala = catalogo.obter(sala_id)
+    if sala is None:
+        raise HTTPException(status_code=404, detail="Sala não encontrada")
+    return resposta_condicional(
+        request,
+        gerar_etag(sala_id, _instancia, catalogo.versao_sala(sala_id)),
+        lambda: serializar(sala),
+        modificado_em=catalogo.modificado_sala(sala_id)
+    )
+
+
+@app.put("/salas/{sala_id}", tags=["Salas"])
+def salvar_sala(sala_id: str, dados: DadosSala, tarefas: BackgroundTasks):
+    """Cadastra ou atualiza uma sala e invalida os caches que a guardam"""
+    sala = catalogo.salvar({"id": sala_id, **dados.model_dump()})
+    tarefas.add_task(notificar_invalidacao, sala_id)
+    return sala
+
+
+@app.delete("/salas/{sala_id}", tags=["Salas"])
+def remover_sala(sala_id: str, tarefas: BackgroundTasks):
+    """Remove uma sala do catálogo e invalida os caches que a guardam"""
+    if not catalogo.remover(sala_id):
+        raise HTTPException(status_code=404, detail="Sala não encontrada")
+    tarefas.add_task(notificar_invalidacao, sala_id)
+    return {"mensagem": "Sala removida", "id": sala_id}
 
 
 # Inicialização local
 if __name__ == "__main__":
     import uvicorn
-    print("\n Serviço de Consulta de Salas rodando na porta 8001\n")
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    configurar_logs()
+    logger.info("Serviço de Consulta de Salas rodando na porta 8001")
+    uvicorn.run(app, host="0.0.0.0", port=8001, log_config=None, access_log=False)
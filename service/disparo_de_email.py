@@ -1,13 +1,73 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import Optional
+import os
 import uvicorn
 
+from service.caixa_saida import CaixaSaida, EnviadorConsole, EnviadorSMTP, MensagemEmail
+from service.logs import configurar_logs, registrar_logs
+from service.metricas import instrumentar
+from service.rastreamento import rastrear
+from service.respostas import CorpoEstatico, RespostaJSON, resposta_confiavel
+
+
+def criar_enviador():
+    """SMTP se SMTP_HOST estiver definido; senão, exibe os emails no console"""
+    host = os.getenv("SMTP_HOST", "")
+    if not host:
+        return EnviadorConsole()
+    return EnviadorSMTP(
+        host,
+        porta=int(os.getenv("SMTP_PORTA", "25")),
+        remetente=os.getenv("SMTP_REMETENTE", "noreply@reserva-salas.com"),
+        usuario=os.getenv("SMTP_USUARIO") or None,
+        senha=os.getenv("SMTP_SENHA") or None,
+        starttls=os.getenv("SMTP_STARTTLS", "0") in ("1", "true", "sim")
+    )
+
+
+# Fila limitada + worker que entrega em lotes pela mesma sessão SMTP
+caixa_saida = CaixaSaida(
+    criar_enviador(),
+    tamanho_fila=int(os.getenv("EMAIL_FILA_MAX", "10000")),
+    tamanho_lote=int(os.getenv("EMAIL_LOTE", "50")),
+    max_tentativas=int(os.getenv("EMAIL_MAX_TENTATIVAS", "5")),
+    backoff_base=float(os.getenv("EMAIL_BACKOFF", "1.0"))
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicia o worker da caixa de saída e entrega o que restar ao encerrar"""
+    await caixa_saida.iniciar()
+    try:
+        yield
+    finally:
+        await caixa_saida.parar()
+
 
 app = FastAPI(
     title="Serviço de disparo de email após confirmação da reserva de sala",
     description="Microserviço responsável pela disparo de email",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RespostaJSON
+)
+
+metricas = instrumentar(app)
+registrar_logs(app, "disparo_email")
+rastrear(app, "disparo_email")
+metricas.coletor(
+    "email_caixa_saida",
+    "Estado da caixa de saída de e-mails (fila, tentativas, entregas e mortas)",
+    ("campo",),
+    lambda: {
+        (campo,): valor
+        for campo, valor in caixa_saida.estatisticas().items()
+        if campo in ("fila", "aguardando_nova_tentativa", "enviadas", "lotes", "falhas", "rejeitadas", "mortas")
+    }
 )
 
 app.add_middleware(
@@ -24,21 +84,35 @@ class DadosEmail(BaseModel):
     data_reserva: str
     hora_inicio: str
     nome_pessoa: str
+    hora_fim: Optional[str] = None
+
+_CORPO_HOME = CorpoEstatico({
+    "servico": "Disparo de email",
+    "status": "online",
+    "descricao": "Microserviço de disparo de email ativo e pronto para o gateway",
+    "endpoints": {
+        "enviar_confirmacao_reserva": "/email",
+        "fila": "/email/fila",
+        "mortas": "/email/mortas",
+        "reenviar_mortas": "/email/mortas/reenviar",
+    }
+})
+
 
 @app.get("/")
 def home():
-    return {
-        "servico": "Disparo de email",
-        "status": "online",
-        "descricao": "Microserviço de disparo de email ativo e pronto para o gateway",
-        "endpoints": {
-            "enviar_confirmacao_reserva": "/email",
-        }
-    }
-
-@app.post("/email")
-def disparo_de_email(dadosEmail: DadosEmail):
+    return _CORPO_HOME.resposta()
 
+@app.post("/email", status_code=202)
+async def disparo_de_email(dadosEmail: DadosEmail):
+    """
+    Coloca o email de confirmação na caixa de saída e responde na hora (202).
+    A entrega acontece em background; se a fila estiver cheia, responde 503.
+    (async: a caixa de saída é uma asyncio.Queue e só aceita chamadas do loop)
+    """
+    horario = dadosEmail.hora_inicio
+    if dadosEmail.hora_fim:
+        horario = f"{dadosEmail.hora_inicio} - {dadosEmail.hora_fim}"
 
     corpo_texto = f"""
     Olá {dadosEmail.nome_pessoa},
@@ -48,24 +122,46 @@ def disparo_de_email(dadosEmail: DadosEmail):
     Detalhes da Reserva:
     - Sala: {dadosEmail.nome_sala}
     - Data: {dadosEmail.data_reserva}
-    - Hora: {dadosEmail.hora_inicio}
+    - Hora: {horario}
     - Destinatário: {dadosEmail.email_pessoa}
 
     Obrigado!
     """
 
-    print("=" * 60)
-    print("DISPARO DE E-MAIL BEM-SUCEDIDO!")
-    print(corpo_texto)
-    print("=" * 60)
-
-
-    return {
-        "mensagem": "E-mail de confirmação disparado com sucesso!",
+    mensagem = MensagemEmail(
+        destinatario=dadosEmail.email_pessoa,
+        assunto=f"Confirmação de Reserva - {dadosEmail.nome_sala}",
+        corpo=corpo_texto
+    )
+    if not caixa_saida.enfileirar(mensagem):
+        raise HTTPException(status_code=503, detail="Fila de emails cheia; tente novamente mais tarde.")
+
+    return resposta_confiavel({
+        "mensagem": "E-mail de confirmação enfileirado para envio.",
+        "email_id": mensagem.id,
         "destinatario": dadosEmail.email_pessoa,
         "sala": dadosEmail.nome_sala
-    }
+    }, status_code=202)
+
+
+@app.get("/email/fila")
+async def estado_fila():
+    """Contadores da caixa de saída (fila, enviadas, falhas, mortas...)"""
+    return caixa_saida.estatisticas()
+
+
+@app.get("/email/mortas")
+async def listar_mortas():
+    """Emails que não puderam ser entregues"""
+    return [mensagem.resumo() for mensagem in caixa_saida.mortas]
+
+
+@app.post("/email/mortas/reenviar")
+async def reenviar_mortas():
+    """Devolve os emails mortos para a fila"""
+    return {"reenviados": caixa_saida.reenviar_mortas()}
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8004, reload=False)
\ No newline at end of file
+    configurar_logs()
+    uvicorn.run(app, host="0.0.0.0", port=8004, reload=False, log_config=None, access_log=False)
\ No newline at end of file
@@ -1,21 +1,34 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
-import tempfile
-import os
-from datetime import datetime
+from typing import List
+import logging
 import uvicorn
 
+from service.agenda import para_minutos
+from service.ics import data_compacta, gerar_calendario
+from service.logs import configurar_logs, registrar_logs
+from service.metricas import instrumentar
+from service.rastreamento import rastrear
+from service.respostas import CorpoEstatico, RespostaJSON
+
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="Serviço de Disparo de Evento (.ics)",
     description="Microserviço responsável por gerar e enviar eventos de calendário após reserva",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=RespostaJSON
 )
 
+metricas = instrumentar(app)
+registrar_logs(app, "disparo_evento")
+rastrear(app, "disparo_evento")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -34,35 +47,34 @@ class DadosEvento(BaseModel):
     hora_fim: str       
     organizador: str
 
-def gerar_arquivo_ics(dados: DadosEvento) -> str:
-    """Gera um arquivo .ics temporário com os detalhes do evento"""
-
-    inicio = datetime.strptime(f"{dados.data} {dados.hora_inicio}", "%Y-%m-%d %H:%M")
-    fim = datetime.strptime(f"{dados.data} {dados.hora_fim}", "%Y-%m-%d %H:%M")
-
-    conteudo_ics = f"""BEGIN:VCALENDAR
-VERSION:2.0
-PRODID:-//Sistema de Reservas//Disparo de Evento//PT-BR
-BEGIN:VEVENT
-UID:{dados.email}-{inicio.strftime('%Y%m%dT%H%M%S')}
-DTSTAMP:{datetime.now().strftime('%Y%m%dT%H%M%SZ')}
-DTSTART:{inicio.strftime('%Y%m%dT%H%M%S')}
-DTEND:{fim.strftime('%Y%m%dT%H%M%S')}
-SUMMARY:{dados.titulo}
-DESCRIPTION:{dados.descricao}
-LOCATION:{dados.local}
-ORGANIZER;CN={dados.organizador}:MAILTO:{dados.email}
-END:VEVENT
-END:VCALENDAR
-""".strip()
-
-    arquivo_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".ics")
-    with open(arquivo_temp.name, "w", encoding="utf-8") as f:
-        f.write(conteudo_ics)
-
-    return arquivo_temp.name
-
-def enviar_email_com_anexo(dados: DadosEvento, caminho_ics: str):
+class LoteEventos(BaseModel):
+    eventos: List[DadosEvento] = Field(..., min_length=1, max_length=10000)
+
+def _campos_evento(dados: DadosEvento) -> dict:
+    """Converte os dados recebidos nos campos de um VEVENT"""
+    inicio = f"{dados.data} {dados.hora_inicio}"
+    fim = f"{dados.data} {dados.hora_fim}"
+    # Valida formato e ordem antes de montar o calendário
+    if para_minutos(inicio) >= para_minutos(fim):
+        raise ValueError("A hora inicial deve ser anterior à final.")
+    return {
+        "uid": f"{dados.email}-{data_compacta(inicio)}",
+        "inicio": inicio,
+        "fim": fim,
+        "titulo": dados.titulo,
+        "descricao": dados.descricao,
+        "local": dados.local,
+        "organizador": dados.organizador,
+        "email": dados.email
+    }
+
+
+def gerar_ics(dados: DadosEvento) -> bytes:
+    """Gera o convite .ics em memória"""
+    return gerar_calendario([_campos_evento(dados)], convite=True)
+
+
+def enviar_email_com_anexo(dados: DadosEvento, conteudo_ics: bytes):
     """Simula o envio de um e-mail com o arquivo .ics anexado"""
 
     remetente = "noreply@reserva-salas.com"
@@ -91,45 +103,42 @@ Equipe do Sistema de Reserva de Salas
 
     mensagem.attach(MIMEText(corpo_email, "plain"))
 
-    # Adiciona o arquivo .ics como anexo
-    with open(caminho_ics, "rb") as arquivo:
-        parte = MIMEBase("text", "calendar", method="REQUEST", name=os.path.basename(caminho_ics))
-        parte.set_payload(arquivo.read())
-        encoders.encode_base64(parte)
-        parte.add_header(
-            "Content-Disposition",
-            f"attachment; filename={os.path.basename(caminho_ics)}"
-        )
-        mensagem.attach(parte)
-
-    print("=" * 60)
-    print("SIMULAÇÃO DE ENVIO DE E-MAIL COM EVENTO (.ics)")
-    print(f"De: {remetente}")
-    print(f"Para: {destinatario}")
-    print("-" * 60)
-    print(corpo_email)
-    print("-" * 60)
-    print(f"Anexo gerado: {caminho_ics}")
-    print("=" * 60)
+    # Adiciona o .ics (já em memória) como anexo
+    parte = MIMEBase("text", "calendar", method="REQUEST", name="reserva.ics")
+    parte.set_payload(conteudo_ics)
+    encoders.encode_base64(parte)
+    parte.add_header("Content-Disposition", "attachment; filename=reserva.ics")
+    mensagem.attach(parte)
+
+    extra = {"remetente": remetente, "destinatario": destinatario, "anexo_bytes": len(conteudo_ics)}
+    logger.info(f"✓ Envio simulado de evento (.ics) para {destinatario}", extra=extra)
+    logger.debug(corpo_email, extra=extra)
+
+_CORPO_HEALTH = CorpoEstatico({
+    "status": "online",
+    "servico": "Disparo de Evento",
+    "descricao": "Gera e envia eventos de calendário (.ics) via e-mail",
+    "porta": 8005,
+    "endpoint_principal": "/enviar_evento",
+    "calendario_lote": "/calendario/lote"
+})
+
 
 @app.get("/", tags=["Health"])
 def health_check():
     """Verifica se o serviço está online"""
-    return {
-        "status": "online",
-        "servico": "Disparo de Evento",
-        "descricao": "Gera e envia eventos de calendário (.ics) via e-mail",
-        "porta": 8005,
-        "endpoint_principal": "/enviar_evento"
-    }
+    return _CORPO_HEALTH.resposta()
 
 @app.post("/enviar_evento", tags=["Evento"])
 def enviar_evento(dados: DadosEvento):
     """Recebe os dados da reserva, gera o arquivo .ics e simula o envio do e-mail"""
     try:
-        caminho_ics = gerar_arquivo_ics(dados)
-        enviar_email_com_anexo(dados, caminho_ics)
-        os.remove(caminho_ics)
+        conteudo_ics = gerar_ics(dados)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Dados do evento inválidos: {str(e)}")
+
+    try:
+        enviar_email_com_anexo(dados, conteudo_ics)
 
         return {
             "status": "sucesso",
@@ -142,12 +151,21 @@ def enviar_evento(dados: DadosEvento):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao enviar evento: {str(e)}")
 
+@app.post("/calendario/lote", tags=["Evento"])
+def gerar_calendario_lote(lote: LoteEventos):
+    """Gera um único .ics com um VEVENT por reserva (ex.: importação de semestre)"""
+    try:
+        campos = [_campos_evento(dados) for dados in lote.eventos]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Dados do evento inválidos: {str(e)}")
+
+    return Response(
+        content=gerar_calendario(campos),
+        media_type="text/calendar",
+        headers={"Content-Disposition": "attachment; filename=reservas.ics"}
+    )
+
 if __name__ == "__main__":
-    print("\n" + "="*60)
-    print("Serviço de Disparo de Evento (.ics)")
-    print("="*60)
-    print("Porta: 8005")
-    print("Documentação: http://localhost:8005/docs")
-    print("="*60 + "\n")
-
-    uvicorn.run(app, host="0.0.0.0", port=8005)
+    configurar_logs()
+    logger.info("Serviço de Disparo de Evento (.ics) na porta 8005 (docs: http://localhost:8005/docs)")
+    uvicorn.run(app, host="0.0.0.0", port=8005, log_config=None, access_log=False)
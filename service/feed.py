@@ -0,0 +1,260 @@
+"""
+Feed de alterações de reservas
+O serviço de reserva (8003) mantém um log append-only de reservas criadas e
+canceladas, com números de sequência. O serviço de disponibilidade (8002)
+consome esse log de forma incremental a partir do último `seq` aplicado,
+via HTTP local (long-poll) ou diretamente em processo, sem broker externo.
+"""
+
+import asyncio
+import logging
+import threading
+from bisect import bisect_right
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CRIADA = "criada"
+CANCELADA = "cancelada"
+
+
+class LogAlteracoes:
+    """
+    Log append-only de eventos de reserva.
+
+    Cada evento recebe um `seq` crescente (a partir de 1) ao ser criado com
+    `novo_evento`, e só fica visível para leitura depois de `publicar` (ou é
+    descartado com `abandonar`, se a gravação falhar). Leitores nunca veem um
+    `seq` maior enquanto houver um menor pendente, então consumir "tudo acima
+    de N" nunca pula eventos.
+
+    A `epoca` identifica o histórico: se o serviço perder o log (ex.: reinício
+    sem armazenamento persistente), a época muda e os consumidores sabem que
+    precisam recomeçar do zero.
+    """
+
+    def __init__(self, epoca: str, eventos: Optional[List[dict]] = None):
+        self.epoca = epoca
+        self._eventos: List[dict] = sorted(eventos or [], key=lambda e: e["seq"])
+        self._seqs: List[int] = [e["seq"] for e in self._eventos]
+        self._proximo = (self._seqs[-1] if self._seqs else 0) + 1
+        self._pendentes: Set[int] = set()
+        self._condicao = threading.Condition()
+        # Long-polls assíncronos aguardando um evento (loop de cada um, futuro a resolver)
+        self._aguardando: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def restaurar(self, eventos: List[dict], epoca: Optional[str] = None) -> None:
+        """Substitui o conteúdo (e a época, se dada) pelo histórico carregado do armazenamento"""
+        with self._condicao:
+            if epoca is not None:
+                self.epoca = epoca
+            self._eventos = sorted(eventos, key=lambda e: e["seq"])
+            self._seqs = [e["seq"] for e in self._eventos]
+            self._proximo = (self._seqs[-1] if self._seqs else 0) + 1
+            self._pendentes.clear()
+            self._acordar()
+
+    @property
+    def ultimo_seq(self) -> int:
+        """Maior seq visível: todos os seqs abaixo dele já foram publicados ou descartados"""
+        if self._pendentes:
+            return min(self._pendentes) - 1
+        return self._proximo - 1
+
+    def novo_evento(self, tipo: str, reserva: dict) -> dict:
+        """Reserva o próximo seq e monta o evento (ainda não visível)"""
+        with self._condicao:
+            seq = self._proximo
+            self._proximo += 1
+            self._pendentes.add(seq)
+        return {
+            "seq": seq,
+            "tipo": tipo,
+            "reserva_id": reserva["reserva_id"],
+            "sala_id": reserva["sala_id"],
+            "inicio": reserva["inicio"],
+            "fim": reserva["fim"]
+        }
+
+    def publicar(self, evento: dict) -> None:
+        """Torna o evento visível e acorda quem estiver aguardando"""
+        with self._condicao:
+            pos = bisect_right(self._seqs, evento["seq"])
+            self._seqs.insert(pos, evento["seq"])
+            self._eventos.insert(pos, evento)
+            self._pendentes.discard(evento["seq"])
+            self._acordar()
+
+    def abandonar(self, evento: dict) -> None:
+        """Descarta um evento cuja gravação falhou (o seq fica sem uso)"""
+        with self._condicao:
+            self._pendentes.discard(evento["seq"])
+            self._acordar()
+
+    def _acordar(self) -> None:
+        """Acorda leitores síncronos e assíncronos (chamado com `_condicao`, de qualquer thread)"""
+        self._condicao.notify_all()
+        aguardando, self._aguardando = self._aguardando, []
+        for loop, futuro in aguardando:
+            loop.call_soon_threadsafe(_resolver, futuro)
+
+    def ler(self, desde: int = 0, limite: int = 1000, espera: float = 0.0) -> dict:
+        """
+        Eventos com seq > `desde`, no máximo `limite`. Se não houver nenhum e
+        `espera` > 0, bloqueia até chegar um evento ou o tempo acabar.
+        """
+        with self._condicao:
+            if espera > 0 and self.ultimo_seq <= desde:
+                self._condicao.wait_for(lambda: self.ultimo_seq > desde, timeout=espera)
+            ultimo = self.ultimo_seq
+            pos = bisect_right(self._seqs, desde)
+            fim = min(bisect_right(self._seqs, ultimo), pos + limite)
+            return {
+                "epoca": self.epoca,
+                "ultimo_seq": ultimo,
+                "eventos": self._eventos[pos:fim]
+            }
+
+    async def ler_com_espera(self, desde: int = 0, limite: int = 1000, espera: float = 0.0) -> dict:
+        """
+        Como `ler`, mas o long-poll espera no event loop em vez de bloquear uma
+        thread: um consumidor parado não ocupa o threadpool do servidor.
+        """
+        loop = asyncio.get_running_loop()
+        prazo = loop.time() + espera
+        while True:
+            restante = prazo - loop.time()
+            with self._condicao:
+                if self.ultimo_seq > desde or restante <= 0:
+                    break
+                futuro = loop.create_future()
+                self._aguardando.append((loop, futuro))
+            try:
+                await asyncio.wait_for(futuro, timeout=restante)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._condicao:
+                    if (loop, futuro) in self._aguardando:
+                        self._aguardando.remove((loop, futuro))
+        return self.ler(desde, limite)
+
+
+def _resolver(futuro: asyncio.Future) -> None:
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+# Fonte de eventos: (desde, limite, espera) -> {"epoca", "ultimo_seq", "eventos"}
+FonteAlteracoes = Callable[[int, int, float], Awaitable[dict]]
+
+
+def fonte_local(log: LogAlteracoes) -> FonteAlteracoes:
+    """Lê o log diretamente, quando os dois serviços rodam no mesmo processo (run_all --direto)"""
+    async def ler(desde: int, limite: int, espera: float) -> dict:
+        return await log.ler_com_espera(desde, limite, espera)
+    return ler
+
+
+def fonte_http(cliente: httpx.AsyncClient) -> FonteAlteracoes:
+    """
+    Lê o log pelo endpoint GET /alteracoes do serviço de reserva (`cliente`
+    com base_url apontando para ele; quem o cria o fecha)
+    """
+    async def ler(desde: int, limite: int, espera: float) -> dict:
+        response = await cliente.get(
+            "/alteracoes",
+            params={"desde": desde, "limite": limite, "espera": espera},
+            timeout=espera + 5.0
+        )
+        response.raise_for_status()
+        return response.json()
+    return ler
+
+
+class ConsumidorAlteracoes:
+    """
+    Aplica o feed de alterações de forma incremental.
+
+    `aplicar(evento)` é chamado para cada evento, em ordem; `resetar()` é
+    chamado quando a época do produtor muda, antes de reaplicar desde o
+    início. O último `seq` aplicado fica em `posicao`. Se a fonte usa um
+    cliente HTTP do próprio consumidor, ele é passado em `cliente` e fechado
+    em `parar`.
+    """
+
+    def __init__(
+        self,
+        fonte: FonteAlteracoes,
+        aplicar: Callable[[dict], None],
+        resetar: Callable[[], None],
+        posicao: int = 0,
+        epoca: Optional[str] = None,
+        limite: int = 1000,
+        espera: float = 10.0,
+        pausa_erro: float = 2.0,
+        cliente: Optional[httpx.AsyncClient] = None,
+    ):
+        self.fonte = fonte
+        self.aplicar = aplicar
+        self.resetar = resetar
+        self.posicao = posicao
+        self.epoca = epoca
+        self.limite = limite
+        self.espera = espera
+        self.pausa_erro = pausa_erro
+        self.aplicados = 0
+        self._cliente = cliente
+        self._tarefa: Optional[asyncio.Task] = None
+
+    async def sincronizar(self, espera: float = 0.0) -> int:
+        """Busca e aplica um lote de eventos; retorna quantos foram aplicados"""
+        lote = await self.fonte(self.posicao, self.limite, espera)
+
+        if self.epoca is not None and lote["epoca"] != self.epoca:
+            logger.warning("⚠ Histórico de reservas mudou de época; reaplicando do início")
+            self.resetar()
+            self.posicao = 0
+            self.epoca = lote["epoca"]
+            lote = await self.fonte(0, self.limite, 0.0)
+        self.epoca = lote["epoca"]
+
+        for evento in lote["eventos"]:
+            self.aplicar(evento)
+            self.posicao = evento["seq"]
+        self.aplicados += len(lote["eventos"])
+        return len(lote["eventos"])
+
+    async def _executar(self) -> None:
+        while True:
+            try:
+                # Long-poll: retorna assim que houver eventos ou após `espera`
+                await self.sincronizar(self.espera)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠ Falha ao ler alterações de reservas: {str(e)}")
+                await asyncio.sleep(self.pausa_erro)
+
+    def iniciar(self) -> None:
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar(), name="consumidor-alteracoes")
+
+    async def parar(self) -> None:
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+    def estado(self) -> dict:
+        return {
+            "ativo": self._tarefa is not None,
+            "epoca": self.epoca,
+            "posicao": self.posicao,
+            "aplicados": self.aplicados
+        }
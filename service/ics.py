@@ -0,0 +1,169 @@
+"""
+Geração de iCalendar (RFC 5545) em memória
+Monta VEVENTs a partir de um template fixo, com escape de texto e dobra de
+linhas em 75 octetos, sem passar por arquivos temporários. Usado pelo
+disparo de evento (convites) e pelos feeds de calendário.
+"""
+
+import io
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+CRLF = "\r\n"
+MAX_OCTETOS = 75
+
+PRODID = "-//Sistema de Reservas//Disparo de Evento//PT-BR"
+
+CABECALHO = (
+    "BEGIN:VCALENDAR" + CRLF
+    + "VERSION:2.0" + CRLF
+    + "PRODID:" + PRODID + CRLF
+    + "CALSCALE:GREGORIAN" + CRLF
+)
+CABECALHO_CONVITE = CABECALHO + "METHOD:REQUEST" + CRLF
+RODAPE = "END:VCALENDAR" + CRLF
+
+# Template do VEVENT: as propriedades de texto passam por escape e dobra
+_TEMPLATE_EVENTO = (
+    ("BEGIN:VEVENT", None),
+    ("UID:", "uid"),
+    ("DTSTAMP:", "dtstamp"),
+    ("DTSTART:", "inicio"),
+    ("DTEND:", "fim"),
+    ("SUMMARY:", "titulo"),
+    ("DESCRIPTION:", "descricao"),
+    ("LOCATION:", "local"),
+    ("ORGANIZER", "organizador"),
+    ("END:VEVENT", None),
+)
+
+_ESCAPES = str.maketrans({"\\": "\\\\", ";": "\\;", ",": "\\,", "\n": "\\n"})
+
+
+def escapar_texto(valor: str) -> str:
+    """Escapa um valor TEXT: barra invertida, ponto e vírgula, vírgula e quebras de linha"""
+    if "\r" in valor:
+        valor = valor.replace("\r\n", "\n").replace("\r", "\n")
+    return valor.translate(_ESCAPES)
+
+
+def escapar_parametro(valor: str) -> str:
+    """Valor de parâmetro (ex.: CN=...): sem aspas internas, entre aspas se tiver ; : ,"""
+    valor = valor.replace('"', "'").replace("\r", " ").replace("\n", " ")
+    if any(c in valor for c in ";:,"):
+        return f'"{valor}"'
+    return valor
+
+
+def dobrar_linha(linha: str) -> str:
+    """
+    Quebra a linha em partes de no máximo 75 octetos (UTF-8), com as
+    continuações começando por um espaço, sem partir caracteres multibyte.
+    """
+    if len(linha) <= MAX_OCTETOS // 4 or (linha.isascii() and len(linha) <= MAX_OCTETOS):
+        return linha + CRLF
+    partes = []
+    atual = []
+    octetos = 0
+    for caractere in linha:
+        tamanho = len(caractere.encode("utf-8"))
+        if octetos + tamanho > MAX_OCTETOS:
+            partes.append("".join(atual))
+            atual = [" "]
+            octetos = 1
+        atual.append(caractere)
+        octetos += tamanho
+    partes.append("".join(atual))
+    return CRLF.join(partes) + CRLF
+
+
+def formatar_data(valor: datetime) -> str:
+    """DATE-TIME local (sem fuso) ou UTC (com Z), conforme o datetime"""
+    texto = (
+        f"{valor.year:04d}{valor.month:02d}{valor.day:02d}"
+        f"T{valor.hour:02d}{valor.minute:02d}{valor.second:02d}"
+    )
+    if valor.tzinfo is not None and valor.utcoffset().total_seconds() == 0:
+        return texto + "Z"
+    return texto
+
+
+def data_compacta(texto: str) -> str:
+    """'YYYY-MM-DD HH:MM' -> 'YYYYMMDDTHHMM00' sem passar por datetime"""
+    if len(texto) != 16 or texto[4] != "-" or texto[7] != "-" or texto[10] != " " or texto[13] != ":":
+        return formatar_data(datetime.strptime(texto, "%Y-%m-%d %H:%M"))
+    return f"{texto[0:4]}{texto[5:7]}{texto[8:10]}T{texto[11:13]}{texto[14:16]}00"
+
+
+def dtstamp_atual() -> str:
+    return formatar_data(datetime.now(timezone.utc).replace(microsecond=0))
+
+
+def escrever_evento(
+    saida,
+    *,
+    uid: str,
+    inicio: str,
+    fim: str,
+    titulo: str,
+    descricao: str = "",
+    local: str = "",
+    organizador: Optional[str] = None,
+    email: Optional[str] = None,
+    dtstamp: Optional[str] = None,
+) -> None:
+    """
+    Escreve um VEVENT em `saida` (qualquer objeto com `write`).
+
+    `inicio` e `fim` vêm no formato 'YYYY-MM-DD HH:MM' usado pelos serviços.
+    """
+    valores = {
+        "uid": uid,
+        "dtstamp": dtstamp or dtstamp_atual(),
+        "inicio": data_compacta(inicio),
+        "fim": data_compacta(fim),
+        "titulo": escapar_texto(titulo),
+        "descricao": escapar_texto(descricao),
+        "local": escapar_texto(local),
+    }
+    for prefixo, campo in _TEMPLATE_EVENTO:
+        if campo is None:
+            saida.write(prefixo + CRLF)
+        elif campo == "organizador":
+            if email:
+                parametro = f";CN={escapar_parametro(organizador)}" if organizador else ""
+                saida.write(dobrar_linha(f"ORGANIZER{parametro}:mailto:{email}"))
+        elif campo in ("descricao", "local") and not valores[campo]:
+            continue
+        else:
+            saida.write(dobrar_linha(prefixo + valores[campo]))
+
+
+def gerar_calendario(eventos: Iterable[dict], convite: bool = False) -> bytes:
+    """Monta um VCALENDAR com um VEVENT por item de `eventos` (kwargs de escrever_evento)"""
+    buffer = io.StringIO()
+    buffer.write(CABECALHO_CONVITE if convite else CABECALHO)
+    dtstamp = dtstamp_atual()
+    for evento in eventos:
+        escrever_evento(buffer, dtstamp=dtstamp, **evento)
+    buffer.write(RODAPE)
+    return buffer.getvalue().encode("utf-8")
+
+
+
+def gerar_calendario_incremental(eventos: Iterable[dict], tamanho_bloco: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Mesmo conteúdo de `gerar_calendario`, entregue em blocos de ~`tamanho_bloco`
+    caracteres à medida que os eventos são lidos (memória constante em feeds grandes).
+    """
+    buffer = io.StringIO()
+    buffer.write(CABECALHO)
+    dtstamp = dtstamp_atual()
+    for evento in eventos:
+        escrever_evento(buffer, dtstamp=dtstamp, **evento)
+        if buffer.tell() >= tamanho_bloco:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    buffer.write(RODAPE)
+    yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,272 @@
+"""
+Logs estruturados e sem bloqueio, compartilhados por todos os serviços
+Os registros vão para uma fila e uma thread em background os formata e
+escreve (em JSON, uma linha por registro), de modo que a requisição nunca
+espera pelo console. Cada registro feito durante uma requisição leva o
+`request_id` (recebido em X-Request-Id ou gerado aqui e repassado pelo
+gateway aos serviços) e o `trace_id`.
+
+Amostragem: com LOG_AMOSTRAGEM_SUCESSO < 1, os registros INFO/DEBUG de uma
+requisição ficam guardados até ela terminar e só são escritos se ela falhar
+(código >= 400 ou exceção) ou cair na amostra; WARNING e acima saem sempre,
+na hora.
+
+Importar um serviço não mexe no logging do processo: `configurar_logs()` é
+chamado só pelos pontos de entrada (run_all.py, workers do supervisor e o
+`__main__` de cada serviço). Sem ele (testes, benchmarks, outro app que
+embute os serviços), o middleware continua gerando o X-Request-Id e a linha
+de acesso, e os registros seguem a configuração de quem importou.
+
+Configuração:
+  LOG_NIVEL               nível padrão (INFO)
+  LOG_NIVEIS              níveis por módulo, ex.: "service.main=DEBUG,httpx=WARNING"
+  LOG_FORMATO             json (padrão) ou texto
+  LOG_AMOSTRAGEM_SUCESSO  fração das requisições bem-sucedidas com logs INFO/DEBUG (padrão 1.0)
+  LOG_FILA_MAX            registros na fila antes de começar a descartar (padrão 10000)
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from fastapi import FastAPI
+
+from service.metricas import mapa_rotas
+from service.rastreamento import span_atual
+from service.respostas import serializar
+
+AMOSTRAGEM_SUCESSO = float(os.getenv("LOG_AMOSTRAGEM_SUCESSO", "1.0"))
+
+# Níveis aplicados antes de LOG_NIVEIS: o cliente HTTP do gateway registra cada chamada em INFO
+NIVEIS_PADRAO = "httpx=WARNING"
+
+# Atributos de todo LogRecord; o que sobrar veio de `extra=` e vira campo do JSON
+# (color_message é a mensagem com códigos ANSI que o uvicorn acrescenta)
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "color_message"}
+
+
+class ContextoRequisicao:
+    """Estado de log de uma requisição: IDs e os registros aguardando a decisão da amostragem"""
+
+    __slots__ = ("request_id", "servico", "amostrado", "pendentes", "encerrado")
+
+    def __init__(self, request_id: str, servico: str, amostrado: bool):
+        self.request_id = request_id
+        self.servico = servico
+        self.amostrado = amostrado
+        self.pendentes: List[logging.LogRecord] = []
+        self.encerrado = False
+
+
+_contexto: ContextVar[Optional[ContextoRequisicao]] = ContextVar("contexto_log", default=None)
+
+
+def request_id_atual() -> Optional[str]:
+    contexto = _contexto.get()
+    return contexto.request_id if contexto is not None else None
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro, com os campos de `extra=` no primeiro nível"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and valor is not None:
+                dados[chave] = valor
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            dados["exc"] = record.exc_text
+        return serializar(dados).decode()
+
+
+class FormatadorTexto(logging.Formatter):
+    """Formato legível para desenvolvimento, com o request_id quando houver"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        linha = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{linha} [{request_id}]" if request_id else linha
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """
+    Põe o registro na fila sem bloquear (descarta e conta se ela estiver
+    cheia) e, dentro de uma requisição fora da amostra, segura os registros
+    INFO/DEBUG até saber se ela falhou.
+    """
+
+    def __init__(self, fila: "queue.Queue"):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formata a mensagem e a exceção aqui, no thread que registrou; o
+        # formatador da thread de escrita só monta a linha
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            contexto = _contexto.get()
+            if contexto is not None:
+                record.request_id = contexto.request_id
+                record.servico = contexto.servico
+                span = span_atual()
+                if span is not None:
+                    record.trace_id = span.trace_id
+                if not contexto.amostrado and not contexto.encerrado and record.levelno < logging.WARNING:
+                    contexto.pendentes.append(self.prepare(record))
+                    return
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def liberar(self, contexto: ContextoRequisicao, manter: bool) -> None:
+        """Fim da requisição: escreve (manter=True) ou descarta os registros guardados"""
+        contexto.encerrado = True
+        pendentes, contexto.pendentes = contexto.pendentes, []
+        if manter:
+            for record in pendentes:
+                self.enqueue(record)
+
+
+_handler: Optional[HandlerFila] = None
+_ouvinte: Optional[logging.handlers.QueueListener] = None
+
+
+def _aplicar_niveis(especificacao: str) -> None:
+    for item in especificacao.split(","):
+        nome, _, nivel = item.partition("=")
+        if nome.strip() and nivel.strip():
+            logging.getLogger(nome.strip()).setLevel(nivel.strip().upper())
+
+
+def configurar_logs() -> HandlerFila:
+    """
+    Troca os handlers do logger raiz pela fila com escrita em background
+    (uma vez por processo; as chamadas seguintes só devolvem o handler)
+    """
+    global _handler, _ouvinte
+    if _handler is not None:
+        return _handler
+
+    saida = logging.StreamHandler(sys.stderr)
+    saida.setFormatter(FormatadorTexto() if os.getenv("LOG_FORMATO", "json") == "texto" else FormatadorJSON())
+    fila: "queue.Queue" = queue.Queue(maxsize=int(os.getenv("LOG_FILA_MAX", "10000")))
+    _handler = HandlerFila(fila)
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_handler)
+    raiz.setLevel(os.getenv("LOG_NIVEL", "INFO").upper())
+    _aplicar_niveis(NIVEIS_PADRAO)
+    _aplicar_niveis(os.getenv("LOG_NIVEIS", ""))
+
+    _ouvinte = logging.handlers.QueueListener(fila, saida, respect_handler_level=True)
+    _ouvinte.start()
+    atexit.register(_ouvinte.stop)
+    return _handler
+
+
+acesso = logging.getLogger("service.acesso")
+
+
+class MiddlewareLogs:
+    """
+    Abre o contexto de log da requisição (request_id e amostragem), devolve
+    X-Request-Id e registra uma linha de acesso por requisição.
+    """
+
+    def __init__(self, app, servico: str, rotas: Callable[[], Dict[Callable, str]]):
+        self.app = app
+        self.servico = servico
+        self._rotas = rotas
+        self._por_endpoint: Optional[Dict[Callable, str]] = None
+
+    def _rota(self, scope) -> str:
+        if self._por_endpoint is None:
+            self._por_endpoint = self._rotas()
+        return self._por_endpoint.get(scope.get("endpoint"), "desconhecida")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for nome, valor in scope["headers"]:
+            if nome == b"x-request-id":
+                request_id = valor.decode("latin-1")[:64]
+                break
+        contexto = ContextoRequisicao(
+            request_id or uuid.uuid4().hex[:16],
+            self.servico,
+            AMOSTRAGEM_SUCESSO >= 1.0 or random.random() < AMOSTRAGEM_SUCESSO
+        )
+        token = _contexto.set(contexto)
+        codigo = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal codigo
+            if mensagem["type"] == "http.response.start":
+                codigo = mensagem["status"]
+                mensagem = {
+                    **mensagem,
+                    "headers": [*mensagem.get("headers", []), (b"x-request-id", contexto.request_id.encode("latin-1"))]
+                }
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            acesso.info(
+                f"{scope['method']} {scope['path']} {codigo}",
+                extra={
+                    "metodo": scope["method"],
+                    "rota": self._rota(scope),
+                    "codigo": codigo,
+                    "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3),
+                }
+            )
+            _contexto.reset(token)
+            if _handler is not None:
+                _handler.liberar(contexto, manter=codigo >= 400)
+
+
+def registrar_logs(app: FastAPI, servico: str) -> None:
+    """
+    Adiciona o middleware de contexto de log ao app (sem configurar o logging
+    do processo; ver `configurar_logs`)
+    """
+    app.add_middleware(MiddlewareLogs, servico=servico, rotas=mapa_rotas(app))
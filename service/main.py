@@ -4,26 +4,36 @@ Porta: 8010
 Autor: Rodrigo
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, EmailStr, Field
+from contextlib import asynccontextmanager
 from datetime import datetime
-import requests
-from typing import Optional
+import asyncio
+import httpx
+from typing import List, Literal, Optional
 import logging
-
-# Configuração de logs
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+import os
+import time
+
+from service.cache import CacheTTL
+from service.clientes import ConfigServico, PoolClientes
+from service.logs import configurar_logs, registrar_logs
+from service.metricas import instrumentar
+from service.notificacoes import (
+    DespachanteNotificacoes,
+    MODO_BACKGROUND,
+    MODO_CONCORRENTE,
+    MODOS_NOTIFICACAO,
+    executar_concorrente,
 )
-logger = logging.getLogger(__name__)
+from service.rastreamento import etapa, rastrear
+from service.resiliencia import ABERTO, MEIO_ABERTO, PoliticaResiliencia, ServicoResiliente
+from service.respostas import CorpoEstatico, RespostaJSON, resposta_confiavel
+from service.saude import MonitorSaude
 
-# Instância FastAPI
-app = FastAPI(
-    title="Gateway - Sistema de Reserva de Salas",
-    description="Orquestrador central para reserva de salas em microsserviços",
-    version="1.0.0"
-)
+logger = logging.getLogger(__name__)
 
 # URLs dos microsserviços
 SERVICO_CONSULTA_SALA = "http://localhost:8001"
@@ -32,6 +42,165 @@ SERVICO_RESERVAR_SALA = "http://localhost:8003"
 SERVICO_DISPARO_EMAIL = "http://localhost:8004"
 SERVICO_DISPARO_EVENTO = "http://localhost:8005"
 
+# Pool de conexões: um cliente keep-alive por microsserviço
+clientes = PoolClientes({
+    "consulta_sala": ConfigServico(SERVICO_CONSULTA_SALA, timeout=5.0),
+    "verificar_disponibilidade": ConfigServico(SERVICO_VERIFICAR_DISPONIBILIDADE, timeout=5.0),
+    "reservar_sala": ConfigServico(SERVICO_RESERVAR_SALA, timeout=5.0, caminho_saude="/health"),
+    "disparo_email": ConfigServico(SERVICO_DISPARO_EMAIL, timeout=5.0, max_keepalive=10),
+    "disparo_evento": ConfigServico(SERVICO_DISPARO_EVENTO, timeout=5.0, max_keepalive=10),
+})
+
+# Resiliência por serviço: disjuntor em todos; retentativas (com orçamento) e
+# hedge só nas leituras idempotentes; email/evento lentos também abrem o disjuntor
+TENTATIVAS_LEITURA = int(os.getenv("GATEWAY_TENTATIVAS", "3"))
+HEDGE_APOS = float(os.getenv("GATEWAY_HEDGE_MS", "0")) / 1000 or None
+LIMITE_LENTO_NOTIFICACAO = float(os.getenv("GATEWAY_LIMITE_LENTO_NOTIFICACAO", "1.0"))
+
+_leitura = PoliticaResiliencia(tentativas=TENTATIVAS_LEITURA, hedge_apos=HEDGE_APOS)
+_notificacao = PoliticaResiliencia(limite_lento=LIMITE_LENTO_NOTIFICACAO)
+
+
+def observar_servico(servico: str, resultado: str, duracao: float) -> None:
+    """Latência de cada chamada a um microsserviço (histograma definido junto com o app)"""
+    latencia_servicos.observar(duracao, servico, resultado)
+
+
+resiliencia = {
+    "consulta_sala": ServicoResiliente("consulta_sala", clientes, _leitura, observar_servico),
+    "verificar_disponibilidade": ServicoResiliente("verificar_disponibilidade", clientes, _leitura, observar_servico),
+    "reservar_sala": ServicoResiliente("reservar_sala", clientes, PoliticaResiliencia(), observar_servico),
+    "disparo_email": ServicoResiliente("disparo_email", clientes, _notificacao, observar_servico),
+    "disparo_evento": ServicoResiliente("disparo_evento", clientes, _notificacao, observar_servico),
+}
+
+# Modo padrão das etapas não críticas (email e evento):
+#   sequencial  -> uma após a outra, dentro da requisição
+#   concorrente -> as duas ao mesmo tempo, dentro da requisição
+#   background  -> enfileiradas; o status é consultado em /notificacoes/{id}
+MODO_NOTIFICACAO = os.getenv("GATEWAY_MODO_NOTIFICACAO", MODO_CONCORRENTE)
+
+# Reserva atômica: o serviço de reserva (8003) verifica conflito (contra as
+# suas reservas e as ocupações pré-existentes que o 8002 também conhece) e
+# registra na mesma operação, dispensando a chamada separada a /verificar (8002)
+RESERVA_ATOMICA = os.getenv("GATEWAY_RESERVA_ATOMICA", "1") not in ("0", "false", "nao")
+
+# Notificações em andamento ao mesmo tempo por lote (POST /reservar/lote gera
+# duas por reserva); acima disso elas esperam a vez em vez de disputar o pool
+NOTIFICACOES_CONCORRENTES = int(os.getenv("GATEWAY_NOTIFICACOES_CONCORRENTES", "16"))
+
+despachante = DespachanteNotificacoes(tamanho_fila=1000, workers=4, concorrencia=NOTIFICACOES_CONCORRENTES)
+
+# Monitor de saúde: sonda os serviços em paralelo, em background; o /status
+# devolve o último retrato e o roteamento evita serviços fora do ar
+monitor = MonitorSaude(
+    clientes,
+    {
+        "consulta_sala": "Consulta de Sala (8001)",
+        "verificar_disponibilidade": "Verificar Disponibilidade (8002)",
+        "reservar_sala": "Reservar Sala (8003)",
+        "disparo_email": "Disparo de Email (8004)",
+        "disparo_evento": "Disparo de Evento (8005)",
+    },
+    intervalo=float(os.getenv("GATEWAY_SAUDE_INTERVALO", "5")),
+    timeout=float(os.getenv("GATEWAY_SAUDE_TIMEOUT", "2")),
+    tamanho_janela=int(os.getenv("GATEWAY_SAUDE_JANELA", "30"))
+)
+
+# Cache de metadados de salas (positivo e negativo)
+cache_salas = CacheTTL(
+    max_itens=int(os.getenv("GATEWAY_CACHE_SALAS_MAX", "4096")),
+    ttl=float(os.getenv("GATEWAY_CACHE_SALAS_TTL", "300")),
+    ttl_negativo=float(os.getenv("GATEWAY_CACHE_SALAS_TTL_NEGATIVO", "30"))
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Abre o pool de conexões, o despachante e o monitor no startup e fecha no shutdown"""
+    await clientes.abrir()
+    await despachante.iniciar()
+    await monitor.iniciar()
+    try:
+        yield
+    finally:
+        await monitor.parar()
+        await despachante.parar()
+        await clientes.fechar()
+
+
+# Instância FastAPI
+app = FastAPI(
+    title="Gateway - Sistema de Reserva de Salas",
+    description="Orquestrador central para reserva de salas em microsserviços",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RespostaJSON
+)
+
+# Métricas (GET /metrics): requisições do gateway, etapas do fluxo de reserva,
+# chamadas a cada microsserviço, disjuntores, pool de conexões e filas
+metricas = instrumentar(app)
+registrar_logs(app, "gateway")
+rastrear(app, "gateway")
+latencia_etapas = metricas.histograma(
+    "gateway_etapa_duracao_segundos", "Latência de cada etapa do fluxo de reserva", ("etapa",)
+)
+latencia_servicos = metricas.histograma(
+    "gateway_servico_duracao_segundos",
+    "Latência das chamadas aos microsserviços, por código de resposta (ou erro)",
+    ("servico", "resultado")
+)
+
+
+_ESTADOS_DISJUNTOR = {ABERTO: 2, MEIO_ABERTO: 1}
+metricas.coletor(
+    "gateway_disjuntor_estado", "Estado do disjuntor (0 fechado, 1 meio aberto, 2 aberto)", ("servico",),
+    lambda: {(nome,): _ESTADOS_DISJUNTOR.get(servico.disjuntor.estado, 0) for nome, servico in resiliencia.items()}
+)
+metricas.coletor(
+    "gateway_disjuntor_recusadas_total", "Chamadas recusadas pelo disjuntor aberto", ("servico",),
+    lambda: {(nome,): servico.disjuntor.recusadas for nome, servico in resiliencia.items()}, tipo="counter"
+)
+metricas.coletor(
+    "gateway_retentativas_total", "Retentativas e hedges feitos por serviço", ("servico", "tipo"),
+    lambda: {
+        chave: valor
+        for nome, servico in resiliencia.items()
+        for chave, valor in (((nome, "retentativa"), servico.retentativas), ((nome, "hedge"), servico.hedges))
+    },
+    tipo="counter"
+)
+metricas.coletor(
+    "gateway_pool_conexoes", "Conexões HTTP do pool por serviço", ("servico", "estado"),
+    lambda: {
+        chave: valor
+        for nome, e in clientes.estatisticas().items()
+        for chave, valor in (((nome, "ativa"), e["conexoes"] - e["ociosas"]), ((nome, "ociosa"), e["ociosas"]))
+    }
+)
+metricas.coletor(
+    "gateway_notificacoes_fila", "Lotes de notificações aguardando na fila", (),
+    lambda: {(): despachante.estatisticas()["fila"]}
+)
+metricas.coletor(
+    "gateway_cache_salas", "Contadores do cache de salas", ("campo",),
+    lambda: {
+        (campo,): valor for campo, valor in cache_salas.estatisticas().items()
+        if campo in ("itens", "acertos", "acertos_negativos", "falhas", "agrupados", "despejos", "invalidacoes")
+    }
+)
+
+
+async def medir_etapa(nome: str, aguardavel):
+    """
+    Aguarda uma etapa do fluxo registrando sua latência em
+    gateway_etapa_duracao_segundos, num span próprio e no Server-Timing
+    """
+    with latencia_etapas.cronometrar(nome), etapa(nome):
+        return await aguardavel
+
+
 # Modelos Pydantic
 class ReservaRequest(BaseModel):
     """Modelo de requisição para reserva de sala"""
@@ -69,31 +238,96 @@ class ErroResponse(BaseModel):
     detalhe: Optional[str] = None
 
 
+class ReservaLoteRequest(BaseModel):
+    """Modelo de requisição para reserva em lote"""
+    reservas: List[ReservaRequest] = Field(..., min_length=1, max_length=10000, description="Reservas do lote")
+    modo: Literal["melhor_esforco", "tudo_ou_nada"] = Field(
+        "melhor_esforco",
+        description="melhor_esforco registra os itens livres; tudo_ou_nada só registra se todos estiverem livres"
+    )
+
+
+class InvalidacaoCacheRequest(BaseModel):
+    """Modelo de requisição para invalidar o cache de salas"""
+    sala_id: Optional[str] = Field(None, description="ID da sala; vazio invalida todas")
+
+
+class BuscaSalaRequest(BaseModel):
+    """Modelo de requisição para busca de sala livre"""
+    data: str = Field(..., description="Data desejada (YYYY-MM-DD)")
+    hora_inicio: str = Field(..., description="Hora de início (HH:MM)")
+    hora_fim: str = Field(..., description="Hora de término (HH:MM)")
+    capacidade_minima: int = Field(1, ge=1, description="Capacidade mínima da sala")
+    prefixo: Optional[str] = Field(None, description="Tipo ou prefixo do ID da sala (ex: LAB)")
+    limite: int = Field(5, ge=1, le=100, description="Quantidade máxima de salas retornadas")
+    sugestoes: bool = Field(True, description="Sugerir horários próximos se nenhuma sala estiver livre")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "data": "2025-11-10",
+                "hora_inicio": "19:00",
+                "hora_fim": "21:00",
+                "capacidade_minima": 25,
+                "prefixo": "LAB",
+                "limite": 3
+            }
+        }
+
+
 # Funções auxiliares para chamar microsserviços
 
-def consultar_sala(sala_id: str) -> dict:
+def exigir_servico(servico: str, descricao: str) -> None:
+    """503 imediato (sem esperar timeout) se o monitor já marcou o serviço como offline"""
+    if not monitor.disponivel(servico):
+        raise HTTPException(
+            status_code=503,
+            detail=f"Serviço de {descricao} indisponível (offline no monitor de saúde)"
+        )
+
+
+def detalhe_erro(response: httpx.Response) -> str:
+    """`detail` do corpo de erro do serviço; se não for JSON com esse campo, o texto como veio"""
+    try:
+        corpo = response.json()
+    except ValueError:
+        return response.text
+    if isinstance(corpo, dict) and corpo.get("detail") is not None:
+        return corpo["detail"]
+    return response.text
+
+
+def verificacao_separada() -> bool:
+    """
+    Etapa 2 em chamada própria ao 8002? Sempre que RESERVA_ATOMICA estiver
+    desligada; com o 8002 offline, a reserva falha com 503 em vez de seguir
+    sem verificação.
+    """
+    return not RESERVA_ATOMICA
+
+
+async def buscar_sala(sala_id: str) -> Optional[dict]:
     """
     Chama o microsserviço de Consulta de Sala
     Porta: 8001
     Endpoint: GET /salas/{id}
+
+    Retorna None se a sala não existir.
     """
+    exigir_servico("consulta_sala", "Consulta de Sala")
+
     try:
-        logger.info(f"[1/5] Consultando sala {sala_id}...")
-        url = f"{SERVICO_CONSULTA_SALA}/salas/{sala_id}"
-        response = requests.get(url, timeout=5)
+        response = await resiliencia["consulta_sala"].requisitar(
+            "GET", f"/salas/{sala_id}", idempotente=True, hedge=True
+        )
 
         if response.status_code == 404:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Sala '{sala_id}' não encontrada"
-            )
+            return None
 
         response.raise_for_status()
-        sala = response.json()
-        logger.info(f"✓ Sala encontrada: {sala.get('nome', sala_id)}")
-        return sala
+        return response.json()
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"✗ Erro ao consultar sala: {str(e)}")
         raise HTTPException(
             status_code=503,
@@ -101,22 +335,45 @@ def consultar_sala(sala_id: str) -> dict:
         )
 
 
-def verificar_disponibilidade(sala_id: str, data: str, hora_inicio: str, hora_fim: str) -> dict:
+async def consultar_sala(sala_id: str) -> dict:
+    """
+    Consulta os dados da sala, passando pelo cache de salas do gateway
+
+    Buscas simultâneas pelo mesmo ID viram uma única chamada ao serviço, e
+    IDs inexistentes também ficam em cache (por um TTL menor).
+    """
+    logger.debug(f"[1/5] Consultando sala {sala_id}...")
+    sala = await cache_salas.obter(sala_id, lambda: buscar_sala(sala_id))
+
+    if sala is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Sala '{sala_id}' não encontrada"
+        )
+
+    logger.debug(f"✓ Sala encontrada: {sala.get('nome', sala_id)}")
+    return sala
+
+
+async def verificar_disponibilidade(sala_id: str, data: str, hora_inicio: str, hora_fim: str) -> dict:
     """
     Chama o microsserviço de Verificar Disponibilidade
     Porta: 8002
     Endpoint: POST /verificar
     """
+    exigir_servico("verificar_disponibilidade", "Verificação de Disponibilidade")
+
     try:
-        logger.info(f"[2/5] Verificando disponibilidade da sala {sala_id} em {data} {hora_inicio}-{hora_fim}...")
-        url = f"{SERVICO_VERIFICAR_DISPONIBILIDADE}/verificar"
+        logger.debug(f"[2/5] Verificando disponibilidade da sala {sala_id} em {data} {hora_inicio}-{hora_fim}...")
         payload = {
             "id_sala": sala_id,
             "inicio": f"{data} {hora_inicio}",
             "fim": f"{data} {hora_fim}"
         }
 
-        response = requests.post(url, json=payload, timeout=5)
+        response = await resiliencia["verificar_disponibilidade"].requisitar(
+            "POST", "/verificar", json=payload, idempotente=True, hedge=True
+        )
 
         if response.status_code == 409:
             resultado = response.json()
@@ -134,12 +391,12 @@ def verificar_disponibilidade(sala_id: str, data: str, hora_inicio: str, hora_fi
                 detail=f"Sala não disponível no horário solicitado: {resultado.get('detalhe', '')}"
             )
 
-        logger.info("✓ Sala disponível")
+        logger.debug("✓ Sala disponível")
         return resultado
 
     except HTTPException:
         raise
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"✗ Erro ao verificar disponibilidade: {str(e)}")
         raise HTTPException(
             status_code=503,
@@ -147,15 +404,16 @@ def verificar_disponibilidade(sala_id: str, data: str, hora_inicio: str, hora_fi
         )
 
 
-def reservar_sala(reserva_data: ReservaRequest) -> dict:
+async def reservar_sala(reserva_data: ReservaRequest) -> dict:
     """
     Chama o microsserviço de Reservar Sala
     Porta: 8003
     Endpoint: POST /reservar
     """
+    exigir_servico("reservar_sala", "Reserva de Sala")
+
     try:
-        logger.info(f"[3/5] Registrando reserva da sala {reserva_data.sala_id}...")
-        url = f"{SERVICO_RESERVAR_SALA}/reservar"
+        logger.debug(f"[3/5] Registrando reserva da sala {reserva_data.sala_id}...")
         payload = {
             "sala_id": reserva_data.sala_id,
             "data": reserva_data.data,
@@ -165,14 +423,24 @@ def reservar_sala(reserva_data: ReservaRequest) -> dict:
             "usuario_email": reserva_data.usuario_email
         }
 
-        response = requests.post(url, json=payload, timeout=5)
+        response = await resiliencia["reservar_sala"].requisitar("POST", "/reservar", json=payload)
+
+        # O serviço de reserva checa conflito e registra atomicamente
+        if response.status_code == 409:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Sala não disponível: {response.json().get('detail', 'Conflito de horário')}"
+            )
+
         response.raise_for_status()
         resultado = response.json()
 
-        logger.info(f"✓ Reserva registrada com ID: {resultado.get('reserva_id', 'N/A')}")
+        logger.debug(f"✓ Reserva registrada com ID: {resultado.get('reserva_id', 'N/A')}")
         return resultado
 
-    except requests.exceptions.RequestException as e:
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
         logger.error(f"✗ Erro ao reservar sala: {str(e)}")
         raise HTTPException(
             status_code=503,
@@ -180,58 +448,160 @@ def reservar_sala(reserva_data: ReservaRequest) -> dict:
         )
 
 
-def enviar_email(reserva_data: ReservaRequest, sala_info: dict) -> dict:
+async def reservar_salas_lote(reservas: List[ReservaRequest], modo: str) -> dict:
     """
-    Chama o microsserviço de Disparo de Email
-    Porta: 8004
-    Endpoint: POST /email
+    Chama o microsserviço de Reservar Sala
+    Porta: 8003
+    Endpoint: POST /reservar/lote
     """
+    exigir_servico("reservar_sala", "Reserva de Sala")
+
     try:
-        logger.info(f"[4/5] Enviando email de confirmação para {reserva_data.usuario_email}...")
-        url = f"{SERVICO_DISPARO_EMAIL}/email"
         payload = {
-            "destinatario": reserva_data.usuario_email,
-            "assunto": f"Confirmação de Reserva - Sala {reserva_data.sala_id}",
-            "corpo": f"""
-Olá {reserva_data.usuario_nome},
+            "reservas": [reserva.model_dump() for reserva in reservas],
+            "modo": modo
+        }
+        response = await resiliencia["reservar_sala"].requisitar("POST", "/reservar/lote", json=payload)
+
+        # tudo_ou_nada: nada foi registrado, mas o detalhe traz o motivo por item
+        if response.status_code == 409:
+            return response.json()["detail"]
 
-Sua reserva foi confirmada com sucesso!
+        response.raise_for_status()
+        return response.json()
+
+    except httpx.HTTPError as e:
+        logger.error(f"✗ Erro ao reservar salas em lote: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Serviço de Reserva de Sala indisponível: {str(e)}"
+        )
 
-Detalhes da Reserva:
-- Sala: {sala_info.get('nome', reserva_data.sala_id)}
-- Data: {reserva_data.data}
-- Horário: {reserva_data.hora_inicio} - {reserva_data.hora_fim}
 
-Atenciosamente,
-Sistema de Reserva de Salas
-            """.strip(),
-            "sala_id": reserva_data.sala_id,
-            "data": reserva_data.data,
-            "horario": f"{reserva_data.hora_inicio} - {reserva_data.hora_fim}"
+async def verificar_disponibilidade_lote(reservas: List[ReservaRequest]) -> List[dict]:
+    """
+    Chama o microsserviço de Verificar Disponibilidade
+    Porta: 8002
+    Endpoint: POST /verificar/lote
+    """
+    exigir_servico("verificar_disponibilidade", "Verificação de Disponibilidade")
+
+    try:
+        payload = [
+            {
+                "id_sala": reserva.sala_id,
+                "inicio": f"{reserva.data} {reserva.hora_inicio}",
+                "fim": f"{reserva.data} {reserva.hora_fim}"
+            }
+            for reserva in reservas
+        ]
+        response = await resiliencia["verificar_disponibilidade"].requisitar(
+            "POST", "/verificar/lote", json=payload, idempotente=True
+        )
+        response.raise_for_status()
+        return response.json()["resultados"]
+
+    except httpx.HTTPError as e:
+        logger.error(f"✗ Erro ao verificar disponibilidade em lote: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Serviço de Verificação de Disponibilidade indisponível: {str(e)}"
+        )
+
+
+async def repassar_calendario(caminho: str, request: Request, de: Optional[str], ate: Optional[str]) -> Response:
+    """
+    Chama o microsserviço de Reservar Sala
+    Porta: 8003
+    Endpoint: GET /salas/{id}/calendar.ics ou /usuarios/{email}/calendar.ics
+
+    Repassa o If-None-Match do cliente e devolve o feed em streaming, sem
+    montá-lo no gateway (304 passa direto).
+    """
+    params = {nome: valor for nome, valor in (("de", de), ("ate", ate)) if valor is not None}
+    headers = {}
+    if "if-none-match" in request.headers:
+        headers["If-None-Match"] = request.headers["if-none-match"]
+
+    exigir_servico("reservar_sala", "Reserva de Sala")
+
+    try:
+        response = await resiliencia["reservar_sala"].requisitar(
+            "GET", caminho, params=params, headers=headers, idempotente=True, stream=True
+        )
+    except httpx.HTTPError as e:
+        logger.error(f"✗ Erro ao obter calendário: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Serviço de Reserva de Sala indisponível: {str(e)}"
+        )
+
+    repassados = {
+        nome: response.headers[nome]
+        for nome in ("etag", "cache-control", "content-type")
+        if nome in response.headers
+    }
+    if response.status_code != 200:
+        await response.aread()
+        await response.aclose()
+        if response.status_code == 304:
+            return Response(status_code=304, headers=repassados)
+        raise HTTPException(status_code=response.status_code, detail=detalhe_erro(response))
+
+    return StreamingResponse(
+        response.aiter_raw(),
+        headers=repassados,
+        background=BackgroundTask(response.aclose)
+    )
+
+
+async def enviar_email(reserva_data: ReservaRequest, sala_info: dict) -> dict:
+    """
+    Chama o microsserviço de Disparo de Email
+    Porta: 8004
+    Endpoint: POST /email
+    """
+    if not monitor.disponivel("disparo_email"):
+        logger.warning("⚠ Email não enviado: serviço de email offline (não crítico)")
+        return {"enviado": False, "erro": "Serviço de Disparo de Email offline"}
+
+    try:
+        logger.debug(f"[4/5] Enviando email de confirmação para {reserva_data.usuario_email}...")
+        payload = {
+            "email_pessoa": reserva_data.usuario_email,
+            "nome_pessoa": reserva_data.usuario_nome,
+            "nome_sala": sala_info.get('nome', reserva_data.sala_id),
+            "data_reserva": reserva_data.data,
+            "hora_inicio": reserva_data.hora_inicio,
+            "hora_fim": reserva_data.hora_fim
         }
 
-        response = requests.post(url, json=payload, timeout=5)
+        response = await resiliencia["disparo_email"].requisitar("POST", "/email", json=payload)
         response.raise_for_status()
         resultado = response.json()
 
-        logger.info("✓ Email enviado com sucesso")
+        # 202: o serviço de email aceitou e entrega em background
+        logger.debug(f"✓ Email enfileirado: {resultado.get('email_id', 'N/A')}")
         return resultado
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.warning(f"⚠ Erro ao enviar email (não crítico): {str(e)}")
         # Email não é crítico, retorna sucesso parcial
         return {"enviado": False, "erro": str(e)}
 
 
-def enviar_evento_calendario(reserva_data: ReservaRequest, sala_info: dict) -> dict:
+async def enviar_evento_calendario(reserva_data: ReservaRequest, sala_info: dict) -> dict:
     """
     Chama o microsserviço de Disparo de Evento
     Porta: 8005
     Endpoint: POST /enviar_evento
     """
+    if not monitor.disponivel("disparo_evento"):
+        logger.warning("⚠ Evento não enviado: serviço de evento offline (não crítico)")
+        return {"enviado": False, "erro": "Serviço de Disparo de Evento offline"}
+
     try:
-        logger.info(f"[5/5] Gerando evento de calendário (.ics)...")
-        url = f"{SERVICO_DISPARO_EVENTO}/enviar_evento"
+        logger.debug(f"[5/5] Gerando evento de calendário (.ics)...")
         payload = {
             "email": reserva_data.usuario_email,
             "titulo": f"Reserva de Sala - {reserva_data.sala_id}",
@@ -243,36 +613,139 @@ def enviar_evento_calendario(reserva_data: ReservaRequest, sala_info: dict) -> d
             "organizador": reserva_data.usuario_nome
         }
 
-        response = requests.post(url, json=payload, timeout=5)
+        response = await resiliencia["disparo_evento"].requisitar("POST", "/enviar_evento", json=payload)
         response.raise_for_status()
         resultado = response.json()
 
-        logger.info("✓ Evento de calendário enviado")
+        logger.debug("✓ Evento de calendário enviado")
         return resultado
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.warning(f"⚠ Erro ao enviar evento (não crítico): {str(e)}")
         # Evento não é crítico, retorna sucesso parcial
         return {"enviado": False, "erro": str(e)}
 
 
+async def listar_catalogo() -> List[dict]:
+    """
+    Chama o microsserviço de Consulta de Sala
+    Porta: 8001
+    Endpoint: GET /salas
+    """
+    exigir_servico("consulta_sala", "Consulta de Sala")
+
+    try:
+        response = await resiliencia["consulta_sala"].requisitar("GET", "/salas", idempotente=True)
+        response.raise_for_status()
+        return response.json()
+
+    except httpx.HTTPError as e:
+        logger.error(f"✗ Erro ao listar salas: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Serviço de Consulta de Sala indisponível: {str(e)}"
+        )
+
+
+async def buscar_livres(salas: List[str], busca: BuscaSalaRequest) -> dict:
+    """
+    Chama o microsserviço de Verificar Disponibilidade
+    Porta: 8002
+    Endpoint: POST /buscar
+    """
+    exigir_servico("verificar_disponibilidade", "Verificação de Disponibilidade")
+
+    try:
+        payload = {
+            "salas": salas,
+            "inicio": f"{busca.data} {busca.hora_inicio}",
+            "fim": f"{busca.data} {busca.hora_fim}",
+            "limite": busca.limite,
+            "sugestoes": busca.sugestoes
+        }
+        response = await resiliencia["verificar_disponibilidade"].requisitar(
+            "POST", "/buscar", json=payload, idempotente=True
+        )
+
+        if response.status_code == 400:
+            raise HTTPException(status_code=400, detail=detalhe_erro(response))
+
+        response.raise_for_status()
+        return response.json()
+
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        logger.error(f"✗ Erro ao buscar salas livres: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Serviço de Verificação de Disponibilidade indisponível: {str(e)}"
+        )
+
+
 # Rotas da API
 
+_CORPO_HEALTH = CorpoEstatico({
+    "status": "online",
+    "servico": "Gateway - Sistema de Reserva de Salas",
+    "versao": "1.0.0",
+    "porta": 8010
+})
+
+
 @app.get("/", tags=["Health"])
 def health_check():
     """
     Endpoint de health check do gateway
     """
+    return _CORPO_HEALTH.resposta()
+
+
+async def disparar_notificacoes(reserva: ReservaRequest, sala_info: dict, modo: str) -> dict:
+    """
+    Executa as etapas 4 e 5 (não críticas) conforme o modo escolhido
+
+    Retorna os campos de notificação que entram na resposta da reserva.
+    """
+    tarefas = {
+        "email": lambda: medir_etapa("email", enviar_email(reserva, sala_info)),
+        "evento": lambda: medir_etapa("evento", enviar_evento_calendario(reserva, sala_info)),
+    }
+
+    if modo == MODO_BACKGROUND:
+        notificacao_id = despachante.enfileirar(tarefas)
+        if notificacao_id is not None:
+            logger.debug(f"[4-5/5] Notificações enfileiradas: {notificacao_id}")
+            return {
+                "email_enviado": None,
+                "evento_calendario_enviado": None,
+                "notificacao_id": notificacao_id
+            }
+        # Fila cheia ou despachante parado: executa dentro da requisição
+        modo = MODO_CONCORRENTE
+
+    if modo == MODO_CONCORRENTE:
+        resultados = await executar_concorrente(tarefas)
+    else:
+        resultados = {
+            "email": await tarefas["email"](),
+            "evento": await tarefas["evento"]()
+        }
+
     return {
-        "status": "online",
-        "servico": "Gateway - Sistema de Reserva de Salas",
-        "versao": "1.0.0",
-        "porta": 8010
+        "email_enviado": resultados["email"].get("enviado", True),
+        "evento_calendario_enviado": resultados["evento"].get("enviado", True)
     }
 
 
 @app.post("/reservar", response_model=ReservaResponse, tags=["Reservas"])
-def orquestrar_reserva(reserva: ReservaRequest):
+async def orquestrar_reserva(
+    reserva: ReservaRequest,
+    notificacao: Optional[str] = Query(
+        None,
+        description=f"Modo das notificações: {', '.join(MODOS_NOTIFICACAO)}"
+    )
+):
     """
     Orquestra o processo completo de reserva de sala
 
@@ -283,41 +756,51 @@ def orquestrar_reserva(reserva: ReservaRequest):
     4. Envia email de confirmação (8004)
     5. Envia evento de calendário (8005)
 
+    Com RESERVA_ATOMICA (padrão), as etapas 2 e 3 viram uma única chamada:
+    o serviço de reserva só registra se o horário estiver livre, sob lock da
+    sala, o que também elimina a corrida entre verificar e reservar. Sem
+    RESERVA_ATOMICA, o 8002 é obrigatório (503 se estiver offline).
+
+    As etapas 4 e 5 seguem o modo de notificação (sequencial, concorrente ou
+    background); em background a resposta traz um `notificacao_id`.
+
     Retorna confirmação consolidada ou erro detalhado
     """
-    logger.info("="*60)
-    logger.info(f"Nova requisição de reserva recebida: {reserva.sala_id}")
-    logger.info("="*60)
+    modo = notificacao or MODO_NOTIFICACAO
+    if modo not in MODOS_NOTIFICACAO:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Modo de notificação inválido: '{modo}'"
+        )
+
+    logger.debug(f"Nova requisição de reserva recebida: {reserva.sala_id}")
 
     try:
         # Etapa 1: Consultar sala
-        sala_info = consultar_sala(reserva.sala_id)
-
-        # Etapa 2: Verificar disponibilidade
-        disponibilidade = verificar_disponibilidade(
-            reserva.sala_id,
-            reserva.data,
-            reserva.hora_inicio,
-            reserva.hora_fim
-        )
+        sala_info = await medir_etapa("consulta_sala", consultar_sala(reserva.sala_id))
 
-        # Etapa 3: Reservar sala
-        resultado_reserva = reservar_sala(reserva)
+        # Etapa 2: Verificar disponibilidade (feita junto com a etapa 3 no modo atômico)
+        if verificacao_separada():
+            await medir_etapa("verificacao", verificar_disponibilidade(
+                reserva.sala_id,
+                reserva.data,
+                reserva.hora_inicio,
+                reserva.hora_fim
+            ))
 
-        # Etapa 4: Enviar email (não crítico)
-        resultado_email = enviar_email(reserva, sala_info)
-        email_enviado = resultado_email.get("enviado", True)
+        # Etapa 3: Reservar sala (se livre)
+        resultado_reserva = await medir_etapa("reserva", reservar_sala(reserva))
 
-        # Etapa 5: Enviar evento de calendário (não crítico)
-        resultado_evento = enviar_evento_calendario(reserva, sala_info)
-        evento_enviado = resultado_evento.get("enviado", True)
+        # Etapas 4 e 5: Enviar email e evento de calendário (não críticos)
+        notificacoes = await medir_etapa("notificacoes", disparar_notificacoes(reserva, sala_info, modo))
 
         # Resposta consolidada
-        logger.info("="*60)
-        logger.info("✓ RESERVA CONCLUÍDA COM SUCESSO")
-        logger.info("="*60)
+        logger.info(
+            f"✓ Reserva concluída: {resultado_reserva.get('reserva_id')}",
+            extra={"sala_id": reserva.sala_id, "reserva_id": resultado_reserva.get("reserva_id"), "modo": modo}
+        )
 
-        return {
+        return resposta_confiavel({
             "status": "sucesso",
             "mensagem": "Reserva confirmada",
             "reserva": {
@@ -327,58 +810,254 @@ def orquestrar_reserva(reserva: ReservaRequest):
                 "usuario": reserva.usuario_nome,
                 "data": reserva.data,
                 "horario": f"{reserva.hora_inicio} - {reserva.hora_fim}",
-                "email_enviado": email_enviado,
-                "evento_calendario_enviado": evento_enviado
+                **notificacoes
             }
-        }
+        })
 
     except HTTPException as e:
-        logger.error("="*60)
-        logger.error(f"✗ FALHA NA RESERVA: {e.detail}")
-        logger.error("="*60)
+        logger.warning(
+            f"✗ Falha na reserva: {e.detail}",
+            extra={"sala_id": reserva.sala_id, "codigo": e.status_code}
+        )
         raise
 
     except Exception as e:
-        logger.error("="*60)
-        logger.error(f"✗ ERRO INESPERADO: {str(e)}")
-        logger.error("="*60)
+        logger.exception(f"✗ Erro inesperado na reserva: {str(e)}", extra={"sala_id": reserva.sala_id})
         raise HTTPException(
             status_code=500,
             detail=f"Erro interno no gateway: {str(e)}"
         )
 
 
-@app.get("/status", tags=["Health"])
-def verificar_status_servicos():
-    """
-    Verifica o status de todos os microsserviços conectados
+@app.post("/reservar/lote", tags=["Reservas"])
+async def orquestrar_reserva_lote(lote: ReservaLoteRequest):
     """
-    servicos = {
-        "Consulta de Sala (8001)": SERVICO_CONSULTA_SALA,
-        "Verificar Disponibilidade (8002)": SERVICO_VERIFICAR_DISPONIBILIDADE,
-        "Reservar Sala (8003)": SERVICO_RESERVAR_SALA,
-        "Disparo de Email (8004)": SERVICO_DISPARO_EMAIL,
-        "Disparo de Evento (8005)": SERVICO_DISPARO_EVENTO
-    }
-
-    status_geral = {}
+    Registra várias reservas de uma vez (ex.: importação de início de semestre)
 
-    for nome, url in servicos.items():
-        try:
-            response = requests.get(f"{url}/", timeout=2)
-            status_geral[nome] = {
-                "status": "online" if response.status_code == 200 else "degradado",
-                "codigo": response.status_code
+    Fluxo:
+    1. Cada sala distinta do lote é consultada uma única vez (via cache)
+    2. Sem RESERVA_ATOMICA, a disponibilidade de todos os itens é checada
+       em uma única chamada a /verificar/lote (8002)
+    3. Os itens restantes vão em uma única chamada a /reservar/lote (8003),
+       que registra tudo em uma gravação
+    4-5. Emails e eventos de todas as reservas registradas entram na fila de
+       notificações como um único lote (`notificacao_id`)
+
+    Em `tudo_ou_nada`, qualquer item inválido, de sala inexistente ou em
+    conflito impede o lote inteiro. A resposta traz o resultado de cada item
+    (na ordem enviada) e a vazão em reservas por segundo.
+    """
+    inicio_lote = time.perf_counter()
+    total = len(lote.reservas)
+    resultados: List[Optional[dict]] = [None] * total
+    logger.info(f"Nova requisição de reserva em lote: {total} itens ({lote.modo})")
+
+    # Etapa 1: Consultar cada sala uma vez
+    sala_ids = list(dict.fromkeys(reserva.sala_id for reserva in lote.reservas))
+    salas = await asyncio.gather(*(
+        cache_salas.obter(sala_id, lambda sala_id=sala_id: buscar_sala(sala_id))
+        for sala_id in sala_ids
+    ))
+    salas_info = dict(zip(sala_ids, salas))
+
+    for i, reserva in enumerate(lote.reservas):
+        if salas_info[reserva.sala_id] is None:
+            resultados[i] = {
+                "indice": i,
+                "status": "sala_inexistente",
+                "codigo": 404,
+                "detalhe": f"Sala '{reserva.sala_id}' não encontrada"
             }
-        except Exception as e:
-            status_geral[nome] = {
-                "status": "offline",
-                "erro": str(e)
+
+    # Etapa 2: Verificar disponibilidade em lote (feita pelo 8003 no modo atômico)
+    pendentes = [i for i in range(total) if resultados[i] is None]
+    if pendentes and verificacao_separada():
+        verificacoes = await verificar_disponibilidade_lote([lote.reservas[i] for i in pendentes])
+        livres = []
+        for i, verificacao in zip(pendentes, verificacoes):
+            if verificacao.get("disponivel"):
+                livres.append(i)
+            else:
+                codigo = verificacao.get("codigo", 409)
+                resultados[i] = {
+                    "indice": i,
+                    "status": "invalida" if codigo == 400 else "conflito",
+                    "codigo": codigo,
+                    "detalhe": verificacao.get("erro") or verificacao.get("mensagem")
+                }
+        pendentes = livres
+
+    registradas = []
+    if lote.modo == "tudo_ou_nada" and len(pendentes) < total:
+        for i in pendentes:
+            resultados[i] = {
+                "indice": i,
+                "status": "nao_processada",
+                "codigo": 409,
+                "detalhe": "Lote cancelado: há itens inválidos ou em conflito."
             }
+    elif pendentes:
+        # Etapa 3: Registrar em uma única gravação
+        resposta = await reservar_salas_lote([lote.reservas[i] for i in pendentes], lote.modo)
+        for i, item in zip(pendentes, resposta["resultados"]):
+            resultados[i] = {**item, "indice": i}
+            if item["status"] == "registrada":
+                registradas.append(i)
+
+    # Etapas 4 e 5: notificações de todo o lote de uma vez
+    notificacao_id = None
+    if registradas:
+        tarefas = {}
+        for i in registradas:
+            reserva = lote.reservas[i]
+            sala_info = salas_info[reserva.sala_id]
+            reserva_id = resultados[i]["reserva_id"]
+            tarefas[f"email:{reserva_id}"] = lambda r=reserva, s=sala_info: enviar_email(r, s)
+            tarefas[f"evento:{reserva_id}"] = lambda r=reserva, s=sala_info: enviar_evento_calendario(r, s)
+        notificacao_id = despachante.enfileirar(tarefas)
+        if notificacao_id is None:
+            # Fila cheia ou despachante parado: executa dentro da requisição
+            await executar_concorrente(tarefas, NOTIFICACOES_CONCORRENTES)
+
+    duracao = time.perf_counter() - inicio_lote
+    vazao = round(len(registradas) / duracao, 1) if duracao > 0 else 0.0
+    logger.info(f"✓ Lote concluído: {len(registradas)}/{total} reservas em {duracao * 1000:.1f} ms ({vazao} reservas/s)")
+
+    return resposta_confiavel({
+        "status": "sucesso" if len(registradas) == total else ("parcial" if registradas else "falha"),
+        "modo": lote.modo,
+        "total": total,
+        "registradas": len(registradas),
+        "rejeitadas": total - len(registradas),
+        "duracao_ms": round(duracao * 1000, 2),
+        "reservas_por_segundo": vazao,
+        "notificacao_id": notificacao_id,
+        "resultados": resultados
+    })
+
+
+@app.post("/salas/buscar", tags=["Salas"])
+async def buscar_sala_livre(busca: BuscaSalaRequest):
+    """
+    Encontra salas livres no horário pedido
+
+    Uma chamada ao catálogo (8001) seleciona as salas disponíveis com a
+    capacidade e o prefixo pedidos, ordenadas pelo melhor encaixe de
+    capacidade; uma única chamada à disponibilidade (8002) cruza essas
+    candidatas com as agendas e devolve as primeiras livres, ou os horários
+    livres mais próximos quando nenhuma serve.
+    """
+    catalogo = await listar_catalogo()
+
+    candidatas = [
+        sala for sala in catalogo
+        if sala.get("disponivel", True)
+        and sala.get("capacidade", 0) >= busca.capacidade_minima
+        and (not busca.prefixo or sala["id"].startswith(busca.prefixo))
+    ]
+    candidatas.sort(key=lambda sala: (sala.get("capacidade", 0) - busca.capacidade_minima, sala["id"]))
+
+    resultado = await buscar_livres([sala["id"] for sala in candidatas], busca)
+    por_id = {sala["id"]: sala for sala in candidatas}
+
+    return resposta_confiavel({
+        "salas": [por_id[sala_id] for sala_id in resultado["livres"]],
+        "sugestoes": [
+            {**sugestao, "sala_nome": por_id[sugestao["id_sala"]].get("nome")}
+            for sugestao in resultado["sugestoes"]
+        ]
+    })
+
+
+@app.get("/salas/{sala_id}/calendar.ics", tags=["Calendário"])
+async def calendario_sala(
+    sala_id: str,
+    request: Request,
+    de: Optional[str] = Query(None, description="Data inicial (YYYY-MM-DD)"),
+    ate: Optional[str] = Query(None, description="Data final (YYYY-MM-DD)")
+):
+    """
+    Feed iCalendar da sala para assinatura em apps de calendário
+
+    Suporta If-None-Match: clientes que consultam o feed periodicamente
+    recebem 304 enquanto as reservas da sala não mudarem.
+    """
+    await consultar_sala(sala_id)
+    return await repassar_calendario(f"/salas/{sala_id}/calendar.ics", request, de, ate)
+
+
+@app.get("/usuarios/{email}/calendar.ics", tags=["Calendário"])
+async def calendario_usuario(
+    email: str,
+    request: Request,
+    de: Optional[str] = Query(None, description="Data inicial (YYYY-MM-DD)"),
+    ate: Optional[str] = Query(None, description="Data final (YYYY-MM-DD)")
+):
+    """
+    Feed iCalendar com as reservas do usuário (mesmo comportamento de
+    cache/304 do feed da sala)
+    """
+    return await repassar_calendario(f"/usuarios/{email}/calendar.ics", request, de, ate)
 
+
+@app.get("/notificacoes/{notificacao_id}", tags=["Reservas"])
+async def consultar_notificacoes(notificacao_id: str):
+    """
+    Consulta o status de entrega das notificações de uma reserva feita em
+    modo background
+    """
+    status = despachante.obter_status(notificacao_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Notificação não encontrada")
+    return status
+
+
+@app.post("/cache/salas/invalidar", tags=["Cache"])
+async def invalidar_cache_salas(dados: InvalidacaoCacheRequest):
+    """
+    Invalida o cache de salas do gateway
+
+    Chamado pelo serviço de Consulta de Sala (8001) quando uma sala é
+    criada, alterada ou removida.
+    """
+    removidos = cache_salas.invalidar(dados.sala_id) if dados.sala_id else cache_salas.invalidar_tudo()
+    logger.info(f"Cache de salas invalidado: {dados.sala_id or 'todas'}")
+    return {"invalidado": dados.sala_id or "todas", "removidos": removidos}
+
+
+@app.get("/cache/salas", tags=["Cache"])
+async def estatisticas_cache_salas():
+    """
+    Contadores do cache de salas (acertos, falhas, despejos...)
+    """
+    return cache_salas.estatisticas()
+
+
+@app.get("/resiliencia", tags=["Health"])
+async def estado_resiliencia():
+    """
+    Estado do disjuntor, orçamento de retentativas e contadores de
+    retentativas/hedge de cada microsserviço
+    """
+    return {nome: servico.estatisticas() for nome, servico in resiliencia.items()}
+
+
+@app.get("/status", tags=["Health"])
+async def verificar_status_servicos(
+    atualizar: bool = Query(False, description="Sonda os serviços agora em vez de usar o último retrato")
+):
+    """
+    Status de todos os microsserviços conectados
+
+    Vem do monitor de saúde, que sonda os serviços em paralelo em background:
+    a resposta é imediata e traz, por serviço, o estado, a última latência e
+    a latência média/p95 e a taxa de erro da janela recente.
+    """
+    retrato = await (monitor.verificar_agora() if atualizar else monitor.retrato())
     return {
         "gateway": "online",
-        "servicos": status_geral
+        "despacho_direto": clientes.diretos,
+        **retrato
     }
 
 
@@ -386,12 +1065,6 @@ def verificar_status_servicos():
 if __name__ == "__main__":
     import uvicorn
 
-    print("\n" + "="*60)
-    print("🚀 Gateway - Sistema de Reserva de Salas")
-    print("="*60)
-    print("Porta: 8010")
-    print("Documentação: http://localhost:8010/docs")
-    print("Status: http://localhost:8010/status")
-    print("="*60 + "\n")
-
-    uvicorn.run(app, host="0.0.0.0", port=8010)
+    configurar_logs()
+    logger.info("🚀 Gateway - Sistema de Reserva de Salas na porta 8010 (docs: http://localhost:8010/docs)")
+    uvicorn.run(app, host="0.0.0.0", port=8010, log_config=None, access_log=False)
@@ -0,0 +1,284 @@
+"""
+Métricas no formato texto do Prometheus
+Contadores, medidores e histogramas em memória, sem dependências externas,
+feitos para ficar ligados em produção: registrar uma observação custa uma
+busca binária e um incremento sob lock. `instrumentar(app)` adiciona a um
+app FastAPI o middleware de requisições (contagem por código, latência por
+rota e requisições em andamento) e a rota GET /metrics.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI, Response
+
+MEDIA_PROMETHEUS = "text/plain; version=0.0.4"
+
+# Limites padrão (segundos) dos histogramas de latência
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Rotulos = Tuple[str, ...]
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_rotulos(nomes: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica(ABC):
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+
+    def _cabecalho(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+    @abstractmethod
+    def expor(self) -> List[str]:
+        """Linhas no formato texto do Prometheus (cabeçalho e amostras)"""
+
+
+class Contador(_Metrica):
+    """Valor que só cresce, por combinação de rótulos"""
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: Dict[Rotulos, float] = {}
+
+    def inc(self, *rotulos: str, valor: float = 1.0) -> None:
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0.0) + valor
+
+    def expor(self) -> List[str]:
+        linhas = self._cabecalho()
+        for rotulos, valor in list(self._valores.items()):
+            linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {_formatar_numero(valor)}")
+        return linhas
+
+
+class Medidor(Contador):
+    """Valor que sobe e desce (ex.: requisições em andamento)"""
+    tipo = "gauge"
+
+    def dec(self, *rotulos: str, valor: float = 1.0) -> None:
+        self.inc(*rotulos, valor=-valor)
+
+
+class Histograma(_Metrica):
+    """
+    Histograma com limites fixos. Guarda a contagem de cada faixa (não
+    acumulada) e a soma; as faixas acumuladas `le` são montadas só na exposição.
+    """
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (), limites: Sequence[float] = LIMITES_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(sorted(limites))
+        self._series: Dict[Rotulos, list] = {}
+
+    def observar(self, valor: float, *rotulos: str) -> None:
+        indice = bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                # [contagem por faixa..., +Inf, soma]
+                serie = self._series[rotulos] = [0] * (len(self.limites) + 1) + [0.0]
+            serie[indice] += 1
+            serie[-1] += valor
+
+    def cronometrar(self, *rotulos: str) -> "Cronometro":
+        """Context manager que observa o tempo decorrido do bloco"""
+        return Cronometro(self, rotulos)
+
+    def expor(self) -> List[str]:
+        linhas = self._cabecalho()
+        with self._lock:
+            series = [(rotulos, list(serie)) for rotulos, serie in self._series.items()]
+        for rotulos, serie in series:
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float("inf"),), serie[:-1]):
+                acumulado += contagem
+                le = f'le="{_formatar_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, rotulos, le)} {acumulado}")
+            sufixo = _formatar_rotulos(self.rotulos, rotulos)
+            linhas.append(f"{self.nome}_sum{sufixo} {_formatar_numero(serie[-1])}")
+            linhas.append(f"{self.nome}_count{sufixo} {acumulado}")
+        return linhas
+
+
+class Cronometro:
+    __slots__ = ("histograma", "rotulos", "inicio")
+
+    def __init__(self, histograma: Histograma, rotulos: Rotulos):
+        self.histograma = histograma
+        self.rotulos = rotulos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        self.histograma.observar(time.perf_counter() - self.inicio, *self.rotulos)
+        return False
+
+
+class Coletor(_Metrica):
+    """Métrica calculada na hora da coleta (ex.: estado do pool de conexões)"""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str], tipo: str,
+                 funcao: Callable[[], Dict[Rotulos, float]]):
+        super().__init__(nome, ajuda, rotulos)
+        self.tipo = tipo
+        self.funcao = funcao
+
+    def expor(self) -> List[str]:
+        linhas = self._cabecalho()
+        for rotulos, valor in self.funcao().items():
+            linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {_formatar_numero(valor)}")
+        return linhas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas de um serviço, exposto em GET /metrics"""
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def _registrar(self, metrica: _Metrica):
+        if metrica.nome in self._metricas:
+            raise ValueError(f"Métrica já registrada: {metrica.nome}")
+        self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def medidor(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Medidor:
+        return self._registrar(Medidor(nome, ajuda, rotulos))
+
+    def histograma(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                   limites: Sequence[float] = LIMITES_LATENCIA) -> Histograma:
+        return self._registrar(Histograma(nome, ajuda, rotulos, limites))
+
+    def coletor(self, nome: str, ajuda: str, rotulos: Sequence[str],
+                funcao: Callable[[], Dict[Rotulos, float]], tipo: str = "gauge") -> Coletor:
+        return self._registrar(Coletor(nome, ajuda, rotulos, tipo, funcao))
+
+    def expor(self) -> str:
+        linhas: List[str] = []
+        for metrica in list(self._metricas.values()):
+            linhas.extend(metrica.expor())
+        return "\n".join(linhas) + "\n"
+
+
+class MetricasHTTP:
+    """Métricas das requisições HTTP de um app (alimentadas pelo MiddlewareMetricas)"""
+
+    def __init__(self, registro: RegistroMetricas):
+        self.requisicoes = registro.contador(
+            "http_requisicoes_total", "Requisições HTTP atendidas", ("metodo", "rota", "codigo")
+        )
+        self.excecoes = registro.contador(
+            "http_excecoes_total", "Requisições encerradas por exceção não tratada", ("metodo", "rota")
+        )
+        self.duracao = registro.histograma(
+            "http_requisicao_duracao_segundos", "Latência das requisições HTTP", ("metodo", "rota")
+        )
+        self.em_andamento = registro.medidor(
+            "http_requisicoes_em_andamento", "Requisições HTTP em andamento"
+        )
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI (sem BaseHTTPMiddleware, para não custar uma task por
+    requisição) que mede cada requisição HTTP. A rota vem do template do
+    endpoint casado pelo roteador (ex.: /salas/{sala_id}), para que IDs não
+    virem rótulos; caminhos sem rota entram como "desconhecida".
+    """
+
+    def __init__(self, app, metricas: MetricasHTTP, rotas: Callable[[], Dict[Callable, str]]):
+        self.app = app
+        self.metricas = metricas
+        self._rotas = rotas
+        self._por_endpoint: Optional[Dict[Callable, str]] = None
+
+    def _rota(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "desconhecida"
+        if self._por_endpoint is None:
+            self._por_endpoint = self._rotas()
+        return self._por_endpoint.get(endpoint, "desconhecida")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codigo = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal codigo
+            if mensagem["type"] == "http.response.start":
+                codigo = mensagem["status"]
+            await send(mensagem)
+
+        metricas = self.metricas
+        metricas.em_andamento.inc()
+        try:
+            await self.app(scope, receive, enviar)
+        except Exception:
+            metricas.excecoes.inc(scope["method"], self._rota(scope))
+            raise
+        finally:
+            metricas.em_andamento.dec()
+            rota = self._rota(scope)
+            metricas.duracao.observar(time.perf_counter() - inicio, scope["method"], rota)
+            metricas.requisicoes.inc(scope["method"], rota, str(codigo))
+
+
+def mapa_rotas(app: FastAPI) -> Callable[[], Dict[Callable, str]]:
+    """Função que mapeia endpoint -> template da rota (chamada só na primeira requisição)"""
+    def mapear() -> Dict[Callable, str]:
+        return {
+            rota.endpoint: rota.path
+            for rota in app.routes
+            if getattr(rota, "endpoint", None) is not None
+        }
+    return mapear
+
+
+def instrumentar(app: FastAPI) -> RegistroMetricas:
+    """Adiciona o middleware de métricas e a rota GET /metrics; retorna o registro"""
+    registro = RegistroMetricas()
+    app.add_middleware(MiddlewareMetricas, metricas=MetricasHTTP(registro), rotas=mapa_rotas(app))
+
+    async def metricas():
+        return Response(content=registro.expor(), media_type=MEDIA_PROMETHEUS)
+
+    app.add_api_route("/metrics", metricas, methods=["GET"], include_in_schema=False)
+    return registro
@@ -0,0 +1,163 @@
+"""
+Despachante de notificações do Gateway
+Executa as etapas não críticas (email e evento de calendário) fora do caminho
+da requisição, usando uma fila limitada e workers assíncronos.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Modos de execução das notificações
+MODO_SEQUENCIAL = "sequencial"
+MODO_CONCORRENTE = "concorrente"
+MODO_BACKGROUND = "background"
+MODOS_NOTIFICACAO = (MODO_SEQUENCIAL, MODO_CONCORRENTE, MODO_BACKGROUND)
+
+TarefaNotificacao = Callable[[], Awaitable[dict]]
+
+
+async def executar_concorrente(tarefas: Dict[str, TarefaNotificacao], limite: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Dispara as notificações ao mesmo tempo e aguarda os resultados
+
+    Com `limite`, no máximo essa quantidade fica em andamento de cada vez (um
+    lote grande não esgota o pool de conexões do gateway nem abre os disjuntores).
+    """
+    nomes = list(tarefas)
+    if limite is not None and len(nomes) > limite:
+        semaforo = asyncio.Semaphore(limite)
+
+        async def limitada(tarefa: TarefaNotificacao) -> dict:
+            async with semaforo:
+                return await tarefa()
+
+        chamadas = (limitada(tarefas[nome]) for nome in nomes)
+    else:
+        chamadas = (tarefas[nome]() for nome in nomes)
+    resultados = await asyncio.gather(*chamadas, return_exceptions=True)
+    saida = {}
+    for nome, resultado in zip(nomes, resultados):
+        if isinstance(resultado, BaseException):
+            saida[nome] = {"enviado": False, "erro": str(resultado)}
+        else:
+            saida[nome] = resultado
+    return saida
+
+
+class DespachanteNotificacoes:
+    """
+    Fila limitada de notificações processada por workers em background.
+
+    Cada lote enfileirado recebe um ID que pode ser consultado depois para
+    saber se o email e o evento foram entregues. O histórico de status é
+    limitado a `max_historico` entradas (as mais antigas são descartadas).
+    Cada worker executa no máximo `concorrencia` notificações de um lote ao
+    mesmo tempo (None = sem limite).
+    """
+
+    def __init__(self, tamanho_fila: int = 1000, workers: int = 4, max_historico: int = 10000,
+                 concorrencia: Optional[int] = None):
+        self.tamanho_fila = tamanho_fila
+        self.num_workers = workers
+        self.concorrencia = concorrencia
+        self.max_historico = max_historico
+        self._fila: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._status: "OrderedDict[str, dict]" = OrderedDict()
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self._workers)
+
+    async def iniciar(self) -> None:
+        """Cria a fila e inicia os workers"""
+        if self.ativo:
+            return
+        self._fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"notificacoes-{i}")
+            for i in range(self.num_workers)
+        ]
+
+    async def parar(self, prazo: float = 10.0) -> None:
+        """
+        Processa o que ainda está na fila (até `prazo` segundos) e encerra os
+        workers; os lotes que sobrarem na fila ficam com status "descartado".
+        """
+        if not self.ativo:
+            return
+        try:
+            await asyncio.wait_for(self._fila.join(), timeout=prazo)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠ Despachante encerrado com {self._fila.qsize()} lotes de notificações na fila")
+            while not self._fila.empty():
+                notificacao_id, _ = self._fila.get_nowait()
+                status = self._status.get(notificacao_id)
+                if status is not None:
+                    status["status"] = "descartado"
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._fila = None
+
+    def enfileirar(self, tarefas: Dict[str, TarefaNotificacao]) -> Optional[str]:
+        """
+        Enfileira um lote de notificações sem bloquear.
+
+        Retorna o ID do lote, ou None se o despachante não estiver ativo ou a
+        fila estiver cheia (cabe ao chamador decidir o que fazer nesse caso).
+        """
+        if not self.ativo:
+            return None
+        notificacao_id = uuid.uuid4().hex
+        try:
+            self._fila.put_nowait((notificacao_id, tarefas))
+        except asyncio.QueueFull:
+            logger.warning("⚠ Fila de notificações cheia")
+            return None
+
+        self._registrar(notificacao_id, {
+            "notificacao_id": notificacao_id,
+            "status": "pendente",
+            "enfileirado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "resultados": {nome: None for nome in tarefas}
+        })
+        return notificacao_id
+
+    def obter_status(self, notificacao_id: str) -> Optional[dict]:
+        return self._status.get(notificacao_id)
+
+    def estatisticas(self) -> dict:
+        return {
+            "ativo": self.ativo,
+            "workers": len(self._workers),
+            "fila": self._fila.qsize() if self._fila is not None else 0,
+            "capacidade_fila": self.tamanho_fila
+        }
+
+    def _registrar(self, notificacao_id: str, status: dict) -> None:
+        self._status[notificacao_id] = status
+        while len(self._status) > self.max_historico:
+            self._status.popitem(last=False)
+
+    async def _worker(self) -> None:
+        while True:
+            notificacao_id, tarefas = await self._fila.get()
+            try:
+                resultados = await executar_concorrente(tarefas, self.concorrencia)
+                status = self._status.get(notificacao_id)
+                if status is not None:
+                    status["resultados"] = resultados
+                    status["status"] = "concluido"
+                    status["concluido_em"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            except Exception as e:
+                logger.error(f"✗ Erro ao processar notificações {notificacao_id}: {str(e)}")
+            finally:
+                self._fila.task_done()
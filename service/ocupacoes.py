@@ -0,0 +1,15 @@
+"""
+Ocupações das salas que já existiam antes do sistema de reservas (aulas
+fixas, manutenção). Valem para a verificação de disponibilidade (8002) e
+para o serviço de reserva (8003), que as bloqueia na agenda ao registrar em
+modo atômico; fora daqui, só as reservas feitas pelo 8003 ocupam horários.
+
+Formato: [{"id_sala": ..., "reservas": [(inicio, fim), ...]}, ...], com
+horários "YYYY-MM-DD HH:MM" (IDs iguais ao serviço de consulta).
+"""
+
+OCUPACOES_INICIAIS = [
+    {"id_sala": "LAB-01", "reservas": [("2025-10-20 14:00", "2025-10-20 15:00")]},
+    {"id_sala": "LAB-02", "reservas": [("2025-10-20 09:00", "2025-10-20 11:00")]},
+    {"id_sala": "SALA-01", "reservas": []},
+]
@@ -0,0 +1,63 @@
+"""
+Paginação por cursor e exportação em NDJSON
+O cursor é opaco para o cliente (JSON em base64 url-safe) e guarda a chave
+do último item devolvido, de modo que a próxima página continua de onde a
+anterior parou sem OFFSET. O modo NDJSON envia uma linha JSON por registro,
+à medida que os registros são lidos.
+"""
+
+import base64
+import json
+from typing import Iterable, Iterator, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from service.respostas import serializar
+
+MEDIA_NDJSON = "application/x-ndjson"
+
+
+def codificar_cursor(*chave) -> str:
+    dados = json.dumps(chave, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(dados).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: Optional[str]) -> Optional[list]:
+    """Chave do cursor recebido (None se vazio); 400 se o cursor for inválido"""
+    if not cursor:
+        return None
+    try:
+        dados = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        chave = json.loads(dados)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    if not isinstance(chave, list):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    return chave
+
+
+def quer_ndjson(request: Request, formato: Optional[str]) -> bool:
+    """NDJSON se pedido por ?formato=ndjson ou pelo cabeçalho Accept"""
+    if formato is not None:
+        return formato == "ndjson"
+    return MEDIA_NDJSON in request.headers.get("accept", "")
+
+
+def _linhas(registros: Iterable[dict], tamanho_bloco: int) -> Iterator[bytes]:
+    bloco = []
+    tamanho = 0
+    for registro in registros:
+        linha = serializar(registro) + b"\n"
+        bloco.append(linha)
+        tamanho += len(linha)
+        if tamanho >= tamanho_bloco:
+            yield b"".join(bloco)
+            bloco, tamanho = [], 0
+    if bloco:
+        yield b"".join(bloco)
+
+
+def resposta_ndjson(registros: Iterable[dict], tamanho_bloco: int = 64 * 1024) -> StreamingResponse:
+    """Resposta em streaming com uma linha JSON por registro (em blocos de ~64 KB)"""
+    return StreamingResponse(_linhas(registros, tamanho_bloco), media_type=MEDIA_NDJSON)
@@ -0,0 +1,261 @@
+"""
+Rastreamento distribuído entre o gateway e os microsserviços
+O contexto do trace segue o formato W3C `traceparent` e é repassado em toda
+chamada do gateway a um serviço. Cada app registra um span por requisição e
+spans por etapa; a resposta traz o cabeçalho `Server-Timing` com as etapas.
+Os spans dos traces amostrados vão para um arquivo JSONL, escrito por uma
+thread em background, para análise offline (ex.: flame graph).
+
+Configuração:
+  RASTREAMENTO_ARQUIVO     arquivo JSONL de spans (sem ele nada é gravado)
+  RASTREAMENTO_AMOSTRAGEM  fração dos traces iniciados aqui que são gravados (padrão 0.1)
+"""
+
+import atexit
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+
+from service.metricas import mapa_rotas
+from service.respostas import serializar
+
+AMOSTRAGEM = float(os.getenv("RASTREAMENTO_AMOSTRAGEM", "0.1"))
+
+
+class Span:
+    """Trecho de um trace; `tempos` (só na raiz) acumula as entradas do Server-Timing"""
+
+    __slots__ = ("nome", "servico", "trace_id", "span_id", "pai_id", "amostrado",
+                 "inicio", "_t0", "duracao", "atributos", "tempos", "raiz")
+
+    def __init__(self, nome: str, servico: str, trace_id: str, pai_id: Optional[str],
+                 amostrado: bool, raiz: Optional["Span"] = None):
+        self.nome = nome
+        self.servico = servico
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.pai_id = pai_id
+        self.amostrado = amostrado
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self.duracao = 0.0
+        self.atributos: Dict[str, object] = {}
+        self.tempos: List[Tuple[str, float]] = []
+        self.raiz = raiz or self
+
+    def filho(self, nome: str) -> "Span":
+        return Span(nome, self.servico, self.trace_id, self.span_id, self.amostrado, self.raiz)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.amostrado else '00'}"
+
+    def encerrar(self) -> None:
+        self.duracao = time.perf_counter() - self._t0
+        if self.amostrado and coletor.ativo:
+            coletor.registrar({
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "pai_id": self.pai_id,
+                "servico": self.servico,
+                "nome": self.nome,
+                "inicio": round(self.inicio, 6),
+                "duracao_ms": round(self.duracao * 1000, 3),
+                "atributos": self.atributos,
+            })
+
+
+_span_atual: ContextVar[Optional[Span]] = ContextVar("span_atual", default=None)
+
+
+def span_atual() -> Optional[Span]:
+    return _span_atual.get()
+
+
+def ler_traceparent(valor: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, span_id do pai, amostrado) de um cabeçalho traceparent; None se inválido"""
+    if not valor:
+        return None
+    partes = valor.strip().split("-")
+    if len(partes) != 4 or len(partes[1]) != 32 or len(partes[2]) != 16:
+        return None
+    try:
+        amostrado = int(partes[3], 16) & 1 == 1
+        int(partes[1], 16), int(partes[2], 16)
+    except ValueError:
+        return None
+    if partes[1] == "0" * 32 or partes[2] == "0" * 16:
+        return None
+    return partes[1], partes[2], amostrado
+
+
+class _Etapa:
+    """Context manager de um span filho do span atual (no-op fora de uma requisição)"""
+
+    __slots__ = ("nome", "server_timing", "span", "_token")
+
+    def __init__(self, nome: str, server_timing: bool):
+        self.nome = nome
+        self.server_timing = server_timing
+        self.span: Optional[Span] = None
+
+    def __enter__(self) -> Optional[Span]:
+        pai = _span_atual.get()
+        if pai is not None:
+            self.span = pai.filho(self.nome)
+            self._token = _span_atual.set(self.span)
+        return self.span
+
+    def __exit__(self, tipo, excecao, traceback):
+        span = self.span
+        if span is None:
+            return False
+        _span_atual.reset(self._token)
+        if excecao is not None:
+            span.atributos["erro"] = type(excecao).__name__
+        span.encerrar()
+        if self.server_timing:
+            span.raiz.tempos.append((self.nome, span.duracao))
+        return False
+
+
+def etapa(nome: str, server_timing: bool = True) -> _Etapa:
+    """
+    Span de uma etapa da requisição atual; com `server_timing` a duração
+    também entra no cabeçalho Server-Timing da resposta.
+    """
+    return _Etapa(nome, server_timing)
+
+
+class ColetorJSONL:
+    """
+    Grava spans em JSONL sem bloquear as requisições: `registrar` só põe o
+    span numa fila limitada (descartando se ela estiver cheia) e uma thread
+    em background escreve em lotes.
+    """
+
+    def __init__(self, caminho: Optional[str], max_fila: int = 10000, tamanho_lote: int = 512):
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.descartados = 0
+        self.gravados = 0
+        self._fila: "queue.Queue" = queue.Queue(maxsize=max_fila)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self.caminho)
+
+    def registrar(self, registro: dict) -> None:
+        if self._thread is None:
+            self._iniciar()
+        try:
+            self._fila.put_nowait(registro)
+        except queue.Full:
+            self.descartados += 1
+
+    def _iniciar(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._escrever, name="coletor-spans", daemon=True)
+                self._thread.start()
+                atexit.register(self.fechar)
+
+    def _escrever(self) -> None:
+        with open(self.caminho, "ab") as arquivo:
+            while True:
+                registro = self._fila.get()
+                lote = [registro]
+                while len(lote) < self.tamanho_lote:
+                    try:
+                        lote.append(self._fila.get_nowait())
+                    except queue.Empty:
+                        break
+                fim = None in lote
+                arquivo.write(b"".join(serializar(r) + b"\n" for r in lote if r is not None))
+                arquivo.flush()
+                self.gravados += len(lote) - (1 if fim else 0)
+                if fim:
+                    return
+
+    def fechar(self, prazo: float = 2.0) -> None:
+        """Grava o que ainda está na fila e encerra a thread"""
+        if self._thread is None:
+            return
+        self._fila.put(None)
+        self._thread.join(prazo)
+        self._thread = None
+
+
+coletor = ColetorJSONL(os.getenv("RASTREAMENTO_ARQUIVO") or None)
+
+
+def _server_timing(raiz: Span, total: float) -> bytes:
+    entradas = [f"{nome};dur={duracao * 1000:.2f}" for nome, duracao in raiz.tempos]
+    entradas.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entradas).encode("latin-1")
+
+
+class MiddlewareRastreamento:
+    """
+    Abre o span da requisição (continuando o trace do `traceparent` recebido,
+    ou começando um novo, amostrado com probabilidade AMOSTRAGEM) e devolve
+    `Server-Timing` e `X-Trace-Id` na resposta.
+    """
+
+    def __init__(self, app, servico: str, rotas: Callable[[], Dict[Callable, str]]):
+        self.app = app
+        self.servico = servico
+        self._rotas = rotas
+        self._por_endpoint: Optional[Dict[Callable, str]] = None
+
+    def _nome(self, scope) -> str:
+        if self._por_endpoint is None:
+            self._por_endpoint = self._rotas()
+        return f"{scope['method']} {self._por_endpoint.get(scope.get('endpoint'), 'desconhecida')}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        contexto = None
+        for nome, valor in scope["headers"]:
+            if nome == b"traceparent":
+                contexto = ler_traceparent(valor.decode("latin-1"))
+                break
+        if contexto is not None:
+            trace_id, pai_id, amostrado = contexto
+        else:
+            trace_id, pai_id = f"{random.getrandbits(128):032x}", None
+            amostrado = coletor.ativo and random.random() < AMOSTRAGEM
+
+        raiz = Span(scope["method"], self.servico, trace_id, pai_id, amostrado)
+        token = _span_atual.set(raiz)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                raiz.atributos["codigo"] = mensagem["status"]
+                cabecalhos = list(mensagem.get("headers", []))
+                cabecalhos.append((b"server-timing", _server_timing(raiz, time.perf_counter() - raiz._t0)))
+                cabecalhos.append((b"x-trace-id", trace_id.encode("ascii")))
+                mensagem = {**mensagem, "headers": cabecalhos}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _span_atual.reset(token)
+            raiz.nome = self._nome(scope)
+            raiz.encerrar()
+
+
+def rastrear(app: FastAPI, servico: str) -> None:
+    """Adiciona o middleware de rastreamento ao app"""
+    app.add_middleware(MiddlewareRastreamento, servico=servico, rotas=mapa_rotas(app))
@@ -1,19 +1,220 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
-from datetime import datetime
-from typing import List
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from contextlib import ExitStack, asynccontextmanager
+from datetime import date, datetime
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Literal, Optional, Tuple
+import itertools
+import logging
+import threading
+import uuid
 import uvicorn
 
-print("⭐ MICROSSERVIÇO DE RESERVA DE SALA")
-print("=" * 60)
+from service.agenda import AgendaSala, ConflitoHorario, para_minutos
+from service.armazenamento import ArmazenamentoMemoria, ErroArmazenamento, criar_armazenamento
+from service.condicional import gerar_etag, nao_modificado
+from service.feed import CANCELADA, CRIADA, LogAlteracoes
+from service.ics import gerar_calendario_incremental
+from service.logs import configurar_logs, registrar_logs
+from service.metricas import instrumentar
+from service.ocupacoes import OCUPACOES_INICIAIS
+from service.paginacao import codificar_cursor, decodificar_cursor, quer_ndjson, resposta_ndjson
+from service.rastreamento import etapa, rastrear
+from service.respostas import CorpoEstatico, RespostaJSON, resposta_confiavel
+
+logger = logging.getLogger(__name__)
+
+# ================== BANCO SIMULADO ==================
+confirmacoes_db = []
+reservas_por_id: Dict[int, dict] = {}
+
+# Índice (sala_id, data) -> intervalos ordenados, para checar sobreposição
+# em O(log n) sem varrer confirmacoes_db
+indice_reservas: Dict[Tuple[str, str], AgendaSala] = {}
+
+# Um lock por sala: a checagem de conflito + inserção é atômica por sala
+# (handlers rodam em threadpool), sem serializar reservas de salas diferentes
+_locks_salas: Dict[str, threading.Lock] = {}
+_lock_reservas = threading.Lock()
+_proximo_id = itertools.count(1)
+
+# Índices das listagens (qualquer status): reserva_ids em ordem crescente,
+# para paginação por cursor sem varrer confirmacoes_db
+ids_reservas: List[int] = []
+ids_por_sala: Dict[str, List[int]] = {}
+ids_por_usuario: Dict[str, List[int]] = {}
+_lock_listagens = threading.Lock()
+
+# Índices dos feeds de calendário (apenas reservas confirmadas)
+datas_por_sala: Dict[str, List[str]] = {}                 # datas com agenda, ordenadas
+confirmadas_por_sala: Dict[str, Dict[str, dict]] = {}     # sala -> inicio -> registro
+# email -> (inicio, reserva_id, registro) em ordem de início; tem lock próprio
+# porque as reservas de um usuário ficam em salas (e locks) diferentes
+agenda_por_usuario: Dict[str, List[Tuple[str, int, dict]]] = {}
+_lock_usuarios = threading.Lock()
+
+# Versões para ETag/cache dos feeds. Vêm de um contador global (valores
+# únicos), então mesmo escritas concorrentes em salas diferentes nunca
+# deixam um usuário com uma versão já vista para outro conteúdo
+_versoes_salas: Dict[str, int] = {}
+_versoes_usuarios: Dict[str, int] = {}
+_contador_versoes = itertools.count(1)
+_instancia = uuid.uuid4().hex[:8]
+
+# Ocupações pré-existentes já estão nas agendas (ver bloquear_ocupacoes)
+_ocupacoes_bloqueadas = False
+
+
+def _lock_sala(sala_id: str) -> threading.Lock:
+    lock = _locks_salas.get(sala_id)
+    if lock is None:
+        with _lock_reservas:
+            lock = _locks_salas.setdefault(sala_id, threading.Lock())
+    return lock
+
+# ================== ARMAZENAMENTO ==================
+# Memória (padrão) ou SQLite, conforme a variável de ambiente RESERVAS_DB.
+# Criado (e fechado) no lifespan; até lá, só memória
+armazenamento = ArmazenamentoMemoria()
+
+# Log append-only de reservas criadas/canceladas, consumido pela disponibilidade
+# (com SQLite, a época e o histórico vêm do arquivo em carregar_reservas)
+log_alteracoes = LogAlteracoes(armazenamento.epoca())
+
+
+def _agenda(sala_id: str, data: str) -> AgendaSala:
+    """Agenda do bucket (sala_id, data), criada sob demanda"""
+    agenda = indice_reservas.get((sala_id, data))
+    if agenda is None:
+        agenda = indice_reservas[(sala_id, data)] = AgendaSala()
+        insort(datas_por_sala.setdefault(sala_id, []), data)
+    return agenda
+
+
+def _listar(registro: dict) -> None:
+    """Inclui a reserva nos índices das listagens"""
+    reserva_id = registro["reserva_id"]
+    with _lock_listagens:
+        insort(ids_reservas, reserva_id)
+        insort(ids_por_sala.setdefault(registro["sala_id"], []), reserva_id)
+        insort(ids_por_usuario.setdefault(registro["usuario_email"], []), reserva_id)
+
+
+def _deslistar(registro: dict) -> None:
+    """Remove a reserva dos índices das listagens (desfazer gravação que falhou)"""
+    reserva_id = registro["reserva_id"]
+    with _lock_listagens:
+        for ids in (ids_reservas, ids_por_sala.get(registro["sala_id"], []),
+                    ids_por_usuario.get(registro["usuario_email"], [])):
+            pos = bisect_left(ids, reserva_id)
+            if pos < len(ids) and ids[pos] == reserva_id:
+                del ids[pos]
+
+
+def _indexar(registro: dict) -> None:
+    """Inclui a reserva confirmada nos índices dos feeds (sob o lock da sala)"""
+    sala_id, email = registro["sala_id"], registro["usuario_email"]
+    confirmadas_por_sala.setdefault(sala_id, {})[registro["inicio"]] = registro
+    with _lock_usuarios:
+        insort(agenda_por_usuario.setdefault(email, []), (registro["inicio"], registro["reserva_id"], registro))
+    _versoes_salas[sala_id] = next(_contador_versoes)
+    _versoes_usuarios[email] = next(_contador_versoes)
+
+
+def _desindexar(registro: dict) -> None:
+    """Remove a reserva dos índices dos feeds (sob o lock da sala)"""
+    sala_id, email = registro["sala_id"], registro["usuario_email"]
+    confirmadas_por_sala.get(sala_id, {}).pop(registro["inicio"], None)
+    with _lock_usuarios:
+        agenda = agenda_por_usuario.get(email, [])
+        pos = bisect_left(agenda, (registro["inicio"], registro["reserva_id"]))
+        if pos < len(agenda) and agenda[pos][1] == registro["reserva_id"]:
+            del agenda[pos]
+    _versoes_salas[sala_id] = next(_contador_versoes)
+    _versoes_usuarios[email] = next(_contador_versoes)
+
+
+def bloquear_ocupacoes() -> None:
+    """
+    Põe na agenda as ocupações pré-existentes das salas, as mesmas que o 8002
+    conhece: sem elas, a reserva atômica (que dispensa o /verificar) aceitaria
+    horários que a verificação dá como ocupados. Só bloqueiam o horário; não
+    aparecem nas listagens nem nos feeds de calendário.
+    """
+    global _ocupacoes_bloqueadas
+    if _ocupacoes_bloqueadas:
+        return
+    _ocupacoes_bloqueadas = True
+    for registro in OCUPACOES_INICIAIS:
+        sala_id = registro["id_sala"]
+        for inicio, fim in registro["reservas"]:
+            with _lock_sala(sala_id):
+                try:
+                    _agenda(sala_id, inicio[:10]).inserir(para_minutos(inicio), para_minutos(fim), (inicio, fim))
+                except ConflitoHorario as e:
+                    logger.warning(f"⚠ Ocupação {sala_id} {inicio}-{fim} conflita com a reserva {e.inicio}-{e.fim}")
+
+
+def carregar_reservas() -> None:
+    """Aquece confirmacoes_db e o índice com o que está no armazenamento"""
+    global _proximo_id, _ocupacoes_bloqueadas
+    if not armazenamento.persistente:
+        bloquear_ocupacoes()
+        return
+    with _lock_reservas:
+        confirmacoes_db.clear()
+        reservas_por_id.clear()
+        indice_reservas.clear()
+        _ocupacoes_bloqueadas = False
+        ids_reservas.clear()
+        ids_por_sala.clear()
+        ids_por_usuario.clear()
+        datas_por_sala.clear()
+        confirmadas_por_sala.clear()
+        agenda_por_usuario.clear()
+        ultimo_id = 0
+        for registro in armazenamento.carregar():
+            confirmacoes_db.append(registro)
+            reservas_por_id[registro["reserva_id"]] = registro
+            _listar(registro)
+            if registro["status"] == "CONFIRMADA":
+                inicio, fim = registro["inicio"], registro["fim"]
+                _agenda(registro["sala_id"], inicio[:10]).inserir(
+                    para_minutos(inicio), para_minutos(fim), (inicio, fim)
+                )
+                _indexar(registro)
+            ultimo_id = max(ultimo_id, registro["reserva_id"])
+        _proximo_id = itertools.count(ultimo_id + 1)
+        log_alteracoes.restaurar(armazenamento.carregar_alteracoes(), armazenamento.epoca())
+    bloquear_ocupacoes()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global armazenamento
+    armazenamento = criar_armazenamento()
+    carregar_reservas()
+    logger.info("⭐ Microsserviço de reserva de sala iniciado")
+    yield
+    armazenamento.fechar()
+
 
 app = FastAPI(
     title="Serviço de Reserva de Sala",
     description="Microserviço responsável por registrar reservas e confirmar status.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RespostaJSON
 )
 
+metricas = instrumentar(app)
+registrar_logs(app, "reservar_sala")
+rastrear(app, "reservar_sala")
+
 # ================== CONFIGURAÇÃO CORS ==================
 app.add_middleware(
     CORSMiddleware,
@@ -23,9 +224,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ================== BANCO SIMULADO ==================
-confirmacoes_db = []
-
 # ================== MODELO QUE BATE COM O GATEWAY ==================
 class ReservaEntrada(BaseModel):
     sala_id: str
@@ -35,38 +233,125 @@ class ReservaEntrada(BaseModel):
     usuario_nome: str
     usuario_email: EmailStr
 
+class LoteReservas(BaseModel):
+    reservas: List[ReservaEntrada] = Field(..., min_length=1, max_length=10000)
+    modo: Literal["melhor_esforco", "tudo_ou_nada"] = "melhor_esforco"
+
 # Modelo de retorno opcional para listar
 class StatusConfirmacao(BaseModel):
     reserva_id: int
-    sala_id: int
+    sala_id: str
     inicio: str
     fim: str
     status: str
     confirmado_em: str
     usuario_email: str
 
+class PaginaConfirmacoes(BaseModel):
+    itens: List[StatusConfirmacao]
+    proximo_cursor: Optional[str] = None
+
 # ================== LISTAR RESERVAS ==================
-@app.get("/confirmacoes", response_model=List[StatusConfirmacao])
-def listar_confirmacoes():
-    return confirmacoes_db
+def _iterar_confirmacoes(
+    apos: int,
+    sala_id: Optional[str],
+    usuario_email: Optional[str],
+    status: Optional[str],
+    de: str,
+    ate: str,
+    janela: int = 1000
+) -> Iterator[dict]:
+    """
+    Reservas em ordem de reserva_id, depois de `apos`. Usa o índice mais
+    seletivo (sala ou usuário) e lê os ids em janelas curtas sob o lock.
+    """
+    if sala_id is not None:
+        ids = ids_por_sala.get(sala_id, [])
+    elif usuario_email is not None:
+        ids = ids_por_usuario.get(usuario_email, [])
+    else:
+        ids = ids_reservas
 
-# ================== NOVA ROTA /reservar ==================
-@app.post("/reservar")
-def registrar_reserva(reserva: ReservaEntrada):
+    while True:
+        with _lock_listagens:
+            pos = bisect_right(ids, apos)
+            lote = ids[pos:pos + janela]
+        for reserva_id in lote:
+            registro = reservas_por_id.get(reserva_id)
+            if registro is None:
+                continue
+            if sala_id is not None and registro["sala_id"] != sala_id:
+                continue
+            if usuario_email is not None and registro["usuario_email"] != usuario_email:
+                continue
+            if status is not None and registro["status"] != status:
+                continue
+            if not de <= registro["inicio"][:10] <= ate:
+                continue
+            yield registro
+        if len(lote) < janela:
+            return
+        apos = lote[-1]
+
+
+@app.get("/confirmacoes", response_model=PaginaConfirmacoes)
+def listar_confirmacoes(
+    request: Request,
+    sala_id: Optional[str] = Query(None, description="Filtra pela sala"),
+    usuario_email: Optional[str] = Query(None, description="Filtra pelo email do usuário"),
+    status: Optional[Literal["CONFIRMADA", "CANCELADA"]] = Query(None),
+    de: Optional[str] = Query(None, description="Início a partir desta data (YYYY-MM-DD)"),
+    ate: Optional[str] = Query(None, description="Início até esta data, inclusive (YYYY-MM-DD)"),
+    cursor: Optional[str] = Query(None, description="`proximo_cursor` da página anterior"),
+    limite: Optional[int] = Query(None, ge=1, description="Itens por página (JSON: padrão 100, máx. 1000)"),
+    formato: Optional[Literal["json", "ndjson"]] = Query(None, description="ndjson: uma reserva por linha, em streaming")
+):
+    """
+    Lista as reservas em ordem de reserva_id, com filtros.
+
+    Em JSON a resposta é paginada por cursor (`proximo_cursor`); em NDJSON
+    (?formato=ndjson ou Accept: application/x-ndjson) todas as reservas que
+    passam nos filtros são enviadas à medida que são lidas.
+    """
+    inicio, fim = _periodo(de, ate)
+    chave = decodificar_cursor(cursor)
+    try:
+        apos = int(chave[0]) if chave else 0
+    except (IndexError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+    registros = _iterar_confirmacoes(apos, sala_id, usuario_email, status, inicio, fim)
+
+    if quer_ndjson(request, formato):
+        return resposta_ndjson(islice(registros, limite) if limite else registros)
+
+    limite = limite or 100
+    if limite > 1000:
+        raise HTTPException(status_code=400, detail="Em JSON, o limite máximo é 1000; use formato=ndjson para exportar.")
+    itens = list(islice(registros, limite + 1))
+    proximo = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        proximo = codificar_cursor(itens[-1]["reserva_id"])
+    return resposta_confiavel({"itens": itens, "proximo_cursor": proximo})
+
+def _interpretar_horario(reserva: ReservaEntrada) -> Tuple[str, str, int, int]:
+    """Monta inicio/fim e converte para minutos; ValueError se inválido"""
     inicio = f"{reserva.data} {reserva.hora_inicio}"
     fim = f"{reserva.data} {reserva.hora_fim}"
+    try:
+        minuto_inicio = para_minutos(inicio)
+        minuto_fim = para_minutos(fim)
+    except ValueError:
+        raise ValueError("Formato inválido. Use data 'YYYY-MM-DD' e horas 'HH:MM'.")
+    if minuto_inicio >= minuto_fim:
+        raise ValueError("A hora inicial deve ser anterior à final.")
+    return inicio, fim, minuto_inicio, minuto_fim
 
-    # 1. Verificar duplicação
-    for r in confirmacoes_db:
-        if r["sala_id"] == reserva.sala_id and r["inicio"] == inicio:
-            raise HTTPException(
-                status_code=409,
-                detail=f"Sala '{reserva.sala_id}' em '{inicio}' já reservada."
-            )
 
-    # 2. Registrar reserva
-    novo = {
-        "reserva_id": len(confirmacoes_db) + 1,
+def _novo_registro(reserva: ReservaEntrada, inicio: str, fim: str) -> dict:
+    return {
+        "reserva_id": next(_proximo_id),
         "sala_id": reserva.sala_id,
         "inicio": inicio,
         "fim": fim,
@@ -75,18 +360,357 @@ def registrar_reserva(reserva: ReservaEntrada):
         "usuario_email": reserva.usuario_email
     }
 
-    confirmacoes_db.append(novo)
+# ================== NOVA ROTA /reservar ==================
+@app.post("/reservar")
+def registrar_reserva(reserva: ReservaEntrada):
+    """
+    Reserva a sala se o horário estiver livre (operação atômica).
 
-    return {
+    A checagem de sobreposição e o registro acontecem sob o lock da sala,
+    então entre várias requisições simultâneas para o mesmo horário
+    exatamente uma é registrada e as demais recebem 409.
+    """
+    try:
+        inicio, fim, minuto_inicio, minuto_fim = _interpretar_horario(reserva)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with etapa("agenda"), _lock_sala(reserva.sala_id):
+        # 1. Verificar sobreposição com reservas da mesma sala e data
+        agenda = _agenda(reserva.sala_id, reserva.data)
+        try:
+            agenda.inserir(minuto_inicio, minuto_fim, (inicio, fim))
+        except ConflitoHorario as e:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Sala '{reserva.sala_id}' já reservada entre '{e.inicio}' e '{e.fim}'."
+            )
+
+        # 2. Registrar reserva
+        novo = _novo_registro(reserva, inicio, fim)
+
+        confirmacoes_db.append(novo)
+        reservas_por_id[novo["reserva_id"]] = novo
+        _listar(novo)
+        _indexar(novo)
+        evento = log_alteracoes.novo_evento(CRIADA, novo)
+
+    # 3. Persistir reserva + evento (commit em grupo; fora do lock para juntar
+    #    escritas concorrentes) e só então publicar o evento no feed
+    try:
+        with etapa("persistencia"):
+            armazenamento.salvar(novo, evento)
+    except ErroArmazenamento as e:
+        with _lock_sala(reserva.sala_id):
+            agenda.remover(minuto_inicio, minuto_fim)
+            confirmacoes_db.remove(novo)
+            reservas_por_id.pop(novo["reserva_id"], None)
+            _deslistar(novo)
+            _desindexar(novo)
+        log_alteracoes.abandonar(evento)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Falha ao gravar a reserva: {str(e)}"
+        )
+    log_alteracoes.publicar(evento)
+
+    return resposta_confiavel({
         "mensagem": "Reserva registrada com sucesso!",
+        "reserva_id": novo["reserva_id"],
         "detalhes": {"reserva_id": novo["reserva_id"], **novo}
+    })
+
+# ================== RESERVA EM LOTE ==================
+@app.post("/reservar/lote")
+def registrar_reservas_lote(lote: LoteReservas):
+    """
+    Reserva vários horários de uma vez, com uma única gravação.
+
+    Os locks de todas as salas envolvidas são obtidos (em ordem, para não
+    haver deadlock) e cada item é checado contra as reservas existentes e
+    contra os itens anteriores do próprio lote. Em `tudo_ou_nada`, qualquer
+    item inválido ou em conflito desfaz o lote inteiro (409); em
+    `melhor_esforco`, só os itens livres são registrados.
+    """
+    resultados = [None] * len(lote.reservas)
+    horarios = {}
+    for i, reserva in enumerate(lote.reservas):
+        try:
+            horarios[i] = _interpretar_horario(reserva)
+        except ValueError as e:
+            resultados[i] = {"indice": i, "status": "invalida", "codigo": 400, "detalhe": str(e)}
+
+    inseridos = []   # (indice, agenda, minuto_inicio, minuto_fim)
+    novos, eventos = [], []
+
+    with ExitStack() as locks:
+        for sala_id in sorted({r.sala_id for r in lote.reservas}):
+            locks.enter_context(_lock_sala(sala_id))
+
+        # 1. Checar e ocupar os horários (dentro do lote também)
+        for i, (inicio, fim, minuto_inicio, minuto_fim) in horarios.items():
+            reserva = lote.reservas[i]
+            agenda = _agenda(reserva.sala_id, reserva.data)
+            try:
+                agenda.inserir(minuto_inicio, minuto_fim, (inicio, fim))
+                inseridos.append((i, agenda, minuto_inicio, minuto_fim))
+            except ConflitoHorario as e:
+                resultados[i] = {
+                    "indice": i,
+                    "status": "conflito",
+                    "codigo": 409,
+                    "detalhe": f"Sala '{reserva.sala_id}' já reservada entre '{e.inicio}' e '{e.fim}'."
+                }
+
+        if lote.modo == "tudo_ou_nada" and len(inseridos) < len(lote.reservas):
+            for _, agenda, minuto_inicio, minuto_fim in inseridos:
+                agenda.remover(minuto_inicio, minuto_fim)
+            for i, _, _, _ in inseridos:
+                resultados[i] = {"indice": i, "status": "nao_processada", "codigo": 409,
+                                 "detalhe": "Lote cancelado: há itens inválidos ou em conflito."}
+            raise HTTPException(status_code=409, detail={"mensagem": "Nenhuma reserva registrada.", "resultados": resultados})
+
+        # 2. Registrar
+        for i, _, _, _ in inseridos:
+            inicio, fim = horarios[i][:2]
+            novo = _novo_registro(lote.reservas[i], inicio, fim)
+            novos.append(novo)
+            eventos.append(log_alteracoes.novo_evento(CRIADA, novo))
+            resultados[i] = {"indice": i, "status": "registrada", "reserva_id": novo["reserva_id"]}
+        confirmacoes_db.extend(novos)
+        for novo in novos:
+            reservas_por_id[novo["reserva_id"]] = novo
+            _listar(novo)
+            _indexar(novo)
+
+    # 3. Persistir tudo em uma única gravação
+    try:
+        armazenamento.salvar_lote(novos, eventos)
+    except ErroArmazenamento as e:
+        with ExitStack() as locks:
+            for sala_id in sorted({novo["sala_id"] for novo in novos}):
+                locks.enter_context(_lock_sala(sala_id))
+            for _, agenda, minuto_inicio, minuto_fim in inseridos:
+                agenda.remover(minuto_inicio, minuto_fim)
+            for novo in novos:
+                confirmacoes_db.remove(novo)
+                reservas_por_id.pop(novo["reserva_id"], None)
+                _deslistar(novo)
+                _desindexar(novo)
+        for evento in eventos:
+            log_alteracoes.abandonar(evento)
+        raise HTTPException(status_code=503, detail=f"Falha ao gravar as reservas: {str(e)}")
+    for evento in eventos:
+        log_alteracoes.publicar(evento)
+
+    return resposta_confiavel({
+        "mensagem": f"{len(novos)} de {len(lote.reservas)} reservas registradas.",
+        "registradas": len(novos),
+        "rejeitadas": len(lote.reservas) - len(novos),
+        "resultados": resultados,
+        "detalhes": novos
+    })
+
+# ================== CANCELAMENTO ==================
+@app.post("/reservas/{reserva_id}/cancelar")
+def cancelar_reserva(reserva_id: int):
+    registro = reservas_por_id.get(reserva_id)
+    if registro is None:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada.")
+
+    with _lock_sala(registro["sala_id"]):
+        if registro["status"] != "CONFIRMADA":
+            raise HTTPException(status_code=409, detail=f"Reserva já está {registro['status']}.")
+
+        inicio, fim = registro["inicio"], registro["fim"]
+        _agenda(registro["sala_id"], inicio[:10]).remover(para_minutos(inicio), para_minutos(fim))
+        registro["status"] = "CANCELADA"
+        _desindexar(registro)
+        evento = log_alteracoes.novo_evento(CANCELADA, registro)
+
+    try:
+        armazenamento.atualizar_status(reserva_id, "CANCELADA", evento)
+    except ErroArmazenamento as e:
+        with _lock_sala(registro["sala_id"]):
+            registro["status"] = "CONFIRMADA"
+            _agenda(registro["sala_id"], inicio[:10]).inserir(
+                para_minutos(inicio), para_minutos(fim), (inicio, fim)
+            )
+            _indexar(registro)
+        log_alteracoes.abandonar(evento)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Falha ao gravar o cancelamento: {str(e)}"
+        )
+    log_alteracoes.publicar(evento)
+
+    return {"mensagem": "Reserva cancelada.", "detalhes": registro}
+
+# ================== FEED DE ALTERAÇÕES ==================
+@app.get("/alteracoes")
+async def listar_alteracoes(
+    desde: int = Query(0, ge=0, description="Último seq já aplicado pelo consumidor"),
+    limite: int = Query(1000, ge=1, le=10000),
+    espera: float = Query(0.0, ge=0.0, le=30.0, description="Long-poll: segundos aguardando novos eventos")
+):
+    """
+    Eventos de reserva (criada/cancelada) com seq > desde, em ordem. O
+    long-poll espera no event loop, sem prender uma thread do threadpool.
+    """
+    return resposta_confiavel(await log_alteracoes.ler_com_espera(desde, limite, espera))
+
+# ================== FEEDS DE CALENDÁRIO (.ics) ==================
+# Feeds já gerados (até _MAX_BYTES_FEED), válidos enquanto a versão não mudar
+_feeds_prontos: "OrderedDict[tuple, Tuple[int, bytes]]" = OrderedDict()
+_lock_feeds = threading.Lock()
+_MAX_FEEDS = 256
+_MAX_BYTES_FEED = 1024 * 1024
+_BLOCO_EVENTOS = 256
+
+
+def _periodo(de: Optional[str], ate: Optional[str]) -> Tuple[str, str]:
+    """Valida o intervalo de datas (YYYY-MM-DD, inclusivo); sem limite se vazio"""
+    try:
+        for valor in (de, ate):
+            if valor is not None:
+                date.fromisoformat(valor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de data inválido. Use 'YYYY-MM-DD'.")
+    return de or "0000-00-00", ate or "9999-99-99"
+
+
+def _campos_evento(registro: dict) -> dict:
+    return {
+        "uid": f"reserva-{registro['reserva_id']}@reserva-salas",
+        "inicio": registro["inicio"],
+        "fim": registro["fim"],
+        "titulo": f"Reserva de Sala - {registro['sala_id']}",
+        "descricao": f"Reservado por {registro['usuario_email']}",
+        "local": registro["sala_id"]
     }
 
+
+def _eventos_sala(sala_id: str, de: str, ate: str) -> Iterator[dict]:
+    """Reservas da sala no período, em ordem, lidas um dia por vez sob o lock da sala"""
+    with _lock_sala(sala_id):
+        datas = datas_por_sala.get(sala_id, [])
+        datas = datas[bisect_left(datas, de):bisect_right(datas, ate)]
+    for data in datas:
+        with _lock_sala(sala_id):
+            por_inicio = confirmadas_por_sala.get(sala_id, {})
+            agenda = indice_reservas.get((sala_id, data))
+            registros = [por_inicio.get(inicio) for inicio, _ in agenda.rotulos] if agenda else []
+        for registro in registros:
+            if registro is not None:
+                yield _campos_evento(registro)
+
+
+def _eventos_usuario(email: str, de: str, ate: str) -> Iterator[dict]:
+    """Reservas confirmadas do usuário no período, em ordem, lidas em blocos sob o lock"""
+    # Chaves de busca: (de,) fica antes de qualquer início nessa data e
+    # (ate + "~",) depois de qualquer início em `ate`
+    desde, limite = (de,), (ate + "~",)
+    while True:
+        with _lock_usuarios:
+            agenda = agenda_por_usuario.get(email, [])
+            pos = bisect_left(agenda, desde)
+            fim = min(bisect_left(agenda, limite, pos), pos + _BLOCO_EVENTOS)
+            bloco = agenda[pos:fim]
+        if not bloco:
+            return
+        for _, _, registro in bloco:
+            yield _campos_evento(registro)
+        inicio, reserva_id, _ = bloco[-1]
+        desde = (inicio, reserva_id + 1)
+
+
+def _feed_calendario(
+    request: Request,
+    chave: tuple,
+    versao: Callable[[], int],
+    eventos: Callable[[], Iterator[dict]]
+) -> Response:
+    """
+    Responde o feed .ics com ETag: 304 se o cliente já tem a versão atual,
+    o corpo em cache se ele já foi gerado nesta versão, ou então gera e
+    envia em blocos (guardando o resultado se for pequeno o bastante).
+    """
+    versao_atual = versao()
+    etag = gerar_etag("cal", _instancia, versao_atual, *chave)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if nao_modificado(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    with _lock_feeds:
+        pronto = _feeds_prontos.get(chave)
+        if pronto is not None and pronto[0] == versao_atual:
+            _feeds_prontos.move_to_end(chave)
+            return Response(content=pronto[1], media_type="text/calendar", headers=headers)
+
+    def gerar():
+        blocos, tamanho, guardar = [], 0, True
+        for bloco in gerar_calendario_incremental(eventos()):
+            if guardar:
+                tamanho += len(bloco)
+                if tamanho <= _MAX_BYTES_FEED:
+                    blocos.append(bloco)
+                else:
+                    guardar = False
+                    blocos.clear()
+            yield bloco
+        # Só guarda se nada mudou durante a geração
+        if guardar and versao() == versao_atual:
+            with _lock_feeds:
+                _feeds_prontos[chave] = (versao_atual, b"".join(blocos))
+                _feeds_prontos.move_to_end(chave)
+                while len(_feeds_prontos) > _MAX_FEEDS:
+                    _feeds_prontos.popitem(last=False)
+
+    return StreamingResponse(gerar(), media_type="text/calendar", headers=headers)
+
+
+@app.get("/salas/{sala_id}/calendar.ics")
+def calendario_sala(
+    sala_id: str,
+    request: Request,
+    de: Optional[str] = Query(None, description="Data inicial (YYYY-MM-DD)"),
+    ate: Optional[str] = Query(None, description="Data final (YYYY-MM-DD)")
+):
+    """Feed iCalendar com as reservas confirmadas da sala no período"""
+    inicio, fim = _periodo(de, ate)
+    return _feed_calendario(
+        request,
+        ("sala", sala_id, inicio, fim),
+        lambda: _versoes_salas.get(sala_id, 0),
+        lambda: _eventos_sala(sala_id, inicio, fim)
+    )
+
+
+@app.get("/usuarios/{email}/calendar.ics")
+def calendario_usuario(
+    email: str,
+    request: Request,
+    de: Optional[str] = Query(None, description="Data inicial (YYYY-MM-DD)"),
+    ate: Optional[str] = Query(None, description="Data final (YYYY-MM-DD)")
+):
+    """Feed iCalendar com as reservas confirmadas do usuário no período"""
+    inicio, fim = _periodo(de, ate)
+    return _feed_calendario(
+        request,
+        ("usuario", email, inicio, fim),
+        lambda: _versoes_usuarios.get(email, 0),
+        lambda: _eventos_usuario(email, inicio, fim)
+    )
+
 # ================== HEALTH CHECK ==================
+_CORPO_HEALTH = CorpoEstatico({"status": "ok"})
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return _CORPO_HEALTH.resposta()
 
 # ================== EXECUÇÃO ==================
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8003, reload=False)
+    configurar_logs()
+    uvicorn.run(app, host="0.0.0.0", port=8003, reload=False, log_config=None, access_log=False)
@@ -0,0 +1,339 @@
+"""
+Camada de resiliência do Gateway
+Fica entre o gateway e cada microsserviço: disjuntor (circuit breaker) que
+recusa chamadas na hora enquanto o serviço está falhando, orçamento de
+retentativas para chamadas idempotentes (as retentativas nunca passam de uma
+fração do tráfego normal) e requisições em hedge para leituras, que disparam
+uma segunda tentativa quando a primeira demora demais e ficam com a que
+responder primeiro.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import httpx
+
+from service.clientes import PoolClientes
+from service.logs import request_id_atual
+from service.rastreamento import etapa
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+# Respostas que contam como falha do serviço e podem ser repetidas
+CODIGOS_RETENTAVEIS = (502, 503, 504)
+
+
+class CircuitoAberto(httpx.HTTPError):
+    """Chamada recusada sem ir à rede: o disjuntor do serviço está aberto"""
+
+
+@dataclass(frozen=True)
+class PoliticaResiliencia:
+    """Parâmetros de resiliência de um microsserviço"""
+    tentativas: int = 1
+    backoff: float = 0.05
+    hedge_apos: Optional[float] = None
+    janela: int = 20
+    minimo_chamadas: int = 5
+    limite_falhas: float = 0.5
+    tempo_aberto: float = 10.0
+    limite_lento: Optional[float] = None
+    proporcao_retentativas: float = 0.2
+    maximo_retentativas: float = 10.0
+
+
+class Disjuntor:
+    """
+    Disjuntor por taxa de falhas nas últimas `janela` chamadas.
+
+    Fechado: as chamadas passam e o resultado entra na janela; com pelo menos
+    `minimo_chamadas` na janela e taxa de falhas >= `limite_falhas`, abre.
+    Aberto: recusa tudo por `tempo_aberto` segundos. Meio aberto: deixa
+    passar uma única chamada de teste, que fecha (sucesso) ou reabre (falha).
+    Respostas 5xx, erros de rede e, se `limite_lento` for definido, chamadas
+    mais lentas que ele contam como falha.
+    """
+
+    def __init__(
+        self,
+        janela: int = 20,
+        minimo_chamadas: int = 5,
+        limite_falhas: float = 0.5,
+        tempo_aberto: float = 10.0,
+        limite_lento: Optional[float] = None,
+        relogio: Callable[[], float] = time.monotonic,
+    ):
+        self.minimo_chamadas = minimo_chamadas
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.limite_lento = limite_lento
+        self._relogio = relogio
+        self._resultados = deque(maxlen=janela)
+        self._aberto_em = 0.0
+        self._teste_em_andamento = False
+        self.estado = FECHADO
+        self.sucessos = 0
+        self.falhas = 0
+        self.lentas = 0
+        self.recusadas = 0
+        self.aberturas = 0
+
+    def permitir(self) -> bool:
+        """A chamada pode ir ao serviço? (conta como recusada se não puder)"""
+        if self.estado == ABERTO:
+            if self._relogio() - self._aberto_em < self.tempo_aberto:
+                self.recusadas += 1
+                return False
+            self.estado = MEIO_ABERTO
+            self._teste_em_andamento = False
+        if self.estado == MEIO_ABERTO:
+            if self._teste_em_andamento:
+                self.recusadas += 1
+                return False
+            self._teste_em_andamento = True
+        return True
+
+    def registrar(self, sucesso: bool, duracao: float) -> None:
+        if sucesso and self.limite_lento is not None and duracao > self.limite_lento:
+            sucesso = False
+            self.lentas += 1
+        if sucesso:
+            self.sucessos += 1
+        else:
+            self.falhas += 1
+
+        if self.estado == MEIO_ABERTO:
+            self._teste_em_andamento = False
+            if sucesso:
+                self.estado = FECHADO
+                self._resultados.clear()
+            else:
+                self._abrir()
+            return
+
+        self._resultados.append(sucesso)
+        if not sucesso and len(self._resultados) >= self.minimo_chamadas:
+            taxa = self._resultados.count(False) / len(self._resultados)
+            if taxa >= self.limite_falhas:
+                self._abrir()
+
+    def liberar(self) -> None:
+        """Chamada cancelada antes do resultado (ex.: perdeu o hedge): não conta"""
+        if self.estado == MEIO_ABERTO:
+            self._teste_em_andamento = False
+
+    def _abrir(self) -> None:
+        self.estado = ABERTO
+        self._aberto_em = self._relogio()
+        self._resultados.clear()
+        self.aberturas += 1
+
+    def estatisticas(self) -> dict:
+        janela = len(self._resultados)
+        return {
+            "estado": self.estado,
+            "taxa_falhas_janela": round(self._resultados.count(False) / janela, 3) if janela else 0.0,
+            "chamadas_janela": janela,
+            "sucessos": self.sucessos,
+            "falhas": self.falhas,
+            "lentas": self.lentas,
+            "recusadas": self.recusadas,
+            "aberturas": self.aberturas,
+        }
+
+
+class OrcamentoRetentativas:
+    """
+    Orçamento de retentativas: cada chamada original deposita `proporcao`
+    (até `maximo`) e cada retentativa ou hedge gasta 1. Com proporcao=0.2,
+    no regime permanente as retentativas ficam limitadas a 20% do tráfego,
+    o que impede que um serviço em apuros receba uma avalanche de repetições.
+    """
+
+    def __init__(self, proporcao: float = 0.2, maximo: float = 10.0):
+        self.proporcao = proporcao
+        self.maximo = maximo
+        self.saldo = maximo
+        self.concedidas = 0
+        self.negadas = 0
+
+    def depositar(self) -> None:
+        self.saldo = min(self.maximo, self.saldo + self.proporcao)
+
+    def sacar(self) -> bool:
+        if self.saldo >= 1.0:
+            self.saldo -= 1.0
+            self.concedidas += 1
+            return True
+        self.negadas += 1
+        return False
+
+    def estatisticas(self) -> dict:
+        return {
+            "saldo": round(self.saldo, 2),
+            "concedidas": self.concedidas,
+            "negadas": self.negadas,
+        }
+
+
+class ServicoResiliente:
+    """
+    Acesso a um microsserviço do pool de clientes passando pelo disjuntor,
+    pelo orçamento de retentativas e, em leituras, pelo hedge.
+
+    `requisitar` devolve a resposta httpx como o cliente devolveria (os
+    chamadores continuam tratando 404/409/raise_for_status); erros de rede e
+    o disjuntor aberto (CircuitoAberto) saem como httpx.HTTPError.
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        clientes: PoolClientes,
+        politica: PoliticaResiliencia = PoliticaResiliencia(),
+        observador: Optional[Callable[[str, str, float], None]] = None
+    ):
+        self.nome = nome
+        self.clientes = clientes
+        self.politica = politica
+        # observador(servico, resultado, duracao): resultado é o código HTTP ou "erro"
+        self.observador = observador
+        self.disjuntor = Disjuntor(
+            janela=politica.janela,
+            minimo_chamadas=politica.minimo_chamadas,
+            limite_falhas=politica.limite_falhas,
+            tempo_aberto=politica.tempo_aberto,
+            limite_lento=politica.limite_lento,
+        )
+        self.orcamento = OrcamentoRetentativas(politica.proporcao_retentativas, politica.maximo_retentativas)
+        self.retentativas = 0
+        self.hedges = 0
+        self.hedges_vencedores = 0
+
+    async def requisitar(
+        self,
+        metodo: str,
+        caminho: str,
+        *,
+        idempotente: bool = False,
+        hedge: bool = False,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Só chamadas `idempotente` são repetidas (em erro de rede ou 502/503/504,
+        com backoff exponencial e se houver orçamento); `hedge` vale apenas
+        para chamadas idempotentes e quando a política define `hedge_apos`.
+        Com `stream=True` a resposta volta sem o corpo lido (o chamador a
+        fecha) e não há hedge.
+        """
+        self.orcamento.depositar()
+        tentativas = self.politica.tentativas if idempotente else 1
+        usar_hedge = hedge and idempotente and not kwargs.get("stream") and self.politica.hedge_apos is not None
+
+        for tentativa in range(1, tentativas + 1):
+            ultima = tentativa == tentativas
+            try:
+                if usar_hedge:
+                    response = await self._com_hedge(metodo, caminho, kwargs)
+                else:
+                    response = await self._tentar(metodo, caminho, kwargs)
+            except CircuitoAberto:
+                raise
+            except httpx.HTTPError:
+                if ultima or not self.orcamento.sacar():
+                    raise
+            else:
+                if response.status_code not in CODIGOS_RETENTAVEIS or ultima or not self.orcamento.sacar():
+                    return response
+                await response.aclose()
+
+            self.retentativas += 1
+            atraso = self.politica.backoff * (2 ** (tentativa - 1))
+            await asyncio.sleep(atraso * random.uniform(0.5, 1.0))
+
+    async def _tentar(self, metodo: str, caminho: str, kwargs: dict) -> httpx.Response:
+        if not self.disjuntor.permitir():
+            raise CircuitoAberto(f"Circuito aberto para o serviço '{self.nome}'")
+        with etapa(f"{metodo} {self.nome}", server_timing=False) as span:
+            propagar = {}
+            request_id = request_id_atual()
+            if request_id is not None:
+                propagar["x-request-id"] = request_id
+            if span is not None:
+                span.atributos["caminho"] = caminho
+                propagar["traceparent"] = span.traceparent()
+            if propagar:
+                kwargs = {**kwargs, "headers": {**(kwargs.get("headers") or {}), **propagar}}
+            response = await self._enviar(metodo, caminho, kwargs)
+            if span is not None:
+                span.atributos["codigo"] = response.status_code
+            return response
+
+    async def _enviar(self, metodo: str, caminho: str, kwargs: dict) -> httpx.Response:
+        cliente = self.clientes[self.nome]
+        inicio = time.perf_counter()
+        try:
+            if kwargs.get("stream"):
+                kwargs = {nome: valor for nome, valor in kwargs.items() if nome != "stream"}
+                response = await cliente.send(cliente.build_request(metodo, caminho, **kwargs), stream=True)
+            else:
+                response = await cliente.request(metodo, caminho, **kwargs)
+        except httpx.HTTPError:
+            duracao = time.perf_counter() - inicio
+            self.disjuntor.registrar(False, duracao)
+            if self.observador is not None:
+                self.observador(self.nome, "erro", duracao)
+            raise
+        except asyncio.CancelledError:
+            self.disjuntor.liberar()
+            raise
+        duracao = time.perf_counter() - inicio
+        self.disjuntor.registrar(response.status_code < 500, duracao)
+        if self.observador is not None:
+            self.observador(self.nome, str(response.status_code), duracao)
+        return response
+
+    async def _com_hedge(self, metodo: str, caminho: str, kwargs: dict) -> httpx.Response:
+        """
+        Dispara a chamada; se não houver resposta em `hedge_apos` segundos (e
+        houver orçamento), dispara uma segunda igual e usa a primeira que
+        responder sem erro, cancelando a outra.
+        """
+        primeira = asyncio.ensure_future(self._tentar(metodo, caminho, kwargs))
+        pendentes = {primeira}
+        try:
+            prontas, _ = await asyncio.wait(pendentes, timeout=self.politica.hedge_apos)
+            if prontas or not self.orcamento.sacar():
+                return await primeira
+
+            self.hedges += 1
+            segunda = asyncio.ensure_future(self._tentar(metodo, caminho, kwargs))
+            pendentes.add(segunda)
+            falha = None
+            while pendentes:
+                prontas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in prontas:
+                    if tarefa.exception() is None and tarefa.result().status_code < 500:
+                        if tarefa is segunda:
+                            self.hedges_vencedores += 1
+                        return tarefa.result()
+                    falha = tarefa
+            return falha.result()
+        finally:
+            for tarefa in pendentes:
+                tarefa.cancel()
+
+    def estatisticas(self) -> dict:
+        return {
+            "disjuntor": self.disjuntor.estatisticas(),
+            "orcamento_retentativas": self.orcamento.estatisticas(),
+            "retentativas": self.retentativas,
+            "hedges": self.hedges,
+            "hedges_vencedores": self.hedges_vencedores,
+        }
@@ -0,0 +1,75 @@
+"""
+Camada de respostas JSON rápidas
+Serializa com orjson (quando instalado; senão cai para o json da biblioteca
+padrão), guarda corpos estáticos já serializados (health/home) e permite
+que endpoints internos confiáveis devolvam o corpo direto, sem a passagem
+de validação/conversão do FastAPI (response_model + jsonable_encoder).
+"""
+
+import json
+import os
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+# VALIDAR_RESPOSTAS=1 volta a validar também as respostas marcadas como
+# confiáveis (útil em desenvolvimento, para pegar divergências com o modelo)
+VALIDAR_RESPOSTAS = os.getenv("VALIDAR_RESPOSTAS", "0") in ("1", "true", "sim")
+
+
+def _padrao(valor: Any) -> Any:
+    if isinstance(valor, BaseModel):
+        return valor.model_dump(mode="json")
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+
+if orjson is not None:
+    _OPCOES_ORJSON = orjson.OPT_NON_STR_KEYS
+
+    def serializar(dados: Any) -> bytes:
+        return orjson.dumps(dados, default=_padrao, option=_OPCOES_ORJSON)
+else:
+    def serializar(dados: Any) -> bytes:
+        return json.dumps(
+            dados, ensure_ascii=False, separators=(",", ":"), default=_padrao
+        ).encode("utf-8")
+
+
+class RespostaJSON(JSONResponse):
+    """JSONResponse serializada com `serializar` (usada como default_response_class)"""
+
+    def render(self, content: Any) -> bytes:
+        return serializar(content)
+
+
+class CorpoEstatico:
+    """Corpo JSON fixo, serializado uma única vez (ex.: health check)"""
+
+    __slots__ = ("corpo",)
+
+    def __init__(self, dados: Any):
+        self.corpo = serializar(dados)
+
+    def resposta(self) -> Response:
+        return Response(content=self.corpo, media_type="application/json")
+
+
+def resposta_confiavel(dados: Any, status_code: int = 200) -> Any:
+    """
+    Devolve `dados` já serializados, pulando a validação do response_model e
+    o jsonable_encoder. Só para corpos montados pelo próprio serviço, cujo
+    formato já é garantido pelo código; com VALIDAR_RESPOSTAS=1 os dados
+    voltam para o caminho normal do FastAPI.
+    """
+    if VALIDAR_RESPOSTAS:
+        return dados
+    return Response(content=serializar(dados), status_code=status_code, media_type="application/json")
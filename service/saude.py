@@ -0,0 +1,185 @@
+"""
+Monitor de saúde dos microsserviços (Gateway)
+Sonda todos os serviços ao mesmo tempo, em intervalos fixos, e mantém uma
+janela deslizante de latência e erros por serviço. O /status do gateway
+devolve o último retrato pronto, e as decisões de roteamento consultam
+`disponivel()` em vez de esperar o timeout de um serviço fora do ar.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+import httpx
+
+from service.clientes import PoolClientes
+
+logger = logging.getLogger(__name__)
+
+ONLINE = "online"
+DEGRADADO = "degradado"
+OFFLINE = "offline"
+DESCONHECIDO = "desconhecido"
+
+
+class JanelaSaude:
+    """Últimas `tamanho` sondagens de um serviço: (latência em s, sucesso)"""
+
+    def __init__(self, tamanho: int):
+        self.amostras = deque(maxlen=tamanho)
+        self.falhas_consecutivas = 0
+        self.ultimo_codigo: Optional[int] = None
+        self.ultimo_erro: Optional[str] = None
+        self.ultima_latencia: Optional[float] = None
+        self.verificado_em: Optional[str] = None
+
+    def registrar(self, latencia: float, codigo: Optional[int], erro: Optional[str]) -> None:
+        sucesso = erro is None and codigo == 200
+        self.amostras.append((latencia, sucesso))
+        self.falhas_consecutivas = 0 if sucesso else self.falhas_consecutivas + 1
+        self.ultimo_codigo = codigo
+        self.ultimo_erro = erro
+        self.ultima_latencia = latencia
+        self.verificado_em = datetime.now().isoformat(timespec="seconds")
+
+    def taxa_erro(self) -> float:
+        if not self.amostras:
+            return 0.0
+        return sum(1 for _, sucesso in self.amostras if not sucesso) / len(self.amostras)
+
+    def latencias_ms(self):
+        """Média e p95 das sondagens bem-sucedidas da janela, em ms"""
+        latencias = sorted(latencia for latencia, sucesso in self.amostras if sucesso)
+        if not latencias:
+            return None, None
+        media = sum(latencias) / len(latencias)
+        p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+        return round(media * 1000, 2), round(p95 * 1000, 2)
+
+
+class MonitorSaude:
+    """
+    Sondagem periódica e concorrente dos serviços do pool de clientes.
+
+    Cada rodada faz um GET no caminho de saúde de cada serviço (com
+    `timeout` próprio, menor que o das chamadas normais) e, ao final, monta
+    o retrato servido pelo /status. Um serviço é considerado:
+      online      -> última sondagem OK e taxa de erro da janela abaixo do limite
+      degradado   -> respondeu, mas com erro, ou taxa de erro alta
+      offline     -> `falhas_para_offline` sondagens seguidas sem resposta OK
+    """
+
+    def __init__(
+        self,
+        clientes: PoolClientes,
+        rotulos: Dict[str, str],
+        intervalo: float = 5.0,
+        timeout: float = 2.0,
+        tamanho_janela: int = 30,
+        falhas_para_offline: int = 2,
+        limite_taxa_erro: float = 0.5,
+    ):
+        self.clientes = clientes
+        self.rotulos = dict(rotulos)
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self.falhas_para_offline = falhas_para_offline
+        self.limite_taxa_erro = limite_taxa_erro
+        self._janelas = {nome: JanelaSaude(tamanho_janela) for nome in self.rotulos}
+        self._retrato: Optional[dict] = None
+        self._rodada: Optional[asyncio.Future] = None
+        self._tarefa: Optional[asyncio.Task] = None
+
+    @property
+    def ativo(self) -> bool:
+        return self._tarefa is not None
+
+    async def iniciar(self) -> None:
+        """Inicia a sondagem em background (a primeira rodada é imediata)"""
+        if self.ativo:
+            return
+        self._tarefa = asyncio.create_task(self._laco(), name="monitor-saude")
+
+    async def parar(self) -> None:
+        if not self.ativo:
+            return
+        self._tarefa.cancel()
+        await asyncio.gather(self._tarefa, return_exceptions=True)
+        self._tarefa = None
+
+    async def _laco(self) -> None:
+        while True:
+            try:
+                await self.verificar_agora()
+            except Exception as e:  # o laço não pode morrer por uma rodada com erro
+                logger.warning(f"⚠ Falha na rodada de sondagem: {str(e)}")
+            await asyncio.sleep(self.intervalo)
+
+    async def _sondar(self, nome: str) -> None:
+        config = self.clientes.servicos[nome]
+        inicio = time.perf_counter()
+        try:
+            response = await self.clientes[nome].get(config.caminho_saude, timeout=self.timeout)
+            codigo, erro = response.status_code, None
+        except httpx.HTTPError as e:
+            codigo, erro = None, str(e) or type(e).__name__
+        self._janelas[nome].registrar(time.perf_counter() - inicio, codigo, erro)
+
+    async def verificar_agora(self) -> dict:
+        """
+        Sonda todos os serviços em paralelo e atualiza o retrato. Chamadas
+        simultâneas aguardam a mesma rodada em vez de disparar outra.
+        """
+        if self._rodada is None or self._rodada.done():
+            self._rodada = asyncio.ensure_future(self._executar_rodada())
+        return await asyncio.shield(self._rodada)
+
+    async def _executar_rodada(self) -> dict:
+        await asyncio.gather(*(self._sondar(nome) for nome in self.rotulos))
+        self._retrato = {
+            "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+            "intervalo_s": self.intervalo,
+            "servicos": {self.rotulos[nome]: self._resumo(nome) for nome in self.rotulos},
+        }
+        return self._retrato
+
+    def estado(self, nome: str) -> str:
+        janela = self._janelas[nome]
+        if not janela.amostras:
+            return DESCONHECIDO
+        if janela.falhas_consecutivas >= self.falhas_para_offline:
+            return OFFLINE
+        if janela.falhas_consecutivas or janela.taxa_erro() >= self.limite_taxa_erro:
+            return DEGRADADO
+        return ONLINE
+
+    def disponivel(self, nome: str) -> bool:
+        """False só quando o serviço está confirmadamente fora do ar"""
+        return self.estado(nome) != OFFLINE
+
+    def _resumo(self, nome: str) -> dict:
+        janela = self._janelas[nome]
+        media, p95 = janela.latencias_ms()
+        resumo = {
+            "status": self.estado(nome),
+            "codigo": janela.ultimo_codigo,
+            "latencia_ms": round(janela.ultima_latencia * 1000, 2) if janela.ultima_latencia is not None else None,
+            "latencia_media_ms": media,
+            "latencia_p95_ms": p95,
+            "taxa_erro": round(janela.taxa_erro(), 3),
+            "amostras": len(janela.amostras),
+            "falhas_consecutivas": janela.falhas_consecutivas,
+            "verificado_em": janela.verificado_em,
+        }
+        if janela.ultimo_erro is not None:
+            resumo["erro"] = janela.ultimo_erro
+        return resumo
+
+    async def retrato(self) -> dict:
+        """Último retrato pronto; se ainda não houve rodada, faz uma agora"""
+        if self._retrato is None:
+            return await self.verificar_agora()
+        return self._retrato
@@ -0,0 +1,316 @@
+"""
+Supervisor de processos
+Roda cada serviço em N processos (workers) na porta de sempre: o supervisor
+abre o socket da porta e os workers o herdam, então o kernel distribui as
+conexões entre eles e a pilha passa a usar mais de um núcleo.
+
+- Workers que morrem são substituídos (com espera crescente se morrerem
+  logo depois de subir, para não entrar em laço de reinício).
+- Cada worker dá sinal de vida (batimento) pelo próprio event loop; um
+  worker cujo loop trava por mais de `limite_batimento` segundos é morto e
+  substituído. Os health checks HTTP dos serviços medem a mesma coisa, mas
+  uma sonda na porta compartilhada cai num worker qualquer; o batimento diz
+  qual deles travou.
+- SIGHUP reinicia todos os workers sem fechar as portas: nos serviços com
+  mais de um worker, cada substituto sobe antes de o antigo sair.
+- SIGINT/SIGTERM encerram na ordem inversa da subida (gateway primeiro),
+  deixando cada worker terminar as requisições em andamento.
+
+Serviços que guardam estado em memória (ex.: confirmacoes_db da reserva)
+declaram `estado_local` e não podem ter mais de um worker: cada processo
+teria a sua própria cópia, e dois workers aceitariam reservas conflitantes.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from service.logs import configurar_logs
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_BATIMENTO = 1.0
+
+
+@dataclass(frozen=True)
+class ServicoSupervisionado:
+    """Serviço sob o supervisor; `app` no formato "modulo:atributo" """
+    nome: str
+    app: str
+    porta: int
+    workers: int = 1
+    estado_local: Optional[str] = None  # estado em memória que impede mais de 1 worker
+
+
+def _executar_worker(app: str, sock: socket.socket, batimento, liberar, log_level: str) -> None:
+    """
+    Processo worker: importa o app, espera `liberar` e serve no socket
+    herdado, batendo o coração pelo event loop
+    """
+    if hasattr(os, "setpgrp"):
+        # Fora do grupo do terminal: o Ctrl-C chega só ao supervisor, que encerra na ordem certa
+        os.setpgrp()
+    # Logs do worker pela fila de service.logs (o uvicorn não instala a configuração dele)
+    configurar_logs()
+    config = uvicorn.Config(app, log_level=log_level, log_config=None, access_log=False)
+    config.load()
+    liberar.wait()
+    server = uvicorn.Server(config)
+
+    async def bater():
+        while True:
+            if server.started:
+                batimento.value = time.time()
+            await asyncio.sleep(INTERVALO_BATIMENTO)
+
+    async def principal():
+        tarefa = asyncio.ensure_future(bater())
+        try:
+            await server.serve(sockets=[sock])
+        finally:
+            tarefa.cancel()
+
+    asyncio.run(principal())
+
+
+class Worker:
+    def __init__(self, servico: ServicoSupervisionado, indice: int, processo, batimento, liberar):
+        self.servico = servico
+        self.indice = indice
+        self.processo = processo
+        self.batimento = batimento
+        self.liberar = liberar
+        self.iniciado_em = time.monotonic()
+
+    @property
+    def nome(self) -> str:
+        return f"{self.servico.nome}[{self.indice}] pid={self.processo.pid}"
+
+    @property
+    def pronto(self) -> bool:
+        return self.batimento.value > 0
+
+
+class Supervisor:
+    """
+    Sobe os serviços na ordem dada (o gateway por último) e os mantém no ar
+    até receber SIGINT/SIGTERM; `executar` bloqueia até o encerramento.
+    """
+
+    def __init__(
+        self,
+        servicos: List[ServicoSupervisionado],
+        limite_batimento: float = 30.0,
+        prazo_inicio: float = 30.0,
+        prazo_encerramento: float = 15.0,
+        host: str = "127.0.0.1",
+        log_level: str = "info",
+    ):
+        for servico in servicos:
+            if servico.workers < 1:
+                raise ValueError(f"{servico.nome}: workers deve ser pelo menos 1")
+            if servico.workers > 1 and servico.estado_local:
+                raise ValueError(
+                    f"{servico.nome} guarda estado em memória ({servico.estado_local}) "
+                    f"e não pode rodar com {servico.workers} workers"
+                )
+        self.servicos = list(servicos)
+        self.limite_batimento = limite_batimento
+        self.prazo_inicio = prazo_inicio
+        self.prazo_encerramento = prazo_encerramento
+        self.host = host
+        self.log_level = log_level
+        self._contexto = multiprocessing.get_context("spawn")
+        self._sockets: Dict[str, socket.socket] = {}
+        self._workers: Dict[str, List[Optional[Worker]]] = {}
+        # (serviço, índice) -> (quando pode subir de novo, falhas seguidas logo após subir)
+        self._espera: Dict[tuple, tuple] = {}
+        self._acordar = threading.Event()
+        self._encerrar = False
+        self._reiniciar = False
+
+    # ---------- workers ----------
+    def _abrir_socket(self, porta: int) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, porta))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _iniciar_worker(self, servico: ServicoSupervisionado, indice: int, liberado: bool = True) -> Worker:
+        """
+        Sobe um worker; com `liberado=False` ele só importa o app e espera
+        `worker.liberar.set()` para começar a atender
+        """
+        batimento = self._contexto.Value("d", 0.0, lock=False)
+        liberar = self._contexto.Event()
+        if liberado:
+            liberar.set()
+        processo = self._contexto.Process(
+            target=_executar_worker,
+            args=(servico.app, self._sockets[servico.nome], batimento, liberar, self.log_level),
+            name=f"{servico.nome}-{indice}",
+            daemon=False,
+        )
+        processo.start()
+        worker = Worker(servico, indice, processo, batimento, liberar)
+        logger.info(f"▶ {worker.nome} iniciado")
+        return worker
+
+    def _parar_workers(self, workers: List[Worker]) -> None:
+        """SIGTERM (o uvicorn termina as requisições em andamento); SIGKILL após o prazo"""
+        for worker in workers:
+            if worker.processo.is_alive():
+                worker.processo.terminate()
+        limite = time.monotonic() + self.prazo_encerramento
+        for worker in workers:
+            worker.processo.join(max(0.0, limite - time.monotonic()))
+            if worker.processo.is_alive():
+                logger.warning(f"⚠ {worker.nome} não encerrou em {self.prazo_encerramento:.0f}s; forçando")
+                worker.processo.kill()
+                worker.processo.join()
+
+    def _esperar_pronto(self, worker: Worker) -> bool:
+        limite = time.monotonic() + self.prazo_inicio
+        while time.monotonic() < limite and worker.processo.is_alive():
+            if worker.pronto:
+                return True
+            time.sleep(0.05)
+        return False
+
+    # ---------- ciclo de vida ----------
+    def executar(self) -> None:
+        self._instalar_sinais()
+        try:
+            for servico in self.servicos:
+                self._sockets[servico.nome] = self._abrir_socket(servico.porta)
+            # Os serviços sobem em paralelo; o último (gateway) só depois que os outros estiverem prontos
+            for grupo in (self.servicos[:-1], self.servicos[-1:]):
+                for servico in grupo:
+                    self._workers[servico.nome] = [
+                        self._iniciar_worker(servico, indice) for indice in range(servico.workers)
+                    ]
+                for servico in grupo:
+                    for worker in self._workers[servico.nome]:
+                        if not self._esperar_pronto(worker):
+                            logger.error(f"✗ {worker.nome} não ficou pronto em {self.prazo_inicio:.0f}s")
+                if self._encerrar:
+                    return
+            logger.info("✓ " + ", ".join(f"{s.nome}:{s.porta} x{s.workers}" for s in self.servicos))
+
+            while not self._encerrar:
+                self._acordar.wait(INTERVALO_BATIMENTO)
+                self._acordar.clear()
+                if self._reiniciar:
+                    self._reiniciar = False
+                    self.reiniciar()
+                if not self._encerrar:
+                    self._vigiar()
+        finally:
+            self.encerrar()
+
+    def _vigiar(self) -> None:
+        """Substitui workers mortos, travados ou que não subiram no prazo"""
+        agora = time.monotonic()
+        for servico in self.servicos:
+            workers = self._workers[servico.nome]
+            for indice, worker in enumerate(workers):
+                chave = (servico.nome, indice)
+                if worker is None:
+                    if agora >= self._espera[chave][0]:
+                        workers[indice] = self._iniciar_worker(servico, indice)
+                    continue
+
+                motivo = None
+                if not worker.processo.is_alive():
+                    motivo = f"terminou (código {worker.processo.exitcode})"
+                elif worker.pronto and time.time() - worker.batimento.value > self.limite_batimento:
+                    motivo = f"sem batimento há {time.time() - worker.batimento.value:.0f}s"
+                elif not worker.pronto and agora - worker.iniciado_em > self.prazo_inicio:
+                    motivo = f"não ficou pronto em {self.prazo_inicio:.0f}s"
+                if motivo is None:
+                    if agora - worker.iniciado_em > 60:
+                        self._espera.pop(chave, None)
+                    continue
+
+                logger.warning(f"⚠ {worker.nome} {motivo}; substituindo")
+                if worker.processo.is_alive():
+                    worker.processo.kill()
+                    worker.processo.join()
+                falhas = self._espera.get(chave, (0.0, 0))[1]
+                falhas = falhas + 1 if agora - worker.iniciado_em < 10 else 0
+                atraso = min(2 ** falhas - 1, 30)
+                self._espera[chave] = (agora + atraso, falhas)
+                workers[indice] = None
+                if atraso == 0:
+                    workers[indice] = self._iniciar_worker(servico, indice)
+
+    def reiniciar(self) -> None:
+        """
+        Reinício gracioso, serviço a serviço. Com vários workers, cada um é
+        trocado só depois de o substituto estar pronto, e a porta nunca fica
+        sem quem atenda. Com um único worker (serviços com estado em memória)
+        os dois nunca podem atender juntos: o substituto importa o app antes,
+        mas só começa a atender depois que o antigo termina as requisições em
+        andamento; nesse intervalo as conexões esperam na fila do socket. O
+        estado em memória recomeça do armazenamento (RESERVAS_DB).
+        """
+        logger.info("↻ Reiniciando workers")
+        for servico in self.servicos:
+            inicio = time.monotonic()
+            workers = self._workers[servico.nome]
+            for indice, antigo in enumerate(workers):
+                if servico.workers == 1:
+                    novo = self._iniciar_worker(servico, indice, liberado=False)
+                    if antigo is not None:
+                        self._parar_workers([antigo])
+                    novo.liberar.set()
+                    self._esperar_pronto(novo)
+                    workers[indice] = novo
+                else:
+                    novo = self._iniciar_worker(servico, indice)
+                    self._esperar_pronto(novo)
+                    workers[indice] = novo
+                    if antigo is not None:
+                        self._parar_workers([antigo])
+                self._espera.pop((servico.nome, indice), None)
+            logger.info(f"↻ {servico.nome} reiniciado em {time.monotonic() - inicio:.1f}s")
+        logger.info("✓ Workers reiniciados")
+
+    def encerrar(self) -> None:
+        """Encerra os serviços na ordem inversa da subida e fecha as portas"""
+        if not self._workers and not self._sockets:
+            return
+        logger.info("⏹ Encerrando serviços")
+        for servico in reversed(self.servicos):
+            workers = [worker for worker in self._workers.pop(servico.nome, []) if worker is not None]
+            self._parar_workers(workers)
+            sock = self._sockets.pop(servico.nome, None)
+            if sock is not None:
+                sock.close()
+        logger.info("✓ Serviços encerrados")
+
+    # ---------- sinais ----------
+    def _instalar_sinais(self) -> None:
+        def encerrar(signum, frame):
+            self._encerrar = True
+            self._acordar.set()
+
+        def reiniciar(signum, frame):
+            self._reiniciar = True
+            self._acordar.set()
+
+        signal.signal(signal.SIGINT, encerrar)
+        signal.signal(signal.SIGTERM, encerrar)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, reiniciar)
@@ -1,18 +1,138 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import date
+from itertools import islice
+from typing import Iterator, List, Literal, Optional, Set, Tuple
+import logging
+import os
+import threading
+import httpx
 import uvicorn
 
-print("🕒 MICROSSERVIÇO DE VERIFICAÇÃO DE DISPONIBILIDADE")
-print("=" * 60)
+from service.agenda import ConflitoHorario, IndiceAgendas, de_minutos, para_minutos
+from service.armazenamento import ArmazenamentoMemoria, criar_armazenamento
+from service.feed import CANCELADA, CRIADA, ConsumidorAlteracoes, FonteAlteracoes, fonte_http
+from service.logs import configurar_logs, registrar_logs
+from service.metricas import instrumentar
+from service.ocupacoes import OCUPACOES_INICIAIS
+from service.paginacao import codificar_cursor, decodificar_cursor, quer_ndjson, resposta_ndjson
+from service.rastreamento import rastrear
+from service.respostas import CorpoEstatico, RespostaJSON, resposta_confiavel
+
+logger = logging.getLogger(__name__)
+
+# Memória (padrão) ou SQLite compartilhado com o serviço de reserva (RESERVAS_DB);
+# criado (e fechado) no lifespan
+armazenamento = ArmazenamentoMemoria()
+
+
+# Feed de alterações do serviço de reserva ("" ou "desligado" para não consumir)
+RESERVA_FEED_URL = os.getenv("RESERVA_FEED_URL", "http://localhost:8003")
+
+# Fonte em processo, quando o serviço de reserva roda no mesmo event loop
+# (run_all --direto); tem precedência sobre RESERVA_FEED_URL
+_fonte_local: Optional[FonteAlteracoes] = None
+
+
+def usar_fonte_local(fonte: FonteAlteracoes) -> None:
+    """Consome o feed por `fonte` (ex.: feed.fonte_local) em vez de HTTP; chamar antes do lifespan"""
+    global _fonte_local
+    _fonte_local = fonte
+
+
+def carregar_reservas() -> int:
+    """
+    Acrescenta ao índice as reservas confirmadas do armazenamento e retorna
+    o seq do feed correspondente a esse retrato
+    """
+    registros, posicao = armazenamento.carregar_com_posicao()
+    with _lock_indice:
+        for registro in registros:
+            if registro["status"] != "CONFIRMADA":
+                continue
+            try:
+                indice.inserir(registro["sala_id"], registro["inicio"], registro["fim"])
+            except ValueError as e:
+                logger.warning(f"⚠ Reserva {registro['reserva_id']} ignorada: {e}")
+    return posicao
+
+
+def aplicar_alteracao(evento: dict) -> None:
+    """Aplica um evento do feed de reservas ao índice (idempotente)"""
+    global _eventos_repetidos, _eventos_em_conflito
+    chave = (evento["sala_id"], evento["inicio"], evento["fim"])
+    with _lock_indice:
+        if evento["tipo"] == CRIADA:
+            try:
+                indice.inserir(*chave)
+                _aplicadas_pelo_feed.add(chave)
+            except ConflitoHorario as e:
+                if (e.inicio, e.fim) != (evento["inicio"], evento["fim"]):
+                    _eventos_em_conflito += 1
+                    logger.warning(f"⚠ Evento {evento['seq']} conflita com reserva existente: {e}")
+                elif chave in _aplicadas_pelo_feed:
+                    # Reentrega do mesmo evento (idempotente)
+                    _eventos_repetidos += 1
+                else:
+                    # Mesmo horário já no índice, vindo do armazenamento ou das ocupações: as duas origens divergem
+                    _eventos_em_conflito += 1
+                    logger.warning(f"⚠ Evento {evento['seq']} repete um horário que o índice já tinha: {e}")
+        elif evento["tipo"] == CANCELADA:
+            indice.remover(*chave)
+            _aplicadas_pelo_feed.discard(chave)
+
+
+def desfazer_alteracoes() -> None:
+    """Remove do índice tudo o que veio do feed (o histórico do produtor mudou)"""
+    with _lock_indice:
+        for chave in _aplicadas_pelo_feed:
+            indice.remover(*chave)
+        _aplicadas_pelo_feed.clear()
+
+
+consumidor = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global armazenamento, consumidor
+    armazenamento = criar_armazenamento()
+    posicao = carregar_reservas()
+    fonte, cliente = _fonte_local, None
+    if fonte is None and RESERVA_FEED_URL and RESERVA_FEED_URL != "desligado":
+        cliente = httpx.AsyncClient(base_url=RESERVA_FEED_URL)
+        fonte = fonte_http(cliente)
+    if fonte is not None:
+        consumidor = ConsumidorAlteracoes(
+            fonte,
+            aplicar_alteracao,
+            desfazer_alteracoes,
+            posicao=posicao,
+            epoca=armazenamento.epoca() if armazenamento.persistente else None,
+            cliente=cliente
+        )
+        consumidor.iniciar()
+    logger.info("🕒 Microsserviço de verificação de disponibilidade iniciado")
+    yield
+    if consumidor is not None:
+        await consumidor.parar()
+    armazenamento.fechar()
+
 
 app = FastAPI(
     title="Serviço de Verificação de Disponibilidade",
     description="Verifica se uma sala está disponível em um horário específico.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RespostaJSON
 )
 
+metricas = instrumentar(app)
+registrar_logs(app, "verificar_disponibilidade")
+rastrear(app, "verificar_disponibilidade")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,14 +142,24 @@ app.add_middleware(
 )
 
 # -------------------------------
-# Banco simulado de reservas
-# IDs iguais ao serviço de consulta:
+# Banco simulado de reservas: as ocupações pré-existentes (compartilhadas com
+# o serviço de reserva); as reservas novas chegam pelo armazenamento e pelo feed
+
+reservas_db = OCUPACOES_INICIAIS
+
+# Índice sala -> intervalos ordenados, já convertidos para minutos
+indice = IndiceAgendas.de_registros(reservas_db)
+
+# O índice é lido nos handlers (threadpool) e alterado pelo consumidor do feed
+_lock_indice = threading.Lock()
+
+# Reservas que entraram no índice pelo feed (para desfazer se a época mudar)
+_aplicadas_pelo_feed: Set[Tuple[str, str, str]] = set()
 
-reservas_db = [
-    {"id_sala": "LAB-01", "reservas": [("2025-10-20 14:00", "2025-10-20 15:00")]},
-    {"id_sala": "LAB-02", "reservas": [("2025-10-20 09:00", "2025-10-20 11:00")]},
-    {"id_sala": "SALA-01", "reservas": []},
-]
+# Eventos CRIADA que não entraram no índice: reentregas do mesmo evento e
+# conflitos com o que já estava lá (divergência entre as fontes; ver GET /feed)
+_eventos_repetidos = 0
+_eventos_em_conflito = 0
 
 # -------------------------------
 # Modelo para entrada
@@ -39,23 +169,95 @@ class Verificacao(BaseModel):
     inicio: str   # formato "YYYY-MM-DD HH:MM"
     fim: str      # formato "YYYY-MM-DD HH:MM"
 
+class BuscaLivres(BaseModel):
+    salas: List[str]    # candidatas, já na ordem de preferência
+    inicio: str         # formato "YYYY-MM-DD HH:MM"
+    fim: str            # formato "YYYY-MM-DD HH:MM"
+    limite: int = 5
+    sugestoes: bool = True
+
+
+_CORPO_HOME = CorpoEstatico({
+    "servico": "verificar_disponibilidade",
+    "status": "online",
+    "descricao": "Verifica se uma sala está livre em um horário específico.",
+    "endpoints": {
+        "POST verificar": "/verificar",
+        "POST verificar_lote": "/verificar/lote",
+        "POST buscar_livres": "/buscar",
+        "GET estado_feed": "/feed",
+        "GET todas_reservas": "/reservas",
+    }
+})
+
+
 @app.get("/", tags=["Health"])
 def home():
-    return {
-        "servico": "verificar_disponibilidade",
-        "status": "online",
-        "descricao": "Verifica se uma sala está livre em um horário específico.",
-        "endpoints": {
-            "POST verificar": "/verificar",
-            "GET todas_reservas": "/reservas",
-        }
-    }
+    return _CORPO_HOME.resposta()
+
+
+def _iterar_reservas(
+    apos: Optional[Tuple[str, int]],
+    sala_id: Optional[str],
+    inicio_min: Optional[int],
+    inicio_max: Optional[int],
+    janela: int = 1000
+) -> Iterator[dict]:
+    """Reservas em ordem de (sala, início), lidas do índice em janelas curtas sob o lock"""
+    while True:
+        with _lock_indice:
+            itens = indice.pagina(janela, apos, sala_id, inicio_min, inicio_max)
+        for sala, _, (inicio, fim) in itens:
+            yield {"id_sala": sala, "inicio": inicio, "fim": fim}
+        if len(itens) < janela:
+            return
+        apos = itens[-1][:2]
 
 
 @app.get("/reservas", tags=["Reservas"])
-def listar_reservas():
-    """Lista todas as reservas registradas."""
-    return {"total": len(reservas_db), "reservas": reservas_db}
+def listar_reservas(
+    request: Request,
+    id_sala: Optional[str] = Query(None, description="Filtra pela sala"),
+    de: Optional[str] = Query(None, description="Início a partir desta data (YYYY-MM-DD)"),
+    ate: Optional[str] = Query(None, description="Início até esta data, inclusive (YYYY-MM-DD)"),
+    cursor: Optional[str] = Query(None, description="`proximo_cursor` da página anterior"),
+    limite: Optional[int] = Query(None, ge=1, description="Itens por página (JSON: padrão 100, máx. 1000)"),
+    formato: Optional[Literal["json", "ndjson"]] = Query(None, description="ndjson: uma reserva por linha, em streaming")
+):
+    """
+    Lista as reservas registradas, em ordem de sala e início.
+
+    Em JSON a resposta é paginada por cursor (`proximo_cursor`); em NDJSON
+    (?formato=ndjson ou Accept: application/x-ndjson) todas as reservas que
+    passam nos filtros são enviadas à medida que são lidas.
+    """
+    try:
+        inicio_min = para_minutos(f"{date.fromisoformat(de)} 00:00") if de else None
+        inicio_max = para_minutos(f"{date.fromisoformat(ate)} 00:00") + 24 * 60 if ate else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de data inválido. Use 'YYYY-MM-DD'")
+
+    chave = decodificar_cursor(cursor)
+    try:
+        apos = (str(chave[0]), int(chave[1])) if chave else None
+    except (IndexError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+    reservas = _iterar_reservas(apos, id_sala, inicio_min, inicio_max)
+
+    if quer_ndjson(request, formato):
+        return resposta_ndjson(islice(reservas, limite) if limite else reservas)
+
+    limite = limite or 100
+    if limite > 1000:
+        raise HTTPException(status_code=400, detail="Em JSON, o limite máximo é 1000; use formato=ndjson para exportar.")
+    pagina = list(islice(reservas, limite + 1))
+    proximo = None
+    if len(pagina) > limite:
+        pagina = pagina[:limite]
+        ultimo = pagina[-1]
+        proximo = codificar_cursor(ultimo["id_sala"], para_minutos(ultimo["inicio"]))
+    return resposta_confiavel({"reservas": pagina, "proximo_cursor": proximo})
 
 
 @app.post("/verificar", tags=["Verificação"])
@@ -64,8 +266,8 @@ def verificar_disponibilidade(dados: Verificacao):
 
     # Conversão de datas
     try:
-        inicio = datetime.strptime(dados.inicio, "%Y-%m-%d %H:%M")
-        fim = datetime.strptime(dados.fim, "%Y-%m-%d %H:%M")
+        inicio = para_minutos(dados.inicio)
+        fim = para_minutos(dados.fim)
     except ValueError:
         raise HTTPException(
             status_code=400,
@@ -78,42 +280,172 @@ def verificar_disponibilidade(dados: Verificacao):
             detail="A data/hora inicial deve ser anterior à final."
         )
 
-    # Procura a sala no banco
-    for registro in reservas_db:
-        if registro["id_sala"] == dados.id_sala:
-
-            # Verifica conflitos com reservas existentes
-            for reserva in registro["reservas"]:
-                inicio_reserva = datetime.strptime(reserva[0], "%Y-%m-%d %H:%M")
-                fim_reserva = datetime.strptime(reserva[1], "%Y-%m-%d %H:%M")
-
-                # Verificar sobreposição
-                if not (fim <= inicio_reserva or inicio >= fim_reserva):
-                    return {
-                        "id_sala": dados.id_sala,
-                        "disponivel": False,
-                        "mensagem": f"Sala ocupada entre {reserva[0]} e {reserva[1]}."
-                    }
-
-            # Sem conflitos → disponível
-            return {
-                "id_sala": dados.id_sala,
+    with _lock_indice:
+        # Se sala não encontrada
+        if dados.id_sala not in indice:
+            raise HTTPException(status_code=404, detail="Sala não encontrada.")
+
+        # Busca de conflito em O(log n) na agenda da sala
+        reserva = indice.conflito(dados.id_sala, inicio, fim)
+    if reserva is not None:
+        return resposta_confiavel({
+            "id_sala": dados.id_sala,
+            "disponivel": False,
+            "mensagem": f"Sala ocupada entre {reserva[0]} e {reserva[1]}."
+        })
+
+    # Sem conflitos → disponível
+    return resposta_confiavel({
+        "id_sala": dados.id_sala,
+        "disponivel": True,
+        "mensagem": "Sala disponível no horário solicitado."
+    })
+
+
+@app.post("/verificar/lote", tags=["Verificação"])
+def verificar_disponibilidade_lote(consultas: List[Verificacao]):
+    """
+    Verifica vários (sala, início, fim) em uma única chamada.
+
+    Cada item da resposta tem o mesmo formato de /verificar; itens inválidos
+    ou de salas inexistentes trazem `erro` e `codigo` (400/404) em vez de
+    derrubar o lote inteiro.
+    """
+    resultados = [None] * len(consultas)
+    validas = []
+    posicoes = []
+
+    for i, consulta in enumerate(consultas):
+        try:
+            inicio = para_minutos(consulta.inicio)
+            fim = para_minutos(consulta.fim)
+        except ValueError:
+            resultados[i] = {
+                "id_sala": consulta.id_sala,
+                "disponivel": False,
+                "codigo": 400,
+                "erro": "Formato de data inválido. Use 'YYYY-MM-DD HH:MM'"
+            }
+            continue
+        if inicio >= fim:
+            resultados[i] = {
+                "id_sala": consulta.id_sala,
+                "disponivel": False,
+                "codigo": 400,
+                "erro": "A data/hora inicial deve ser anterior à final."
+            }
+            continue
+        if consulta.id_sala not in indice:
+            resultados[i] = {
+                "id_sala": consulta.id_sala,
+                "disponivel": False,
+                "codigo": 404,
+                "erro": "Sala não encontrada."
+            }
+            continue
+        validas.append((consulta.id_sala, inicio, fim))
+        posicoes.append(i)
+
+    # Avaliação vetorizada de todas as consultas válidas, agrupadas por sala
+    with _lock_indice:
+        conflitos = indice.conflitos_lote(validas)
+
+    for i, (sala_id, _, _), reserva in zip(posicoes, validas, conflitos):
+        if reserva is not None:
+            resultados[i] = {
+                "id_sala": sala_id,
+                "disponivel": False,
+                "mensagem": f"Sala ocupada entre {reserva[0]} e {reserva[1]}."
+            }
+        else:
+            resultados[i] = {
+                "id_sala": sala_id,
                 "disponivel": True,
                 "mensagem": "Sala disponível no horário solicitado."
             }
 
-    # Se sala não encontrada
-    raise HTTPException(status_code=404, detail="Sala não encontrada.")
+    return resposta_confiavel({
+        "total": len(resultados),
+        "disponiveis": sum(1 for r in resultados if r["disponivel"]),
+        "resultados": resultados
+    })
+
+
+@app.post("/buscar", tags=["Verificação"])
+def buscar_salas_livres(dados: BuscaLivres):
+    """
+    Retorna as primeiras `limite` salas livres no intervalo, na ordem das
+    candidatas recebidas.
+
+    Salas sem agenda registrada são consideradas livres. Se nenhuma candidata
+    estiver livre e `sugestoes` for verdadeiro, devolve os horários livres
+    mais próximos (antes e depois do intervalo pedido) das candidatas.
+    """
+    try:
+        inicio = para_minutos(dados.inicio)
+        fim = para_minutos(dados.fim)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Formato de data inválido. Use 'YYYY-MM-DD HH:MM'"
+        )
+
+    if inicio >= fim:
+        raise HTTPException(
+            status_code=400,
+            detail="A data/hora inicial deve ser anterior à final."
+        )
+
+    with _lock_indice:
+        livres = []
+        for sala_id in dados.salas:
+            agenda = indice.agenda(sala_id)
+            if agenda is None or agenda.conflito(inicio, fim) is None:
+                livres.append(sala_id)
+                if len(livres) >= dados.limite:
+                    break
+
+        sugestoes = []
+        if not livres and dados.sugestoes:
+            duracao = fim - inicio
+            candidatos = []
+            for sala_id in dados.salas:
+                agenda = indice.agenda(sala_id)
+                if agenda is None:
+                    continue
+                depois = agenda.proximo_livre(inicio, duracao)
+                antes = agenda.anterior_livre(fim, duracao) - duracao
+                candidatos.append((depois - inicio, sala_id, depois))
+                candidatos.append((inicio - antes, sala_id, antes))
+            candidatos.sort()
+            sugestoes = [
+                {"id_sala": sala_id, "inicio": de_minutos(m), "fim": de_minutos(m + duracao)}
+                for _, sala_id, m in candidatos[:dados.limite]
+            ]
+
+    return resposta_confiavel({"livres": livres, "sugestoes": sugestoes})
+
+
+@app.get("/feed", tags=["Health"])
+def estado_feed():
+    """Posição do consumo do feed de alterações do serviço de reserva"""
+    if consumidor is None:
+        return {"ativo": False}
+    return {**consumidor.estado(), "repetidos": _eventos_repetidos, "em_conflito": _eventos_em_conflito}
+
+
+_CORPO_HEALTH = CorpoEstatico({"status": "ok"})
 
 
 @app.get("/health", tags=["Health"])
 def health():
-    return {"status": "ok"}
+    return _CORPO_HEALTH.resposta()
 
 
 # -------------------------------
 # Execução local
 # -------------------------------
 if __name__ == "__main__":
-    print("\n🚀 Serviço de Verificação de Disponibilidade rodando na porta 8002\n")
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+    configurar_logs()
+    logger.info("🚀 Serviço de Verificação de Disponibilidade rodando na porta 8002")
+    uvicorn.run(app, host="0.0.0.0", port=8002, log_config=None, access_log=False)